@@ -0,0 +1,99 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare the JSON codec backends on synthetic node payloads.
+
+Usage::
+
+    python benchmarks/bench_codec.py [--nodes 100000] [--repeat 3]
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+from xcat3client.common import codec
+
+
+def make_nodes(count):
+    """Build a nodes/info like payload of ``count`` nodes."""
+    nodes = []
+    for i in range(count):
+        nodes.append({
+            'name': 'node%06d' % i,
+            'mgt': 'ipmi',
+            'netboot': 'pxe',
+            'arch': 'x86_64',
+            'type': 'node',
+            'control_info': {'bmc_address': '11.%d.%d.%d' % (
+                i >> 16 & 255, i >> 8 & 255, i & 255),
+                'bmc_username': 'admin',
+                'bmc_password': 'password'},
+            'nics_info': {'nics': [
+                {'name': 'eth0', 'mac': '42:87:0a:%02x:%02x:%02x' % (
+                    i >> 16 & 255, i >> 8 & 255, i & 255),
+                 'ip': '12.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255,
+                                        i & 255),
+                 'extra': {'primary': True}}]},
+        })
+    return {'nodes': nodes}
+
+
+def _best(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(backend, payload, repeat):
+    codec.use(backend)
+    data = codec.dumpb(payload)
+    return {
+        'dumpb': _best(lambda: codec.dumpb(payload), repeat),
+        'loads': _best(lambda: codec.loads(data), repeat),
+        'pretty': _best(lambda: codec.dumps(payload, pretty=True), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--nodes', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    payload = make_nodes(args.nodes)
+    print('%d nodes, best of %d' % (args.nodes, args.repeat))
+    print('%-8s %10s %10s %10s' % ('codec', 'dumpb', 'loads', 'pretty'))
+    baseline = None
+    for backend in ('json', 'ujson', 'orjson'):
+        try:
+            result = bench(backend, payload, args.repeat)
+        except ImportError:
+            print('%-8s not installed' % backend)
+            continue
+        baseline = baseline or result
+        print('%-8s %9.3fs %9.3fs %9.3fs   (x%.1f, x%.1f, x%.1f)' % (
+            backend, result['dumpb'], result['loads'], result['pretty'],
+            baseline['dumpb'] / result['dumpb'],
+            baseline['loads'] / result['loads'],
+            baseline['pretty'] / result['pretty']))
+    codec.use()
+
+
+if __name__ == '__main__':
+    main()
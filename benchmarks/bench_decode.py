@@ -0,0 +1,77 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare decoding a nodes/info response through resp.text and through its
+raw bytes.
+
+Usage::
+
+    python benchmarks/bench_decode.py [--nodes 50000] [--repeat 3]
+"""
+
+from __future__ import print_function
+
+import argparse
+
+import requests
+
+from xcat3client.common import codec
+from xcat3client.common import http
+
+from bench_codec import _best
+from bench_codec import make_nodes
+
+
+def make_response(content, content_type):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = content
+    if content_type:
+        resp.headers['Content-Type'] = content_type
+    return resp
+
+
+def decode_text(content, content_type):
+    # NOTE(chenglch): resp.text as decoded before, once to parse the body
+    # and once more to log it.
+    resp = make_response(content, content_type)
+    body = codec.loads(resp.text)
+    resp.text
+    return body
+
+
+def decode_bytes(content, content_type):
+    resp = make_response(content, content_type)
+    return http._parse_response(resp, resp.content, 'nodes/info', 'GET')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--nodes', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    content = codec.dumpb(make_nodes(args.nodes))
+    print('nodes/info of %d nodes (%d bytes), codec %s, best of %d' % (
+        args.nodes, len(content), codec.NAME, args.repeat))
+    print('%-26s %10s %10s %8s' % ('Content-Type', 'resp.text', 'bytes',
+                                   'speedup'))
+    for content_type in (None, 'text/plain', 'application/json'):
+        text = _best(lambda: decode_text(content, content_type), args.repeat)
+        raw = _best(lambda: decode_bytes(content, content_type), args.repeat)
+        print('%-26s %9.3fs %9.3fs %7.1fx' % (
+            content_type or '(none)', text, raw, text / raw))
+
+
+if __name__ == '__main__':
+    main()
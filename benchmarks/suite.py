@@ -0,0 +1,366 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmarks of the client hot paths, optionally compared against a baseline.
+
+Each case reports its best time over --repeat runs and the peak memory it
+allocated (tracemalloc). With --check, a case slower or bigger than its
+baseline by more than --tolerance is a regression and makes the run fail.
+
+Run as a module from the root of a checkout, the client does not need to
+be installed::
+
+    python -m benchmarks.suite                 # report the cases
+    python -m benchmarks.suite --save          # record a baseline
+    python -m benchmarks.suite --check         # compare with the baseline
+    python -m benchmarks.suite -k noderange    # only the matching cases
+
+Baselines depend on the machine, none is shipped: record one with --save
+on the machine running the comparison, with the same JSON codec, before
+changing the code. Requires Python 3 for tracemalloc.
+"""
+
+from __future__ import print_function
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import requests
+from requests import adapters
+
+from xcat3client.common import bulk
+from xcat3client.common import cliutils
+from xcat3client.common import codec
+from xcat3client.common import http
+from xcat3client.common import nodeset
+from xcat3client.v1 import node_shell
+
+from benchmarks.bench_codec import make_nodes
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+# NOTE(chenglch): timer noise of the fastest cases is not a regression.
+MIN_TIME_DELTA = 0.005
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Swallow what the CLI helpers print."""
+    stdout = sys.stdout
+    sys.stdout = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
+
+
+class _Node(object):
+    """Stands for cc.node, answering every bulk call with an empty result."""
+
+    def post(self, body):
+        return {'nodes': {}}
+
+    def update(self, body):
+        return {'nodes': {}}
+
+
+class _HttpClient(object):
+    def remaining_time(self):
+        return None
+
+
+class _Client(object):
+    node = _Node()
+    http_client = _HttpClient()
+
+
+def _chunk_result(chunk):
+    return {'nodes': dict((name, 'ok') for name in bulk.chunk_names(chunk))}
+
+
+class _LoopbackAdapter(adapters.BaseAdapter):
+    """Answer every request with a canned body, without any socket."""
+
+    def __init__(self, content):
+        super(_LoopbackAdapter, self).__init__()
+        self.content = content
+
+    def send(self, request, **kwargs):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.headers['Content-Type'] = 'application/json'
+        resp._content = self.content
+        resp.request = request
+        resp.url = request.url
+        return resp
+
+    def close(self):
+        pass
+
+
+def _names(count):
+    return ['node%07d' % i for i in range(count)]
+
+
+def case_noderange(count):
+    noderange = 'node[1-%d]' % count
+    return lambda: list(node_shell._get_node_from_args(noderange))
+
+
+def case_nodeset(count):
+    sparse = nodeset.NodeSet('node%d' % i for i in range(1, count, 10))
+
+    def run():
+        nodes = nodeset.NodeSet.from_noderange(
+            'node[1-%d],-node[100-200]' % count)
+        return (len(nodes & sparse), len(nodes - sparse),
+                'node%d' % count in nodes)
+    return run
+
+
+def case_create_payload(count):
+    args = argparse.Namespace(
+        nodes='node[1-%d]' % count, json=False,
+        attributes=[['arch=x86_64', 'mgt=ipmi', 'netboot=pxe']],
+        control={'bmc_address': '11.0.0.1', 'bmc_username': 'admin',
+                 'bmc_password': 'password'},
+        nic=[{'mac': '42:87:0a:05:00:00', 'primary': 'True'}])
+
+    def run():
+        with _quiet():
+            node_shell.do_create(_Client(), args)
+    return run
+
+
+def case_update_payload(count):
+    args = argparse.Namespace(nodes='node[1-%d]' % count, json=False,
+                              attributes=[['arch=ppc64', 'control/a=b']])
+
+    def run():
+        with _quiet():
+            node_shell.do_update(_Client(), args)
+    return run
+
+
+def case_bulk(executor):
+    def case(count):
+        nodes = [{'name': name, 'arch': 'x86_64'} for name in _names(count)]
+        engine = bulk.BulkEngine(count // 40, 4, executor)
+        return lambda: engine.run(_chunk_result, nodes)
+    return case
+
+
+def case_bulk_adaptive(count):
+    nodes = [{'name': name, 'arch': 'x86_64'} for name in _names(count)]
+
+    def run():
+        engine = bulk.BulkEngine(count // 40, 4, adaptive=True)
+        return engine.run(_chunk_result, nodes)
+    return run
+
+
+def case_bulk_nodeset(count):
+    nodes = nodeset.NodeSet.from_noderange('node[1-%d]' % count)
+    engine = bulk.BulkEngine(count // 40, 4)
+    return lambda: engine.run(_chunk_result, nodes)
+
+
+def case_request_encode(count):
+    client = http.HttpClient('http://127.0.0.1:3010', breaker_threshold=0)
+    client.session.mount('http://', _LoopbackAdapter(b'{"nodes": {}}'))
+    body = make_nodes(count)
+    return lambda: client.post('nodes', body=body)
+
+
+def case_request_decode(count):
+    client = http.HttpClient('http://127.0.0.1:3010', breaker_threshold=0)
+    client.session.mount('http://',
+                         _LoopbackAdapter(codec.dumpb(make_nodes(count))))
+    body = {'nodes': [{'name': name} for name in _names(count)]}
+    return lambda: client.get('nodes/info', body=body)
+
+
+def case_print_node_result(count):
+    result = {'nodes': dict((name, 'on') for name in _names(count))}
+    args = argparse.Namespace(json=False)
+
+    def run():
+        with _quiet():
+            node_shell._print_node_results([result['nodes']], args, True)
+    return run
+
+
+def case_print_grouped(count):
+    result = {'nodes': dict((name, 'on' if i % 100 else 'off')
+                            for i, name in enumerate(_names(count)))}
+    args = argparse.Namespace(json=False, group=True)
+
+    def run():
+        with _quiet():
+            node_shell._print_node_results([result['nodes']], args, True)
+    return run
+
+
+def case_print_dict(count):
+    nodes = [{'node': node['name'], 'attr': node}
+             for node in make_nodes(count)['nodes']]
+
+    def run():
+        with _quiet():
+            cliutils.print_dict(nodes)
+    return run
+
+
+def case_codec_dumpb(count):
+    payload = make_nodes(count)
+    return lambda: codec.dumpb(payload)
+
+
+def case_codec_loads(count):
+    data = codec.dumpb(make_nodes(count))
+    return lambda: codec.loads(data)
+
+
+CASES = [
+    ('noderange_1k', case_noderange, 1000),
+    ('noderange_100k', case_noderange, 100000),
+    ('noderange_1m', case_noderange, 1000000),
+    ('nodeset_1m', case_nodeset, 1000000),
+    ('create_payload_3k', case_create_payload, 3000),
+    ('update_payload_3k', case_update_payload, 3000),
+    ('request_encode_10k', case_request_encode, 10000),
+    ('request_decode_10k', case_request_decode, 10000),
+    ('print_node_result_100k', case_print_node_result, 100000),
+    ('print_grouped_100k', case_print_grouped, 100000),
+    ('print_dict_10k', case_print_dict, 10000),
+    ('codec_dumpb_100k', case_codec_dumpb, 100000),
+    ('codec_loads_100k', case_codec_loads, 100000),
+    ('bulk_thread_100k', case_bulk('thread'), 100000),
+    ('bulk_asyncio_100k', case_bulk('asyncio'), 100000),
+    ('bulk_nodeset_100k', case_bulk_nodeset, 100000),
+    ('bulk_adaptive_100k', case_bulk_adaptive, 100000),
+]
+
+
+def measure(func, repeat):
+    """Return the best time of func over repeat runs and its peak memory."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'time': round(best, 4), 'peak': peak}
+
+
+def compare(result, baseline, tolerance):
+    """Return the names of the metrics of result regressing from baseline."""
+    if not baseline:
+        return []
+    failed = [metric for metric in ('time', 'peak')
+              if result[metric] > baseline[metric] * (1 + tolerance)]
+    if result['time'] - baseline['time'] < MIN_TIME_DELTA:
+        failed = [metric for metric in failed if metric != 'time']
+    return failed
+
+
+def _load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, OSError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-k', dest='keyword', default=None,
+                        help='Only run the cases whose name holds keyword.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative increase of time and peak '
+                        'memory over the baseline. Defaults to %.2f.'
+                        % DEFAULT_TOLERANCE)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true',
+                        help='Store the results as the new baseline.')
+    parser.add_argument('--check', action='store_true',
+                        help='Compare the results with the baseline, fail '
+                        'on regressions.')
+    args = parser.parse_args()
+
+    baselines = {}
+    if args.check or args.save:
+        baselines = _load_baseline(args.baseline)
+    if args.check and not baselines:
+        print('No baseline in %s, record one with --save' % args.baseline)
+        return 1
+    results = {}
+    regressions = []
+    print('codec %s, best of %d' % (codec.NAME, args.repeat))
+    print('%-24s %9s %9s %7s %10s %10s %7s' % (
+        'case', 'time', 'baseline', 'ratio', 'peak MiB', 'baseline',
+        'ratio'))
+    for name, case, size in CASES:
+        if args.keyword and args.keyword not in name:
+            continue
+        result = measure(case(size), args.repeat)
+        results[name] = result
+        baseline = baselines.get(name)
+        failed = compare(result, baseline, args.tolerance)
+        if failed:
+            regressions.append(name)
+        if baseline:
+            print('%-24s %8.3fs %8.3fs %6.2fx %10.1f %10.1f %6.2fx %s' % (
+                name, result['time'], baseline['time'],
+                result['time'] / baseline['time'],
+                result['peak'] / 1048576.0, baseline['peak'] / 1048576.0,
+                float(result['peak']) / max(baseline['peak'], 1),
+                'REGRESSION (%s)' % ', '.join(failed) if failed else ''))
+        else:
+            print('%-24s %8.3fs %9s %7s %10.1f' % (
+                name, result['time'], '-', '-', result['peak'] / 1048576.0))
+
+    if args.save:
+        baselines.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+            f.write('\n')
+        print('Baseline saved to %s' % args.baseline)
+        return 0
+    if regressions:
+        print('%d regression(s): %s' % (len(regressions),
+                                        ', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
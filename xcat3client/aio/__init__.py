@@ -0,0 +1,22 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Asyncio flavour of the xCAT3 client.
+
+The managers mirror :mod:`xcat3client.v1` but every call returns a coroutine,
+so many requests can be in flight on a single event loop. Requires Python 3
+and the optional ``aiohttp`` package.
+"""
+
+from xcat3client.aio.client import Client  # noqa
+from xcat3client.aio.client import get_client  # noqa
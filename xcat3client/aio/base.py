@@ -0,0 +1,51 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Base manager for the asyncio client.
+
+The URL building of the v1 managers is reused as is; only the transport
+helpers are replaced by coroutines, so ``await manager.list()`` works for
+every manager defined on top of this class.
+"""
+
+import abc
+import six
+
+from xcat3client.common import base
+
+
+@six.add_metaclass(abc.ABCMeta)
+class Manager(base.Manager):
+    """Provides CRUD operations with a particular API as coroutines."""
+
+    async def _get(self, url, body=None, **kwargs):
+        """Retrieve a resource."""
+        return (await self.api.get(url, body=body, **kwargs))[1]
+
+    async def _post(self, url, body):
+        return (await self.api.post(url, body=body))[1]
+
+    async def _update(self, url, patch):
+        """Update a resource.
+
+        :param url: Resource identifier.
+        :param patch: New version of a given resource.
+        """
+        return (await self.api.patch(url, body=patch))[1]
+
+    async def _put(self, url, body=None, **kwargs):
+        return (await self.api.put(url, body=body, **kwargs))[1]
+
+    async def _delete(self, url, body=None, **kwargs):
+        """Delete a resource."""
+        return (await self.api.delete(url, body=body, **kwargs))[1]
@@ -0,0 +1,58 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Asyncio executor of :class:`xcat3client.common.bulk.BulkEngine`.
+
+The event loop runs in a thread of its own, so the engine waits for the
+chunks like for the other executors. Coroutine functions, such as the
+methods of the asyncio managers, run on the loop; plain callables in a pool
+of ``concurrency`` threads.
+"""
+
+import asyncio
+from concurrent import futures
+import threading
+
+
+class AsyncioExecutor(object):
+    def __init__(self, concurrency):
+        self.loop = asyncio.new_event_loop()
+        self._pool = futures.ThreadPoolExecutor(max_workers=concurrency)
+        self._thread = threading.Thread(target=self.loop.run_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        self._semaphore = asyncio.run_coroutine_threadsafe(
+            self._make_semaphore(concurrency), self.loop).result()
+
+    async def _make_semaphore(self, concurrency):
+        return asyncio.Semaphore(concurrency)
+
+    async def _call(self, func, chunk):
+        async with self._semaphore:
+            if asyncio.iscoroutinefunction(func):
+                return await func(chunk)
+            result = await self.loop.run_in_executor(self._pool, func, chunk)
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
+
+    def submit(self, func, chunk):
+        """Return a concurrent.futures.Future of func(chunk)."""
+        return asyncio.run_coroutine_threadsafe(self._call(func, chunk),
+                                                self.loop)
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self._pool.shutdown(wait=False)
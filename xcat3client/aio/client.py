@@ -0,0 +1,90 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from xcat3client.aio import http
+from xcat3client.aio import managers
+
+
+def get_client(xcat3_url=None, insecure=None, timeout=None,
+               ca_file=None, cert_file=None, key_file=None, max_retries=None,
+               retry_interval=None, retry_max_interval=None,
+               retry_budget=None, connection_limit=None,
+               **ignored_kwargs):
+    """Get an asyncio client for the xCAT3 API.
+
+    :param xcat3_url: xcat3 API endpoint
+    :param insecure: allow insecure SSL (no cert verification)
+    :param timeout: allows customization of the timeout for client HTTP
+        requests
+    :param ca_file: path to cacert file
+    :param cert_file: path to cert file
+    :param key_file: path to key file
+    :param max_retries: Maximum number of retries in case of conflict error
+    :param retry_interval: Amount of time (in seconds) between retries in case
+        of conflict error, the base of the exponential backoff
+    :param retry_max_interval: Upper bound (in seconds) of the backoff between
+        retries
+    :param retry_budget: Maximum number of retries issued by the client per
+        minute, 0 for unlimited
+    :param connection_limit: Maximum number of simultaneous connections
+        opened by the client.
+    :param ignored_kwargs: all the other params that are passed. They are
+        ignored.
+    """
+    kwargs = {
+        'max_retries': max_retries,
+        'retry_interval': retry_interval,
+        'insecure': insecure,
+        'ca_file': ca_file,
+        'cert_file': cert_file,
+        'key_file': key_file,
+    }
+    if timeout:
+        kwargs['timeout'] = timeout
+    optional_kwargs = {
+        'retry_max_interval': retry_max_interval,
+        'retry_budget': retry_budget,
+        'connection_limit': connection_limit,
+    }
+    kwargs.update((k, v) for k, v in optional_kwargs.items()
+                  if v is not None)
+    return Client(xcat3_url or 'http://localhost:3010', **kwargs)
+
+
+class Client(object):
+    """Asyncio client for the xCAT3 v1 API.
+
+    Every manager method returns a coroutine. The client owns an aiohttp
+    session which is released by :meth:`close` or by using the client as an
+    async context manager::
+
+        async with get_client(url) as cc:
+            result = await cc.node.get_power_state(nodes)
+    """
+
+    def __init__(self, endpoint, **kwargs):
+        self.http_client = http.HttpClient(endpoint, **kwargs)
+        self.node = managers.NodeManager(self.http_client)
+        self.network = managers.NetworkManager(self.http_client)
+        self.nic = managers.NicManager(self.http_client)
+        self.osimage = managers.OSImageManager(self.http_client)
+        self.service = managers.ServiceManager(self.http_client)
+        self.passwd = managers.PasswdManager(self.http_client)
+
+    async def close(self):
+        await self.http_client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,229 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import functools
+import logging
+import ssl
+import time
+
+import six.moves.urllib.parse as urlparse
+
+from xcat3client.common import codec
+from xcat3client.common import http
+from xcat3client.common import jsonstream
+from xcat3client.common.i18n import _
+from xcat3client import exc
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_CONNECTION_LIMIT = 1000
+
+
+class Response(object):
+    """Snapshot of an aiohttp response.
+
+    The aiohttp response is released as soon as the body is read, so the
+    attributes used by callers of :class:`xcat3client.common.http.HttpClient`
+    are copied here to keep the ``(resp, body)`` contract.
+    """
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return http._decode_text(self.content)
+
+
+def with_retries(func):
+    """Coroutine flavour of :func:`xcat3client.common.http.with_retries`."""
+
+    @functools.wraps(func)
+    async def wrapper(self, url, method, **kwargs):
+        if self.conflict_max_retries is None:
+            self.conflict_max_retries = http.DEFAULT_MAX_RETRIES
+        if self.conflict_retry_interval is None:
+            self.conflict_retry_interval = http.DEFAULT_RETRY_INTERVAL
+
+        num_attempts = self.conflict_max_retries + 1
+        interval = self.conflict_retry_interval
+        retry_start = None
+        for attempt in range(1, num_attempts + 1):
+            try:
+                return await func(self, url, method, **kwargs)
+            except http._RETRY_EXCEPTIONS as error:
+                interval = http._retry_interval(self, error, attempt,
+                                                num_attempts, interval)
+                if interval is None:
+                    raise
+            finally:
+                if retry_start is not None:
+                    self.retry_budget.record_time(time.time() - retry_start)
+                    retry_start = None
+            retry_start = time.time()
+            await asyncio.sleep(interval)
+
+    return wrapper
+
+
+class HttpClient(object):
+    """Asyncio counterpart of :class:`xcat3client.common.http.HttpClient`.
+
+    The underlying ``aiohttp.ClientSession`` is created lazily from the
+    running event loop and must be released with :meth:`close`.
+    """
+
+    def __init__(self, endpoint, http_log_debug=False, timings=False,
+                 max_retries=http.DEFAULT_MAX_RETRIES,
+                 retry_interval=http.DEFAULT_RETRY_INTERVAL,
+                 timeout=600,
+                 ca_file=None,
+                 cert_file=None,
+                 key_file=None,
+                 insecure=None,
+                 retry_max_interval=http.DEFAULT_RETRY_MAX_INTERVAL,
+                 retry_budget=http.DEFAULT_RETRY_BUDGET,
+                 retry_budget_window=http.DEFAULT_RETRY_BUDGET_WINDOW,
+                 connection_limit=DEFAULT_CONNECTION_LIMIT, **kwargs):
+        if aiohttp is None:
+            raise exc.CommandError(_("The asyncio client requires the "
+                                     "aiohttp package."))
+        self.endpoint_trimmed = http._trim_endpoint_api_version(endpoint)
+        self.http_log_debug = http_log_debug
+        self.conflict_max_retries = max_retries
+        self.conflict_retry_interval = retry_interval
+        self.retry_max_interval = retry_max_interval
+        self.retry_budget = http.RetryBudget(retry_budget,
+                                             retry_budget_window)
+        self.ssl_context = None
+        if insecure:
+            self.ssl_context = False
+        elif ca_file or cert_file:
+            self.ssl_context = ssl.create_default_context(cafile=ca_file)
+            if cert_file:
+                self.ssl_context.load_cert_chain(cert_file, key_file)
+        self.timeout = timeout
+        self.connection_limit = connection_limit
+        self.times = []  # [("item", starttime, endtime), ...]
+        self.timings = timings
+        self.session = None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit,
+                                             ssl=self.ssl_context)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    def get_retry_stats(self):
+        """Return the number of retries and the time they cost."""
+        return self.retry_budget.stats()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _open(self, url, method, **kwargs):
+        """Send a request, return the aiohttp response or raise on error.
+
+        The caller is responsible for releasing the response.
+        """
+        kwargs.setdefault('headers', kwargs.get('headers', {}))
+        kwargs['headers']['Accept'] = 'application/json'
+        if 'compact' in kwargs:
+            # NOTE(chenglch): the noderange bodies are not negotiated here,
+            # the nodes are always sent as a list.
+            kwargs['body'] = kwargs.pop('compact')[1]()
+        if 'body' in kwargs:
+            kwargs['headers']['Content-Type'] = 'application/json'
+            body = kwargs.pop('body')
+            if body:
+                kwargs['data'] = codec.dumpb(body)
+
+        url = urlparse.urljoin(self.endpoint_trimmed, url)
+        LOG.debug("REQ: %(method)s %(url)s", {'method': method, 'url': url})
+
+        session = self._get_session()
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        raw = await session.request(method, url, timeout=timeout, **kwargs)
+        if raw.status >= 400:
+            async with raw:
+                content = await raw.read()
+            resp = Response(raw.status, raw.headers, content)
+            http._parse_response(resp, content, url, method)
+        return raw
+
+    @with_retries
+    async def request(self, url, method, **kwargs):
+        raw = await self._open(url, method, **kwargs)
+        async with raw:
+            content = await raw.read()
+        resp = Response(raw.status, raw.headers, content)
+
+        if self.http_log_debug:
+            LOG.debug("RESP: [%(status)s] %(headers)s\nRESP BODY: %(text)s\n",
+                      {'status': resp.status_code, 'headers': resp.headers,
+                       'text': resp.text})
+        body = http._parse_response(resp, content, str(raw.url), method)
+        return resp, body
+
+    _open_with_retries = with_retries(_open)
+
+    async def get_stream(self, url, key, **kwargs):
+        """Issue a GET and lazily yield the elements of ``body[key]``.
+
+        This is an async generator, use it with ``async for``.
+        """
+        raw = await self._open_with_retries(url, 'GET', **kwargs)
+        decoder = jsonstream.ArrayDecoder(key)
+        try:
+            async for chunk in raw.content.iter_chunked(
+                    jsonstream.CHUNK_SIZE):
+                for item in decoder.feed(chunk):
+                    yield item
+                if decoder.done:
+                    return
+            for item in decoder.close():
+                yield item
+        finally:
+            raw.release()
+
+    async def _time_request(self, url, method, **kwargs):
+        start = time.time()
+        resp, body = await self.request(url, method, **kwargs)
+        if self.timings:
+            self.times.append(('%s %s' % (method, url), start, time.time()))
+        return resp, body
+
+    async def get(self, url, **kwargs):
+        return await self._time_request(url, 'GET', **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self._time_request(url, 'POST', **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self._time_request(url, 'PUT', **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self._time_request(url, 'DELETE', **kwargs)
+
+    async def patch(self, url, **kwargs):
+        return await self._time_request(url, 'PATCH', **kwargs)
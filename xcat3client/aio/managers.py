@@ -0,0 +1,100 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Asyncio managers for the xCAT3 v1 API.
+
+Each manager inherits the URL handling from its :mod:`xcat3client.v1`
+counterpart and the coroutine transport from :class:`base.Manager`.
+"""
+
+import asyncio
+
+from xcat3client.aio import base
+from xcat3client.common import bulk
+from xcat3client.v1 import network
+from xcat3client.v1 import nic
+from xcat3client.v1 import node
+from xcat3client.v1 import osimage
+from xcat3client.v1 import passwd
+from xcat3client.v1 import service
+
+
+class NodeManager(node.NodeManager, base.Manager):
+
+    def _fan_out(self, func, nodes, stream=False):
+        """Await func on the nodes, in concurrent chunks with an engine.
+
+        The chunks are tasks of the calling event loop, the engine only
+        gives their size and concurrency: its executor would run them away
+        from the loop of the aiohttp session.
+
+        :param stream: return an async generator over the
+                       ``{name: result}`` map of each chunk, as the chunks
+                       complete.
+        :raises: the error of the first chunk which failed.
+        """
+        if stream:
+            return self._iter_chunks(func, nodes)
+        if self.engine is None or isinstance(nodes, dict):
+            return func(nodes)
+        return self._merge(self._iter_chunks(func, nodes))
+
+    async def _iter_chunks(self, func, nodes):
+        if self.engine is None or isinstance(nodes, dict):
+            yield (await func(nodes))['nodes']
+            return
+        controller = self.engine.controller
+        chunks = bulk.chunks(nodes, lambda: controller.chunk_size)
+        pending = set()
+        try:
+            while True:
+                while len(pending) < controller.concurrency:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    pending.add(asyncio.ensure_future(func(chunk)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()['nodes']
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _merge(self, results):
+        merged = {}
+        async for nodes in results:
+            merged.update(nodes)
+        return {'nodes': merged}
+
+
+class NicManager(nic.NicManager, base.Manager):
+    pass
+
+
+class NetworkManager(network.NetworkManager, base.Manager):
+    pass
+
+
+class OSImageManager(osimage.OSImageManager, base.Manager):
+    pass
+
+
+class ServiceManager(service.ServiceManager, base.Manager):
+    pass
+
+
+class PasswdManager(passwd.PasswdManager, base.Manager):
+    pass
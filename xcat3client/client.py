@@ -14,15 +14,31 @@ from xcat3client.common import utils
 
 
 def get_client(xcat3_url=None, insecure=None, timeout=None,
+               connect_timeout=None, deadline=None,
                os_cacert=None, ca_file=None, os_cert=None, cert_file=None,
                os_key=None, key_file=None, max_retries=None,
-               retry_interval=None, **ignored_kwargs):
+               retry_interval=None, retry_max_interval=None,
+               retry_budget=None, timings=False, pool_connections=None,
+               pool_maxsize=None, pool_block=None, keepalive_timeout=None,
+               compress=None, compress_threshold=None,
+               compact_noderange=None, breaker_threshold=None,
+               breaker_reset_timeout=None, breaker_state_file=None,
+               fallback_state_file=None, cache_size=None,
+               completion_cache=None, discover_endpoints=False,
+               chunk_size=None, concurrency=None, executor=None,
+               adaptive=None, node_retries=None, node_retry_interval=None,
+               journal=None, **ignored_kwargs):
     """Get an authenticated client, based on the credentials.
 
-    :param xcat3_url: xcat3 API endpoint
+    :param xcat3_url: xcat3 API endpoint, or a list (or comma separated
+        string) of endpoints the requests are spread over
     :param insecure: allow insecure SSL (no cert verification)
     :param timeout: allows customization of the timeout for client HTTP
-        requests
+        requests, the time (in seconds) to wait for the server to send data
+    :param connect_timeout: time (in seconds) to wait for the connection to
+        the server to be established
+    :param deadline: time (in seconds) the client has to complete all its
+        requests, retries included
     :param os_cacert: path to cacert file
     :param ca_file: path to cacert file, deprecated in favour of os_cacert
     :param os_cert: path to cert file
@@ -31,7 +47,53 @@ def get_client(xcat3_url=None, insecure=None, timeout=None,
     :param key_file: path to key file, deprecated in favour of os_key
     :param max_retries: Maximum number of retries in case of conflict error
     :param retry_interval: Amount of time (in seconds) between retries in case
-        of conflict error
+        of conflict error, the base of the exponential backoff
+    :param retry_max_interval: Upper bound (in seconds) of the backoff between
+        retries
+    :param retry_budget: Maximum number of retries issued by the client per
+        minute, 0 for unlimited
+    :param timings: record the time spent in each HTTP request
+    :param pool_connections: number of per-host connection pools to cache
+    :param pool_maxsize: maximum number of connections kept per host
+    :param pool_block: wait for a free pooled connection instead of opening
+        an extra one which is discarded after use
+    :param keepalive_timeout: close pooled connections idle for longer than
+        this amount of seconds
+    :param compress: gzip the request bodies larger than compress_threshold
+    :param compress_threshold: minimum size (in bytes) of a request body to
+        be compressed
+    :param compact_noderange: name the nodes of the bulk requests with a
+        noderange instead of a list, the paths of the API which reject it
+        get the list
+    :param breaker_threshold: number of failures in a row opening the
+        circuit of an endpoint, 0 disables the circuit breaker
+    :param breaker_reset_timeout: amount of time (in seconds) an open
+        circuit fails requests before letting a probe through
+    :param breaker_state_file: file keeping the open circuits across
+        clients
+    :param fallback_state_file: file keeping across clients the API paths
+        which rejected gzip encoded or noderange bodies, they get plain
+        ones
+    :param cache_size: number of GET responses kept and revalidated with
+        ETag/Last-Modified, a 304 answer reuses the cached body. Disabled
+        by default
+    :param completion_cache: save the names of the listed nodes, networks,
+        osimages and passwds for bash completion
+    :param discover_endpoints: spread the requests over every online API
+        service listed by the xcat3_url endpoint, weighted by their workers
+    :param chunk_size: maximum number of nodes of a power, boot device or
+        provision request, the nodes are split into concurrent requests
+    :param concurrency: maximum number of these requests in flight
+    :param executor: runs the concurrent requests, one of
+        xcat3client.common.bulk.EXECUTORS
+    :param adaptive: adapt the chunk size and the concurrency to the
+        latency of the requests and the 409 and 503 answers
+    :param node_retries: number of times the nodes which failed are sent
+        again, alone
+    :param node_retry_interval: time (in seconds) before the failed nodes
+        are sent again, doubled on each retry
+    :param journal: xcat3client.common.journal.Journal recording the bulk
+        node operations, the nodes it completed already are skipped
     :param ignored_kwargs: all the other params that are passed. Left for
         backwards compatibility. They are ignored.
     """
@@ -39,7 +101,36 @@ def get_client(xcat3_url=None, insecure=None, timeout=None,
     kwargs = {
         'max_retries': max_retries,
         'retry_interval': retry_interval,
+        'timings': timings,
     }
+    optional_kwargs = {
+        'connect_timeout': connect_timeout,
+        'deadline': deadline,
+        'retry_max_interval': retry_max_interval,
+        'retry_budget': retry_budget,
+        'pool_connections': pool_connections,
+        'pool_maxsize': pool_maxsize,
+        'pool_block': pool_block,
+        'keepalive_timeout': keepalive_timeout,
+        'compress': compress,
+        'compress_threshold': compress_threshold,
+        'compact_noderange': compact_noderange,
+        'breaker_threshold': breaker_threshold,
+        'breaker_reset_timeout': breaker_reset_timeout,
+        'breaker_state_file': breaker_state_file,
+        'fallback_state_file': fallback_state_file,
+        'cache_size': cache_size,
+        'completion_cache': completion_cache,
+        'chunk_size': chunk_size,
+        'concurrency': concurrency,
+        'executor': executor,
+        'adaptive': adaptive,
+        'node_retries': node_retries,
+        'node_retry_interval': node_retry_interval,
+        'journal': journal,
+    }
+    kwargs.update((k, v) for k, v in optional_kwargs.items()
+                  if v is not None)
     endpoint = xcat3_url
     cacert = os_cacert or ca_file
     cert = os_cert or cert_file
@@ -50,10 +141,15 @@ def get_client(xcat3_url=None, insecure=None, timeout=None,
             'ca_file': cacert,
             'cert_file': cert,
             'key_file': key,
-            'timeout': timeout,
         })
+        if timeout:
+            kwargs['timeout'] = timeout
 
-    return Client(version, endpoint, **kwargs)
+    client = Client(version, endpoint, **kwargs)
+    if discover_endpoints:
+        services = client.service.list()
+        client.http_client.discover_endpoints(services['services'])
+    return client
 
 
 def Client(version, *args, **kwargs):
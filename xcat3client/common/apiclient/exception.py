@@ -252,11 +252,15 @@ class InvalidUsage(RuntimeError):
     pass
 
 
-def from_response(response, body, url, method=None):
+def from_response(response, body, url, method=None, error_json=None):
     """
     Return an instance of an ClientException or subclass
     based on a requests response.
 
+    :param body: the decoded response body.
+    :param error_json: the error decoded from the ``error_message`` of the
+        body, its ``faultstring`` is preferred as message.
+
     Usage::
 
         resp, body = requests.request(...)
@@ -271,13 +275,18 @@ def from_response(response, body, url, method=None):
         'url': url,
     }
 
+    if issubclass(cls, HttpError):
+        kwargs['http_status'] = kwargs.pop('code')
+
     if response.headers:
 
         if (issubclass(cls, RetryAfterException) and
                     'retry-after' in response.headers):
             kwargs['retry_after'] = response.headers.get('retry-after')
 
-    if body:
+    if error_json and error_json.get('faultstring'):
+        kwargs['message'] = error_json['faultstring']
+    elif body:
         kwargs['message'] = str(body)
 
     return cls(**kwargs)
@@ -0,0 +1,154 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Client side load balancing across several xCAT3 API endpoints.
+"""
+
+import logging
+import threading
+import time
+
+import six.moves.urllib.parse as urlparse
+
+from xcat3client.common.i18n import _LW
+
+LOG = logging.getLogger(__name__)
+
+API_VERSION = '/v1'
+DEFAULT_EJECT_THRESHOLD = 3
+DEFAULT_EJECT_INTERVAL = 10
+MAX_EJECT_INTERVAL = 300
+
+
+def trim_endpoint_api_version(url):
+    """Trim API version and trailing slash from endpoint."""
+    url = url.rstrip('/')
+    if url.endswith(API_VERSION):
+        url = url[:-len(API_VERSION)]
+    return url
+
+
+class Endpoint(object):
+    """An API endpoint and its health."""
+
+    def __init__(self, url, weight=1):
+        self.url = trim_endpoint_api_version(url)
+        self.weight = max(int(weight), 1)
+        self.current = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0
+        self.requests = 0
+
+    def available(self, now):
+        return self.ejected_until <= now
+
+
+class Balancer(object):
+    """Spread requests over endpoints with smooth weighted round robin.
+
+    An endpoint failing ``eject_threshold`` times in a row is ejected for
+    ``eject_interval`` seconds, doubled at each new ejection. Once the
+    interval has elapsed the endpoint gets requests again; the first one
+    acts as a probe, a success brings it back for good while a failure
+    ejects it again.
+    """
+
+    def __init__(self, urls, eject_threshold=DEFAULT_EJECT_THRESHOLD,
+                 eject_interval=DEFAULT_EJECT_INTERVAL):
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.eject_threshold = eject_threshold
+        self.eject_interval = eject_interval
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self):
+        return self.endpoints[0]
+
+    def choose(self, usable=None):
+        """Return the endpoint for the next request.
+
+        :param usable: optional predicate on the endpoint URL, endpoints for
+            which it is false are skipped unless no other is left.
+        """
+        with self._lock:
+            now = time.time()
+            candidates = [ep for ep in self.endpoints if ep.available(now) and
+                          (usable is None or usable(ep.url))]
+            if not candidates:
+                # NOTE(chenglch): every endpoint is ejected or unusable, try
+                # the one which comes back first rather than failing without
+                # trying.
+                chosen = min(self.endpoints, key=lambda ep: ep.ejected_until)
+            else:
+                total = 0
+                chosen = None
+                for ep in candidates:
+                    ep.current += ep.weight
+                    total += ep.weight
+                    if chosen is None or ep.current > chosen.current:
+                        chosen = ep
+                chosen.current -= total
+            chosen.requests += 1
+            return chosen
+
+    def success(self, endpoint):
+        with self._lock:
+            endpoint.failures = 0
+            endpoint.ejections = 0
+
+    def failure(self, endpoint):
+        with self._lock:
+            endpoint.failures += 1
+            if (endpoint.failures < self.eject_threshold and
+                    not endpoint.ejections):
+                return
+            interval = min(self.eject_interval * 2 ** endpoint.ejections,
+                           MAX_EJECT_INTERVAL)
+            endpoint.ejections += 1
+            endpoint.failures = 0
+            endpoint.ejected_until = time.time() + interval
+            if len(self.endpoints) > 1:
+                LOG.warning(_LW("Endpoint %(url)s ejected for %(interval)ss"),
+                            {'url': endpoint.url, 'interval': interval})
+
+    def discover(self, services):
+        """Replace the endpoints with the online API services.
+
+        The URL of a service reuses the scheme and port of the primary
+        endpoint, its weight is the number of workers of the service.
+
+        :param services: the ``services`` list returned by the API.
+        """
+        parts = urlparse.urlparse(self.primary.url)
+        endpoints = []
+        for service in services:
+            if service.get('type') != 'api' or not service.get('online'):
+                continue
+            netloc = service['hostname']
+            if parts.port:
+                netloc = '%s:%d' % (netloc, parts.port)
+            url = urlparse.urlunparse((parts.scheme, netloc, parts.path,
+                                       '', '', ''))
+            endpoints.append(Endpoint(url, service.get('workers') or 1))
+        if not endpoints:
+            return
+        with self._lock:
+            self.endpoints = endpoints
+
+    def stats(self):
+        now = time.time()
+        return [{'url': ep.url,
+                 'weight': ep.weight,
+                 'requests': ep.requests,
+                 'available': ep.available(now)} for ep in self.endpoints]
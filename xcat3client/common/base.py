@@ -25,13 +25,65 @@ import six
 class Manager(object):
     """Provides  CRUD operations with a particular API."""
 
+    # NOTE(chenglch): resource name of the bash completion cache fed by
+    # list(), the key of the list response holding the items (defaults to
+    # _resource_name) and the key of the items holding the names.
+    _completion_resource = None
+    _completion_list_key = None
+    _completion_key = 'name'
+
     def __init__(self, api):
         self.api = api
 
-    def _get(self, url, body=None):
+    def _completion_cache(self):
+        if self._completion_resource is None:
+            return None
+        cache = getattr(self.api, 'completion', None)
+        if cache is None or cache.fresh(self._completion_resource):
+            return None
+        return cache
+
+    def _item_name(self, item):
+        # NOTE(chenglch): the node list holds bare names.
+        if isinstance(item, six.string_types):
+            return item
+        return item.get(self._completion_key)
+
+    def _cache_names(self, body):
+        """Save the names of a list response for bash completion."""
+        cache = self._completion_cache()
+        if cache is not None and body:
+            cache.write(self._completion_resource,
+                        (self._item_name(item) for item in
+                         body.get(self._completion_list_key or
+                                  self._resource_name, [])))
+        return body
+
+    def _cache_names_stream(self, items):
+        """Like _cache_names for a generator, written once exhausted."""
+        cache = self._completion_cache()
+        if cache is None:
+            return items
+        return self._iter_caching_names(cache, items)
+
+    def _iter_caching_names(self, cache, items):
+        names = []
+        for item in items:
+            names.append(self._item_name(item))
+            yield item
+        cache.write(self._completion_resource, names)
+
+    def _get(self, url, body=None, **kwargs):
         """Retrieve a resource."""
-        return self.api.get(url, body=body)[1]
+        return self.api.get(url, body=body, **kwargs)[1]
+
+    def _get_stream(self, url, key, body=None, **kwargs):
+        """Retrieve a list of resources lazily.
 
+        :param key: key of the response holding the list.
+        :returns: a generator over the elements of the list.
+        """
+        return self.api.get_stream(url, key, body=body, **kwargs)
 
     def _post(self, url, body):
         return self.api.post(url, body=body)[1]
@@ -44,15 +96,15 @@ class Manager(object):
         """
         return self.api.patch(url, body=patch)[1]
 
-    def _put(self, url, body):
-        return self.api.put(url, body=body)[1]
+    def _put(self, url, body=None, **kwargs):
+        return self.api.put(url, body=body, **kwargs)[1]
 
-    def _delete(self, url, body=None):
+    def _delete(self, url, body=None, **kwargs):
         """Delete a resource.
 
         :param resource_id: Resource identifier.
         """
-        return self.api.delete(url, body=body)[1]
+        return self.api.delete(url, body=body, **kwargs)[1]
 
 
 @six.add_metaclass(abc.ABCMeta)
@@ -63,7 +115,7 @@ class ResourceManager(Manager):
         :returns: A list of networks.
         """
         url = self._resource_name
-        return self._get(url)
+        return self._cache_names(self._get(url))
 
     def post(self, body):
         url = self._resource_name
@@ -0,0 +1,178 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Circuit breaker failing requests fast while an API endpoint is unhealthy.
+"""
+
+import logging
+import threading
+import time
+
+from xcat3client.common import codec
+from xcat3client.common.i18n import _
+from xcat3client.common.i18n import _LW
+from xcat3client.common import utils
+from xcat3client import exc
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+def default_state_file():
+    return utils.get_cache_dir('breaker.json')
+
+
+class CircuitBreaker(object):
+    """Per endpoint circuit breaker.
+
+    An endpoint is *closed* while healthy. ``failure_threshold`` failures in
+    a row open it: requests then fail immediately with
+    :class:`xcat3client.exc.CircuitOpen`. After ``reset_timeout`` seconds it
+    is *half-open*, a single request is let through as a probe; a success
+    closes the circuit, a failure opens it again.
+
+    With a ``state_file`` the open circuits are saved on each transition and
+    loaded back, so the following CLI invocations fail fast as well until
+    the reset timeout expires.
+
+    :param failure_threshold: failures in a row opening the circuit, 0
+        disables the breaker.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, state_file=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state_file = state_file
+        self._circuits = {}
+        self._probing = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.state_file:
+            return
+        try:
+            with open(self.state_file, 'rb') as f:
+                circuits = codec.loads(f.read())
+        except (IOError, OSError, ValueError):
+            return
+        now = time.time()
+        for url, circuit in circuits.items():
+            if (circuit.get('state') == OPEN and
+                    now - circuit.get('opened_at', 0) < self.reset_timeout):
+                self._circuits[url] = circuit
+
+    def _save(self):
+        if not self.state_file:
+            return
+        circuits = dict((url, circuit) for url, circuit in
+                        self._circuits.items() if circuit['state'] == OPEN)
+        try:
+            utils.write_atomic(self.state_file, codec.dumps(circuits))
+        except (IOError, OSError) as e:
+            LOG.debug("Could not save the circuit breaker state: %s", e)
+
+    def _circuit(self, url):
+        return self._circuits.setdefault(
+            url, {'state': CLOSED, 'failures': 0, 'opened_at': 0})
+
+    def state(self, url):
+        """Return the state of the circuit of ``url``."""
+        with self._lock:
+            circuit = self._circuits.get(url)
+            if circuit is None:
+                return CLOSED
+            if (circuit['state'] == OPEN and
+                    time.time() - circuit['opened_at'] >= self.reset_timeout):
+                return HALF_OPEN
+            return circuit['state']
+
+    def allows(self, url):
+        """Whether a request to ``url`` would be let through."""
+        if not self.failure_threshold:
+            return True
+        state = self.state(url)
+        return state == CLOSED or (state == HALF_OPEN and
+                                   url not in self._probing)
+
+    def check(self, url):
+        """Raise CircuitOpen unless a request may be sent to ``url``."""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            circuit = self._circuits.get(url)
+            if circuit is None or circuit['state'] == CLOSED:
+                return
+            remaining = circuit['opened_at'] + self.reset_timeout - time.time()
+            if remaining <= 0 and url not in self._probing:
+                circuit['state'] = HALF_OPEN
+                self._probing.add(url)
+                return
+        raise exc.CircuitOpen(503, url=url, message=(
+            _("Circuit open for %(url)s after repeated failures, not sending "
+              "the request. Retry in %(remaining)ds.") %
+            {'url': url, 'remaining': max(remaining, 0)}))
+
+    def release(self, url):
+        """End the probe of ``url`` if its outcome was not recorded.
+
+        The circuit stays half-open, the next request is the probe.
+        """
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._probing.discard(url)
+
+    def success(self, url):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._probing.discard(url)
+            circuit = self._circuits.get(url)
+            if circuit is None:
+                return
+            changed = circuit['state'] != CLOSED
+            circuit.update(state=CLOSED, failures=0)
+            if changed:
+                self._save()
+
+    def failure(self, url):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._probing.discard(url)
+            circuit = self._circuit(url)
+            circuit['failures'] += 1
+            if (circuit['state'] == HALF_OPEN or
+                    circuit['failures'] >= self.failure_threshold):
+                if circuit['state'] != OPEN:
+                    LOG.warning(_LW("Circuit opened for %(url)s for "
+                                    "%(timeout)ss"),
+                                {'url': url, 'timeout': self.reset_timeout})
+                circuit.update(state=OPEN, opened_at=time.time())
+                self._save()
+
+    def stats(self):
+        """Return the state and failure count of every known circuit."""
+        with self._lock:
+            circuits = sorted(self._circuits.items())
+        return [{'url': url, 'state': self.state(url),
+                 'failures': circuit['failures']}
+                for url, circuit in circuits]
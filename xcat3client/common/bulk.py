@@ -0,0 +1,611 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Bulk execution of node operations.
+
+The nodes are split into chunks, sent by concurrent calls and the
+``{'nodes': {name: result}}`` maps of the chunks merged in chunk order, so
+the result does not depend on which chunk completed first::
+
+    engine = bulk.BulkEngine(chunk_size=1000, concurrency=8)
+    result = engine.run(lambda chunk: cc.node.set_power_state(chunk, 'on'),
+                        nodes)
+
+The calls are run by a pool of threads, of green threads or by an asyncio
+event loop. No backend monkey patches the process: the green threads only
+cooperate in a process its owner already patched with eventlet.
+
+With ``adaptive=True`` the chunk size and concurrency given are only a
+starting point, see :class:`AIMDController`.
+"""
+
+import collections
+import inspect
+import itertools
+import logging
+import random
+import sys
+import threading
+import time
+
+from oslo_utils import importutils
+import six
+
+from xcat3client.common.i18n import _
+from xcat3client.common.i18n import _LW
+from xcat3client.common import nodeset
+from xcat3client import exc
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CONCURRENCY = 4
+EXECUTORS = ('thread', 'greenlet', 'asyncio')
+DEFAULT_EXECUTOR = 'thread'
+DEADLINE_RESULT = 'Deadline expired before the request completed'
+DEFAULT_MIN_CHUNK_SIZE = 50
+DEFAULT_MAX_CHUNK_SIZE = 20000
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_TARGET_LATENCY = 5.0
+DEFAULT_MAX_PAYLOAD = 8 * 1024 * 1024
+DEFAULT_NODE_RETRIES = 0
+DEFAULT_NODE_RETRY_INTERVAL = 1
+DEFAULT_NODE_RETRY_MAX_INTERVAL = 30
+# NOTE(chenglch): the node results of a successful operation, the nodes with
+# any other result are retried with node_retries.
+SUCCESS_RESULTS = {'ok': True,
+                   'updated': True,
+                   'deleted': True,
+                   'on': True,
+                   'off': True,
+                   'net': True,
+                   'cdrom': True,
+                   'disk': True,
+                   'provision': True}
+# NOTE(chenglch): the errors failing the nodes of a chunk rather than the
+# whole operation: the answers of the API and the transport errors, such as
+# a refused connection or a connection reset while reading the response.
+CHUNK_ERRORS = (exc.ClientException, exc.ConnectionRefused, IOError, OSError)
+# NOTE(chenglch): the errors of a server too busy to take more requests.
+_CONGESTION_ERRORS = (exc.Conflict, exc.ServiceUnavailable,
+                      exc.GatewayTimeout)
+
+
+def chunks(items, size):
+    """Yield the chunks of at most size items.
+
+    A NodeSet is split into NodeSets, which are sent as noderanges, other
+    iterables into lists.
+
+    :param size: number of items, or a callable returning the size of the
+        next chunk.
+    """
+    if isinstance(items, nodeset.NodeSet):
+        for chunk in items.split(size):
+            yield chunk
+        return
+    next_size = size if callable(size) else lambda: size
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, next_size()))
+        if not chunk:
+            return
+        yield chunk
+
+
+def chunk_names(chunk):
+    """Return the node names of a chunk of names or of node dicts."""
+    return [item['name'] if isinstance(item, dict) else item
+            for item in chunk]
+
+
+class _ThreadExecutor(object):
+    def __init__(self, concurrency):
+        from concurrent import futures
+        self._executor = futures.ThreadPoolExecutor(max_workers=concurrency)
+
+    def submit(self, func, chunk):
+        return self._executor.submit(func, chunk)
+
+    def shutdown(self):
+        # NOTE(chenglch): the calls still running past the deadline are not
+        # waited for.
+        self._executor.shutdown(wait=False)
+
+
+class _GreenExecutor(_ThreadExecutor):
+    def __init__(self, concurrency):
+        import futurist
+        self._executor = futurist.GreenThreadPoolExecutor(
+            max_workers=concurrency)
+
+
+def _green_usable():
+    # NOTE(chenglch): a process which did not import eventlet is not patched.
+    if 'eventlet' not in sys.modules:
+        return False
+    from eventlet import patcher
+    return patcher.is_monkey_patched('socket')
+
+
+def _require(module, executor, package):
+    try:
+        importutils.import_module(module)
+    except ImportError:
+        raise exc.CommandError(_("The %(executor)s executor requires the "
+                                 "%(package)s package.") %
+                               {'executor': executor, 'package': package})
+
+
+def _make_executor(name, concurrency):
+    if name == 'asyncio' and six.PY2:
+        raise exc.CommandError(_("The asyncio executor requires "
+                                 "Python 3."))
+    # NOTE(chenglch): concurrent.futures is installed by the futures
+    # backport on Python 2.
+    _require('concurrent.futures', name, 'futures')
+    if name == 'greenlet':
+        if _green_usable():
+            _require('futurist', name, 'futurist')
+            return _GreenExecutor(concurrency)
+        LOG.warning(_LW("The greenlet executor needs a process monkey "
+                        "patched by eventlet, using threads."))
+    elif name == 'asyncio':
+        from xcat3client.aio import bulk as aio_bulk
+        return aio_bulk.AsyncioExecutor(concurrency)
+    return _ThreadExecutor(concurrency)
+
+
+class FixedController(object):
+    """Keep the chunk size and the concurrency of the engine as given."""
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE,
+                 concurrency=DEFAULT_CONCURRENCY):
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.max_concurrency = concurrency
+
+    def record(self, nodes, latency, sent=0, congested=False):
+        """Account for a chunk of nodes completed in latency seconds."""
+
+    def stats(self):
+        return {'chunk_size': self.chunk_size,
+                'concurrency': self.concurrency}
+
+
+class AIMDController(FixedController):
+    """Adapt the chunk size and the concurrency to the server.
+
+    Additive increase, multiplicative decrease, as TCP does with its
+    congestion window: each chunk completed grows the chunk size by a tenth
+    of the starting one and each round of chunks, as many as in flight, the
+    concurrency by one. A 409 or 503 answer, even retried successfully,
+    halves both, once per round so that the chunks which were in flight
+    when the server got busy only count once. A chunk slower than
+    target_latency or with a body larger than max_payload shrinks the chunk
+    size to what would have fit.
+
+    The chunk size and the concurrency given are the starting point, kept
+    within the min and max bounds.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE,
+                 concurrency=DEFAULT_CONCURRENCY,
+                 min_chunk_size=DEFAULT_MIN_CHUNK_SIZE,
+                 max_chunk_size=DEFAULT_MAX_CHUNK_SIZE,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 target_latency=DEFAULT_TARGET_LATENCY,
+                 max_payload=DEFAULT_MAX_PAYLOAD):
+        self.min_chunk_size = min(min_chunk_size, chunk_size)
+        self.max_chunk_size = max(max_chunk_size, chunk_size)
+        self.max_concurrency = max(max_concurrency, concurrency)
+        self.target_latency = target_latency
+        self.max_payload = max_payload
+        self.step = max(chunk_size // 10, 1)
+        self._chunk_size = float(chunk_size)
+        self._concurrency = float(concurrency)
+        self._completed = 0
+        self._decreased_at = None
+        self.increases = 0
+        self.decreases = 0
+        self.congested = 0
+        self._lock = threading.Lock()
+
+    @property
+    def chunk_size(self):
+        return int(self._chunk_size)
+
+    @property
+    def concurrency(self):
+        return int(self._concurrency)
+
+    def record(self, nodes, latency, sent=0, congested=False):
+        with self._lock:
+            self._completed += 1
+            if congested:
+                self.congested += 1
+                if (self._decreased_at is not None and
+                        self._completed - self._decreased_at <
+                        self.concurrency):
+                    return
+                self._decreased_at = self._completed
+                self._decrease(self._chunk_size / 2, self._concurrency / 2)
+                return
+            # NOTE(chenglch): the chunks are not all of the current size,
+            # the limits are scaled from the chunk measured.
+            fit = self.max_chunk_size
+            if latency > 0:
+                fit = min(fit, nodes * self.target_latency / latency)
+            if sent:
+                fit = min(fit, nodes * float(self.max_payload) / sent)
+            if fit < self._chunk_size:
+                self._decrease(fit, self._concurrency)
+                return
+            self.increases += 1
+            self._chunk_size = min(self._chunk_size + self.step, fit)
+            self._concurrency = min(
+                self._concurrency + 1.0 / self._concurrency,
+                self.max_concurrency)
+
+    def _decrease(self, chunk_size, concurrency):
+        self.decreases += 1
+        self._chunk_size = max(chunk_size, self.min_chunk_size)
+        self._concurrency = max(concurrency, 1.0)
+        LOG.debug("Reduced the chunks to %(size)d nodes, %(concurrency)d in "
+                  "flight", {'size': self.chunk_size,
+                             'concurrency': self.concurrency})
+
+    def stats(self):
+        return {'chunk_size': self.chunk_size,
+                'concurrency': self.concurrency,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'congested': self.congested}
+
+
+def _is_coroutine_function(func):
+    iscoroutinefunction = getattr(inspect, 'iscoroutinefunction', None)
+    return iscoroutinefunction is not None and iscoroutinefunction(func)
+
+
+class BulkEngine(object):
+    """Run an operation over chunks of nodes.
+
+    :param chunk_size: maximum number of nodes of a call.
+    :param concurrency: maximum number of calls in flight.
+    :param executor: one of EXECUTORS.
+    :param adaptive: adapt the chunk size and the concurrency to the
+        latency of the calls and the 409 and 503 answers, see
+        AIMDController. Coroutine functions keep the starting values.
+    :param probe: callable returning the ``sent`` bytes and the
+        ``congested`` answers of the last request of the calling thread,
+        such as HttpClient.last_request_stats.
+    :param max_concurrency: bound of the adaptive concurrency, such as the
+        size of the connection pool.
+    :param node_retries: number of rounds re-submitting the nodes which
+        failed, alone, see iter_results.
+    :param node_retry_interval: base (in seconds) of the exponential
+        backoff between the rounds.
+    :param journal: :class:`xcat3client.common.journal.Journal` recording
+        the chunks and the node results of iter_results and run, the nodes
+        it completed already are skipped.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE,
+                 concurrency=DEFAULT_CONCURRENCY, executor=DEFAULT_EXECUTOR,
+                 adaptive=False, probe=None,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 node_retries=DEFAULT_NODE_RETRIES,
+                 node_retry_interval=DEFAULT_NODE_RETRY_INTERVAL,
+                 journal=None):
+        if chunk_size < 1 or concurrency < 1:
+            raise ValueError(_("chunk size and concurrency must be positive"))
+        if node_retries < 0 or node_retry_interval < 0:
+            raise ValueError(_("node retries and their interval must not be "
+                               "negative"))
+        if executor not in EXECUTORS:
+            raise ValueError(_("unknown executor %s") % executor)
+        self.executor = executor
+        if adaptive:
+            self.controller = AIMDController(
+                chunk_size, concurrency, max_concurrency=max_concurrency)
+        else:
+            self.controller = FixedController(chunk_size, concurrency)
+        self.probe = probe
+        self.node_retries = node_retries
+        self.node_retry_interval = node_retry_interval
+        self.journal = journal
+
+    def _measured(self, func):
+        """Return func reporting the calls to the controller."""
+        controller = self.controller
+        probe = self.probe
+        if (type(controller) is FixedController or
+                _is_coroutine_function(func)):
+            return func
+
+        def call(chunk):
+            start = time.time()
+            try:
+                result = func(chunk)
+            except _CONGESTION_ERRORS:
+                controller.record(len(chunk), time.time() - start,
+                                  congested=True)
+                raise
+            stats = probe() if probe is not None else {}
+            controller.record(len(chunk), time.time() - start,
+                              stats.get('sent', 0),
+                              bool(stats.get('congested')))
+            return result
+        return call
+
+    @staticmethod
+    def _call(func, chunk):
+        try:
+            return chunk, func(chunk), None
+        except CHUNK_ERRORS as e:
+            return chunk, None, e
+
+    @staticmethod
+    def _wait(chunk, future, deadline):
+        from concurrent import futures
+        timeout = None
+        if deadline is not None:
+            timeout = max(deadline - time.time(), 0)
+        try:
+            return chunk, future.result(timeout), None
+        except futures.TimeoutError:
+            future.cancel()
+            return chunk, None, exc.DeadlineExceeded(408,
+                                                     message=DEADLINE_RESULT)
+        except CHUNK_ERRORS as e:
+            return chunk, None, e
+
+    @staticmethod
+    def _running(window):
+        return sum(1 for index, chunk, future in window
+                   if future is not None and not future.done())
+
+    def imap(self, func, items, timeout=None, ordered=True):
+        """Call func on each chunk of items.
+
+        At most ``concurrency`` chunks are in flight and twice the maximum
+        concurrency pending, so the memory used does not grow with the
+        number of nodes. The size of a chunk is read from the controller
+        when it is sent.
+
+        :param func: callable taking a chunk.
+        :param timeout: seconds the whole operation may take, the chunks
+            not completed by then fail with DeadlineExceeded.
+        :param ordered: yield the chunks in order, otherwise as they
+            complete, so a slow chunk does not hold back the others.
+        :returns: generator over (chunk, result, error), the error being
+            one of CHUNK_ERRORS raised by func, or None.
+        """
+        for index, chunk, result, error in self._imap(func, items, timeout,
+                                                      ordered):
+            yield chunk, result, error
+
+    def _imap(self, func, items, timeout, ordered):
+        from concurrent import futures
+        controller = self.controller
+        pending = chunks(items, lambda: controller.chunk_size)
+        head = list(itertools.islice(pending, 2))
+        if len(head) < 2:
+            # NOTE(chenglch): a single call is run by the caller, as if
+            # there were no engine.
+            for chunk in head:
+                yield (0,) + self._call(func, chunk)
+            return
+        call = self._measured(func)
+        pending = enumerate(itertools.chain(head, pending))
+        deadline = time.time() + timeout if timeout is not None else None
+        executor = _make_executor(self.executor, controller.max_concurrency)
+        window = collections.deque()
+        try:
+            while True:
+                while (pending is not None and
+                       len(window) < 2 * controller.max_concurrency and
+                       self._running(window) < controller.concurrency):
+                    index, chunk = next(pending, (None, None))
+                    if chunk is None:
+                        pending = None
+                    elif deadline is not None and time.time() >= deadline:
+                        window.append((index, chunk, None))
+                    else:
+                        window.append((index, chunk,
+                                       executor.submit(call, chunk)))
+                if not window:
+                    return
+                expired = deadline is not None and time.time() >= deadline
+                if ordered:
+                    ready = [window[0]] if (expired or
+                                            self._done(window[0])) else []
+                else:
+                    ready = list(window) if expired else [
+                        item for item in window if self._done(item)]
+                for item in ready:
+                    window.remove(item)
+                    yield self._result(item, deadline)
+                if ready:
+                    continue
+                timeout = None
+                if deadline is not None:
+                    timeout = max(deadline - time.time(), 0)
+                futures.wait([f for i, c, f in window
+                              if f is not None and not f.done()],
+                             timeout, futures.FIRST_COMPLETED)
+        finally:
+            for index, chunk, future in window:
+                if future is not None:
+                    future.cancel()
+            executor.shutdown()
+
+    @staticmethod
+    def _done(item):
+        return item[2] is None or item[2].done()
+
+    def _result(self, pending, deadline):
+        index, chunk, future = pending
+        if future is None:
+            return index, chunk, None, exc.DeadlineExceeded(
+                408, message=DEADLINE_RESULT)
+        return (index,) + self._wait(chunk, future, deadline)
+
+    def _results(self, func, items, timeout, hold=True):
+        # NOTE(chenglch): with hold the failed chunks are held until a chunk
+        # succeeds or the deadline expires, the first error is raised if
+        # none did.
+        held = []
+        errors = {}
+        streaming = not hold
+        for index, chunk, result, error in self._imap(func, items, timeout,
+                                                      ordered=False):
+            if error is None:
+                nodes = result['nodes']
+                streaming = True
+            else:
+                errors[index] = error
+                if isinstance(error, exc.DeadlineExceeded):
+                    message = DEADLINE_RESULT
+                    streaming = True
+                else:
+                    LOG.debug("Chunk of %(count)d nodes failed: %(err)s",
+                              {'count': len(chunk), 'err': error})
+                    message = six.text_type(error)
+                nodes = collections.OrderedDict.fromkeys(chunk_names(chunk),
+                                                         message)
+            if not streaming:
+                held.append((index, chunk, nodes, error))
+                continue
+            for item in held:
+                yield item
+            held = []
+            yield index, chunk, nodes, error
+        if held:
+            raise errors[min(errors)]
+
+    def _retry_interval(self, attempt):
+        interval = min(self.node_retry_interval * 2 ** attempt,
+                       DEFAULT_NODE_RETRY_MAX_INTERVAL)
+        return random.uniform(interval / 2.0, interval)
+
+    def _journaled(self, func, items, timeout):
+        journal = self.journal
+        if journal is None:
+            return self._rounds(func, items, timeout)
+
+        def call(chunk):
+            journal.submitted(chunk)
+            return func(chunk)
+        return self._record(self._rounds(call, journal.pending(items),
+                                         timeout))
+
+    def _record(self, results):
+        for key, nodes in results:
+            self.journal.record(nodes)
+            yield key, nodes
+
+    def _rounds(self, func, items, timeout):
+        """Yield ((round, index), nodes) of each chunk of each round."""
+        deadline = time.time() + timeout if timeout is not None else None
+        succeeded = False
+        for attempt in range(self.node_retries + 1):
+            last = attempt == self.node_retries
+            remaining = None
+            if deadline is not None:
+                remaining = max(deadline - time.time(), 0)
+            failed = collections.OrderedDict()
+            retry = nodeset.NodeSet() if isinstance(
+                items, nodeset.NodeSet) else []
+            for index, chunk, nodes, error in self._results(
+                    func, items, remaining, hold=last and not succeeded):
+                succeeded = succeeded or error is None
+                if not last:
+                    nodes = self._take_failed(chunk, nodes, failed, retry)
+                if nodes:
+                    yield (attempt, index), nodes
+            if not failed:
+                return
+            interval = self._retry_interval(attempt)
+            if deadline is not None and time.time() + interval >= deadline:
+                LOG.debug("Deadline expires before the next round, not "
+                          "retrying %d nodes", len(failed))
+                yield (attempt + 1, 0), failed
+                return
+            LOG.debug("Retrying %(count)d failed nodes in %(interval).1fs, "
+                      "round %(round)d of %(rounds)d",
+                      {'count': len(failed), 'interval': interval,
+                       'round': attempt + 1, 'rounds': self.node_retries})
+            time.sleep(interval)
+            items = retry
+
+    @staticmethod
+    def _take_failed(chunk, nodes, failed, retry):
+        """Move the failed nodes of a chunk to failed and their items to retry.
+
+        :returns: the results of the other nodes.
+        """
+        names = set(name for name, result in six.iteritems(nodes)
+                    if result not in SUCCESS_RESULTS and
+                    result != DEADLINE_RESULT)
+        if not names:
+            return nodes
+        for name, result in six.iteritems(nodes):
+            if name in names:
+                failed[name] = result
+        if isinstance(retry, nodeset.NodeSet):
+            retry.update(names)
+        else:
+            retry.extend(item for item in chunk
+                         if (item['name'] if isinstance(item, dict)
+                             else item) in names)
+        return collections.OrderedDict(
+            (name, result) for name, result in six.iteritems(nodes)
+            if name not in names)
+
+    def iter_results(self, func, items, timeout=None):
+        """Call func on each chunk and yield the node result maps.
+
+        The maps are yielded as the chunks complete, the nodes of a failed
+        chunk get the error message as result, those of the chunks not
+        completed in time DEADLINE_RESULT.
+
+        With node_retries, the nodes whose result is not one of
+        SUCCESS_RESULTS are taken out of the maps and sent again, alone,
+        after a backoff. Those still failing after the last round, or when
+        the deadline would expire before it, are yielded with their last
+        result.
+
+        :param func: callable taking a chunk and returning
+            ``{'nodes': {name: result}}``.
+        :returns: generator over the ``{name: result}`` map of each chunk.
+        :raises: the error of the first chunk if every chunk failed with
+            an error other than the deadline expiring.
+        """
+        for key, nodes in self._journaled(func, items, timeout):
+            yield nodes
+
+    def run(self, func, items, timeout=None):
+        """Call func on each chunk and merge the node result maps.
+
+        The results are taken as the chunks complete and merged in chunk
+        order, the retried nodes after the others, see iter_results.
+
+        :returns: ``{'nodes': {name: result}}``.
+        """
+        parts = dict(self._journaled(func, items, timeout))
+        merged = collections.OrderedDict()
+        for key in sorted(parts):
+            merged.update(parts.pop(key))
+        return {'nodes': merged}
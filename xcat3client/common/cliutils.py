@@ -20,9 +20,9 @@
 from __future__ import print_function
 
 import os
-import json
 import sys
 import argparse
+from xcat3client.common import codec
 from xcat3client.common.i18n import _
 
 
@@ -101,16 +101,23 @@ def print_list(objs, json_flag=False):
     """Print a list of objects or dict as a table, one row per object or dict.
 
     :param objs: iterable of :class:`Resource`
-    :param json_flag: print the list as JSON instead of table
+    :param json_flag: print the list as JSON instead of table, one element
+        at a time
     """
     if json_flag:
-        json.dumps(objs)
+        empty = True
+        for item in objs:
+            print(('[' if empty else ', ') + codec.dumps(item), end='')
+            empty = False
+        print('[]' if empty else ']')
         return
 
-    if not objs:
-        print(_("Could not find any resource."))
+    empty = True
     for item in objs:
+        empty = False
         print(item)
+    if empty:
+        print(_("Could not find any resource."))
 
 
 def print_dict(dct):
@@ -122,7 +129,27 @@ def print_dict(dct):
         print('Could not find any record')
         return
 
-    print(json.dumps(dct,indent=4, sort_keys=False, ensure_ascii=False))
+    print(codec.dumps(dct, pretty=True))
+
+
+def print_dict_iter(objs):
+    """Print an iterable of `dict` as a JSON array, one element at a time.
+
+    The output matches :func:`print_dict` on a list while only one element
+    is held in memory.
+
+    :param objs: iterable of `dict` to print
+    """
+    empty = True
+    for obj in objs:
+        text = codec.dumps(obj, pretty=True)
+        text = '    ' + text.replace('\n', '\n    ')
+        print('[\n' + text if empty else ',\n' + text, end='')
+        empty = False
+    if empty:
+        print('Could not find any record')
+        return
+    print('\n]')
 
 
 def service_type(stype):
@@ -0,0 +1,130 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+JSON codec used on the hot paths of the client.
+
+The fastest installed backend is picked, in this order: ``orjson``,
+``ujson``, then the standard ``json`` module. Set env[XCAT3_JSON_CODEC] to
+one of these names to force a backend.
+"""
+
+import json
+import os
+
+import six
+
+NAME = None
+
+# NOTE(chenglch): orjson escapes control characters within strings, so this
+# one can mark the indentation while it is rewritten.
+_MARK = u'\x01'
+
+
+def _double_indent(text):
+    """Turn a JSON text indented by 2 spaces into one indented by 4.
+
+    Indentation is the only whitespace following a newline as strings can
+    not hold raw newlines. One str.replace per nesting level, deepest first,
+    is much faster than a regular expression over every line.
+    """
+    depth = 0
+    while u'\n' + u'  ' * (depth + 1) in text:
+        depth += 1
+    for level in range(depth, 0, -1):
+        text = text.replace(u'\n' + u'  ' * level, u'\n' + _MARK * level)
+    return text.replace(_MARK, u'    ')
+
+
+def _std_dumps(obj, pretty=False):
+    if pretty:
+        return json.dumps(obj, indent=4, separators=(',', ': '),
+                          ensure_ascii=False)
+    return json.dumps(obj)
+
+
+def _std_dumpb(obj):
+    return json.dumps(obj).encode('utf-8')
+
+
+def _std_loads(data):
+    if isinstance(data, six.binary_type):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def _load_orjson():
+    import orjson
+
+    def dumps(obj, pretty=False):
+        if pretty:
+            text = orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode(
+                'utf-8')
+            return _double_indent(text)
+        return orjson.dumps(obj).decode('utf-8')
+
+    return dumps, orjson.dumps, orjson.loads
+
+
+def _load_ujson():
+    import ujson
+
+    def dumps(obj, pretty=False):
+        if pretty:
+            return ujson.dumps(obj, indent=4, ensure_ascii=False,
+                               escape_forward_slashes=False)
+        return ujson.dumps(obj, escape_forward_slashes=False)
+
+    def dumpb(obj):
+        return dumps(obj).encode('utf-8')
+
+    return dumps, dumpb, ujson.loads
+
+
+_BACKENDS = [('orjson', _load_orjson), ('ujson', _load_ujson)]
+
+
+def use(name=None):
+    """Select the codec backend.
+
+    :param name: 'orjson', 'ujson' or 'json'. When None the first importable
+        backend is used.
+    :raises: ImportError if the requested backend is not installed.
+    """
+    global NAME, dumps, dumpb, loads
+    for backend, loader in _BACKENDS:
+        if name in (None, backend):
+            try:
+                dumps, dumpb, loads = loader()
+            except ImportError:
+                if name:
+                    raise
+                continue
+            NAME = backend
+            return
+    if name not in (None, 'json'):
+        raise ImportError("Unknown JSON codec %s" % name)
+    dumps, dumpb, loads = _std_dumps, _std_dumpb, _std_loads
+    NAME = 'json'
+
+
+# The functions of the selected backend:
+#   dumps(obj, pretty=False): JSON text, pretty indents by 4 spaces and keeps
+#       non-ASCII characters, the format used to print results.
+#   dumpb(obj): UTF-8 encoded JSON bytes.
+#   loads(data): object decoded from JSON text or UTF-8 bytes, raises
+#       ValueError on invalid data.
+dumps = _std_dumps
+dumpb = _std_dumpb
+loads = _std_loads
+
+use(os.environ.get('XCAT3_JSON_CODEC') or None)
@@ -0,0 +1,80 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Files read by tools/xcat3.bash_completion.
+
+The names of the resources listed through an endpoint are kept in
+``<cache dir>/<endpoint>/<resource>-cache``, one name per line, and the
+commands and options of the CLI in ``<cache dir>/commands``. Completion
+reads them without starting the client nor calling the API.
+"""
+
+import logging
+import os
+import re
+import time
+
+import six.moves.urllib.parse as urlparse
+
+from xcat3client.common import utils
+
+LOG = logging.getLogger(__name__)
+
+# NOTE(chenglch): a script polling the node list every few seconds would
+# otherwise rewrite all the names of the cluster each time.
+DEFAULT_TTL = 60
+
+
+def commands_file():
+    """Return the file holding the commands and options of the CLI."""
+    return utils.get_cache_dir('commands')
+
+
+def _endpoint_dir(endpoint):
+    parts = urlparse.urlparse(endpoint)
+    return re.sub(r'[^\w.:-]+', '_', parts.netloc + parts.path).strip('_')
+
+
+class CompletionCache(object):
+    """Name caches of the resources of one endpoint.
+
+    :param ttl: a cache written less than ``ttl`` seconds ago is not
+        rewritten.
+    """
+
+    def __init__(self, endpoint, ttl=DEFAULT_TTL):
+        self.directory = utils.get_cache_dir(_endpoint_dir(endpoint))
+        self.ttl = ttl
+
+    def path(self, resource):
+        return os.path.join(self.directory, '%s-cache' % resource)
+
+    def fresh(self, resource):
+        """Whether the cache of resource was written within the TTL."""
+        try:
+            mtime = os.path.getmtime(self.path(resource))
+        except OSError:
+            return False
+        return time.time() - mtime < self.ttl
+
+    def write(self, resource, names):
+        """Replace the cached names of resource.
+
+        :param names: iterable of names, empty ones are skipped.
+        """
+        contents = ''.join('%s\n' % name for name in names if name)
+        try:
+            utils.write_atomic(self.path(resource), contents)
+        except (IOError, OSError) as e:
+            LOG.debug("Could not write the %(resource)s completion cache: "
+                      "%(err)s", {'resource': resource, 'err': e})
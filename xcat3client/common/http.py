@@ -14,16 +14,31 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import copy
+from email import utils as email_utils
 import functools
-import json
 import logging
+import random
+import threading
 import time
+import zlib
+
 import requests
+from requests import adapters
+from requests.packages.urllib3 import exceptions as urllib3_exceptions
+import six
 import six.moves.urllib.parse as urlparse
 
 from xcat3client.common.apiclient import exception
+from xcat3client.common import balancer
+from xcat3client.common import breaker
+from xcat3client.common import codec
+from xcat3client.common import completion
+from xcat3client.common import httpcache
+from xcat3client.common import jsonstream
 from xcat3client.common import utils
+from xcat3client.common.i18n import _
 from xcat3client.common.i18n import _LE
 from xcat3client import exc
 
@@ -31,27 +46,54 @@ LOG = logging.getLogger(__name__)
 
 DEFAULT_MAX_RETRIES = 5
 DEFAULT_RETRY_INTERVAL = 2
+DEFAULT_RETRY_MAX_INTERVAL = 30
+DEFAULT_RETRY_BUDGET = 20
+DEFAULT_RETRY_BUDGET_WINDOW = 60
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_KEEPALIVE_TIMEOUT = 60
+DEFAULT_COMPRESS_THRESHOLD = 16 * 1024
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 600
+DEFAULT_FALLBACK_TTL = 24 * 3600
+# NOTE(chenglch): media type of the bodies naming their nodes with a
+# noderange string, {"noderange": "node[1-100]"}, instead of a list of
+# {"name": ...} objects.
+NODERANGE_CONTENT_TYPE = 'application/vnd.xcat3.noderange+json'
 SUPPORTED_ENDPOINT_SCHEME = ('http', 'https')
-API_VERSION = '/v1'
+API_VERSION = balancer.API_VERSION
 
 
-def _trim_endpoint_api_version(url):
-    """Trim API version and trailing slash from endpoint."""
-    return url.rstrip('/').rstrip(API_VERSION)
+_trim_endpoint_api_version = balancer.trim_endpoint_api_version
 
 
 def _extract_error_json(body):
-    """Return  error_message from the HTTP response body."""
-    error_json = {}
+    """Return  error_message from the HTTP response body.
+
+    :param body: the decoded response body, raw JSON is decoded first.
+    """
+    if isinstance(body, (six.binary_type, six.text_type)):
+        try:
+            body = codec.loads(body)
+        except ValueError:
+            return {}
+    if not isinstance(body, dict) or 'error_message' not in body:
+        return {}
+    raw_msg = body['error_message']
+    if isinstance(raw_msg, dict):
+        return raw_msg
     try:
-        body_json = json.loads(body)
-        if 'error_message' in body_json:
-            raw_msg = body_json['error_message']
-            error_json = json.loads(raw_msg)
-    except ValueError:
-        pass
+        error_json = codec.loads(raw_msg)
+    except (TypeError, ValueError):
+        return {}
+    return error_json if isinstance(error_json, dict) else {}
+
 
-    return error_json
+def _decode_text(content):
+    """Text of a response body for messages and logs, never guessing."""
+    if isinstance(content, six.binary_type):
+        return content.decode('utf-8', 'replace')
+    return content
 
 
 def get_server(endpoint):
@@ -62,8 +104,298 @@ def get_server(endpoint):
     return parts.hostname, str(parts.port)
 
 
+def _parse_response(resp, content, url, method):
+    """Decode the JSON body of a response, raising on HTTP errors.
+
+    The body is decoded once, straight from its UTF-8 bytes: ``resp.text``
+    would run a character set detection over the whole body first when the
+    server does not send a charset.
+
+    :param resp: response object exposing ``status_code`` and ``headers``.
+    :param content: the raw response body.
+    :returns: the deserialized body or None.
+    """
+    if content:
+        if resp.status_code == 400:
+            text = _decode_text(content)
+            if ('Connection refused' in text or
+                    'actively refused' in text):
+                raise exception.ConnectionRefused(text)
+        try:
+            body = codec.loads(content)
+        except ValueError:
+            body = None
+    else:
+        body = None
+
+    if resp.status_code >= 400:
+        error = exception.from_response(resp, body, url, method,
+                                        _extract_error_json(body))
+        retry_after = resp.headers.get('Retry-After')
+        if retry_after is not None:
+            error.retry_after = _parse_retry_after(retry_after)
+        raise error
+
+    return body
+
+
 _RETRY_EXCEPTIONS = (exc.Conflict, exc.ServiceUnavailable,
-                     exc.ConnectionRefused)
+                     exc.ConnectionRefused, exc.RequestTimeout,
+                     exc.ConnectionAborted)
+# NOTE(chenglch): the errors raised once the request was sent, the server
+# may have applied it: only the idempotent requests are sent again.
+_SENT_EXCEPTIONS = (exc.RequestTimeout, exc.ConnectionAborted)
+_IDEMPOTENT_METHODS = ('GET', 'HEAD', 'DELETE')
+# NOTE(chenglch): the answers of a server too busy to handle the request.
+_CONGESTION_EXCEPTIONS = (exc.Conflict, exc.ServiceUnavailable)
+
+
+def _congested(resp):
+    """Whether the server answered it is too busy to handle the request.
+
+    The endpoint is busy rather than failing, the answer is counted
+    neither as a failure nor as a success of its circuit.
+    """
+    return resp.status_code in (409, 503) and 'Retry-After' in resp.headers
+
+
+def _not_sent(error):
+    """Whether a ConnectionError was raised before the request was sent.
+
+    The connection was refused, timed out or its host name not resolved.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, urllib3_exceptions.NewConnectionError)
+
+
+def _gzip(data):
+    """Return ``data`` compressed in the gzip format."""
+    # NOTE(chenglch): gzip.compress does not exist on python 2, a deflate
+    # stream with a gzip header and trailer is the same thing.
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class CompressionStats(object):
+    """Bytes saved by gzip encoding and the time spent compressing."""
+
+    def __init__(self):
+        self.sent_raw = 0
+        self.sent_wire = 0
+        self.received_raw = 0
+        self.received_wire = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record_sent(self, raw, wire, elapsed):
+        with self._lock:
+            self.sent_raw += raw
+            self.sent_wire += wire
+            self.elapsed += elapsed
+
+    def record_received(self, raw, wire):
+        with self._lock:
+            self.received_raw += raw
+            self.received_wire += wire
+
+    def stats(self):
+        return {'sent_raw': self.sent_raw,
+                'sent_wire': self.sent_wire,
+                'received_raw': self.received_raw,
+                'received_wire': self.received_wire,
+                'elapsed': self.elapsed}
+
+
+class NoderangeStats(object):
+    """Bytes saved by sending noderanges instead of node lists."""
+
+    def __init__(self):
+        self.requests = []  # [(url, compact bytes, expanded bytes), ...]
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def record(self, url, compact, expanded):
+        with self._lock:
+            self.requests.append((url, compact, expanded))
+
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self):
+        sent = sum(compact for _, compact, _ in self.requests)
+        expanded = sum(size for _, _, size in self.requests)
+        return {'requests': len(self.requests),
+                'sent': sent,
+                'saved': max(expanded - sent, 0),
+                'fallbacks': self.fallbacks}
+
+
+def default_fallback_file():
+    return utils.get_cache_dir('fallbacks.json')
+
+
+def _rejects_body(resp, header):
+    """Whether the server rejected the encoding or media type of the body.
+
+    415 says so, a 400 only when its message names the header concerned,
+    any other 400 is an error of the request itself.
+    """
+    if resp.status_code == 415:
+        return True
+    return (resp.status_code == 400 and
+            header.lower() in _decode_text(resp.content).lower())
+
+
+class FallbackPaths(object):
+    """The paths of each endpoint which rejected a body encoding.
+
+    With a ``state_file`` they are saved and loaded back for ``ttl``
+    seconds, so the following CLI invocations do not send first a request
+    bound to be rejected.
+    """
+
+    def __init__(self, state_file=None, ttl=DEFAULT_FALLBACK_TTL):
+        self.state_file = state_file
+        self.ttl = ttl
+        # {endpoint: {encoding: {path: time it was rejected}}}
+        self._paths = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _read(self):
+        try:
+            with open(self.state_file, 'rb') as f:
+                endpoints = codec.loads(f.read())
+        except (IOError, OSError, ValueError):
+            return {}
+        return endpoints if isinstance(endpoints, dict) else {}
+
+    def _load(self):
+        if not self.state_file:
+            return
+        now = time.time()
+        for endpoint, encodings in self._read().items():
+            self._paths[endpoint] = dict(
+                (encoding, dict((path, stamp)
+                                for path, stamp in paths.items()
+                                if now - stamp < self.ttl))
+                for encoding, paths in encodings.items())
+
+    def _save(self):
+        if not self.state_file:
+            return
+        endpoints = self._read()
+        for endpoint, encodings in self._paths.items():
+            saved = endpoints.setdefault(endpoint, {})
+            for encoding, paths in encodings.items():
+                saved.setdefault(encoding, {}).update(paths)
+        try:
+            utils.write_atomic(self.state_file, codec.dumps(endpoints))
+        except (IOError, OSError) as e:
+            LOG.debug("Could not save the rejected body encodings: %s", e)
+
+    def rejected(self, endpoint, encoding, path):
+        """Whether path of the endpoint rejected the encoding."""
+        return path in self._paths.get(endpoint, {}).get(encoding, ())
+
+    def add(self, endpoint, encoding, path):
+        with self._lock:
+            self._paths.setdefault(endpoint, {}).setdefault(
+                encoding, {})[path] = time.time()
+            self._save()
+
+
+def _parse_retry_after(value):
+    """Return the seconds to wait from a Retry-After header value.
+
+    The header carries either a number of seconds or an HTTP date.
+    """
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        date = email_utils.parsedate_tz(value)
+        if date is None:
+            return 0
+        return max(email_utils.mktime_tz(date) - time.time(), 0)
+
+
+class RetryBudget(object):
+    """Cap the number of retries a client may issue within a time window.
+
+    Once the budget is spent the failing request is not retried, so a busy
+    xCAT3 API is not flooded with retries from every thread of the client.
+    A budget of 0 means retries are unlimited.
+    """
+
+    def __init__(self, budget=DEFAULT_RETRY_BUDGET,
+                 window=DEFAULT_RETRY_BUDGET_WINDOW):
+        self.budget = budget
+        self.window = window
+        self.retries = 0
+        self.retry_time = 0.0
+        self.exhausted = 0
+        self._stamps = collections.deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one retry from the budget, return False if none is left."""
+        with self._lock:
+            now = time.time()
+            if self.budget:
+                while self._stamps and now - self._stamps[0] > self.window:
+                    self._stamps.popleft()
+                if len(self._stamps) >= self.budget:
+                    self.exhausted += 1
+                    return False
+                self._stamps.append(now)
+            self.retries += 1
+            return True
+
+    def record_time(self, elapsed):
+        with self._lock:
+            self.retry_time += elapsed
+
+    def stats(self):
+        return {'retries': self.retries,
+                'retry_time': self.retry_time,
+                'exhausted': self.exhausted}
+
+
+def _backoff_interval(base, cap, previous):
+    """Decorrelated jitter exponential backoff."""
+    return min(cap, random.uniform(base, max(previous, base) * 3))
+
+
+def _retry_interval(client, error, attempt, num_attempts, previous):
+    """Return the time to sleep before the next attempt, None to give up.
+
+    A Retry-After sent by the server takes precedence over the backoff.
+    """
+    msg = (_LE("Error contacting xcat3 server: %(error)s. "
+               "Attempt %(attempt)d of %(total)d") %
+           {'attempt': attempt,
+            'total': num_attempts,
+            'error': error})
+    if attempt == num_attempts:
+        LOG.error(msg)
+        return None
+    if not client.retry_budget.acquire():
+        LOG.error(msg)
+        LOG.error(_LE("Retry budget of %(budget)d retries per %(window)ss "
+                      "exhausted, giving up."),
+                  {'budget': client.retry_budget.budget,
+                   'window': client.retry_budget.window})
+        return None
+    LOG.debug(msg)
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after:
+        return retry_after
+    return _backoff_interval(client.conflict_retry_interval,
+                             client.retry_max_interval, previous)
 
 
 def with_retries(func):
@@ -77,41 +409,138 @@ def with_retries(func):
             self.conflict_retry_interval = DEFAULT_RETRY_INTERVAL
 
         num_attempts = self.conflict_max_retries + 1
+        interval = self.conflict_retry_interval
+        self._local.congested = 0
+        # NOTE(chenglch): a retry costs its backoff and the attempt it
+        # sends again, not the attempt which failed.
+        retry_start = None
         for attempt in range(1, num_attempts + 1):
             try:
                 return func(self, url, method, **kwargs)
             except _RETRY_EXCEPTIONS as error:
-                msg = (_LE("Error contacting xcat3 server: %(error)s. "
-                           "Attempt %(attempt)d of %(total)d") %
-                       {'attempt': attempt,
-                        'total': num_attempts,
-                        'error': error})
-                if attempt == num_attempts:
-                    LOG.error(msg)
+                if (isinstance(error, _SENT_EXCEPTIONS) and
+                        method not in _IDEMPOTENT_METHODS):
+                    raise
+                if isinstance(error, _CONGESTION_EXCEPTIONS):
+                    self._local.congested += 1
+                interval = _retry_interval(self, error, attempt,
+                                           num_attempts, interval)
+                if interval is None:
+                    raise
+                remaining = self.remaining_time()
+                if remaining is not None and interval >= remaining:
+                    LOG.error(_LE("Deadline expires in %.1fs, not retrying."),
+                              remaining)
                     raise
-                else:
-                    LOG.debug(msg)
-                    time.sleep(self.conflict_retry_interval)
+            finally:
+                if retry_start is not None:
+                    self.retry_budget.record_time(time.time() - retry_start)
+                    retry_start = None
+            retry_start = time.time()
+            time.sleep(interval)
 
     return wrapper
 
 
+class PoolStatsAdapter(adapters.HTTPAdapter):
+    """HTTPAdapter reporting how often pooled connections were reused."""
+
+    def __init__(self, *args, **kwargs):
+        super(PoolStatsAdapter, self).__init__(*args, **kwargs)
+        self._retired = {'requests': 0, 'connections': 0}
+
+    def _add_pool_stats(self, stats, pool):
+        stats['requests'] += pool.num_requests
+        stats['connections'] += pool.num_connections
+
+    def clear_idle(self):
+        """Close every pooled connection, keeping the counters."""
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools.get(key)
+            if pool is not None:
+                self._add_pool_stats(self._retired, pool)
+        self.poolmanager.clear()
+
+    def stats(self):
+        """Return a dict with the pool hits and misses so far.
+
+        A miss is a request for which a new connection had to be opened.
+        """
+        stats = dict(self._retired)
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools.get(key)
+            if pool is not None:
+                self._add_pool_stats(stats, pool)
+        misses = stats['connections']
+        return {'requests': stats['requests'],
+                'hits': max(stats['requests'] - misses, 0),
+                'misses': misses}
+
+
 class HttpClient(object):
     def __init__(self, endpoint, http_log_debug=False, timings=False,
                  max_retries=DEFAULT_MAX_RETRIES,
                  retry_interval=DEFAULT_RETRY_INTERVAL,
-                 timeout=600,
+                 timeout=DEFAULT_READ_TIMEOUT,
                  ca_file=None,
                  cert_file=None,
                  key_file=None,
-                 insecure=None, **kwargs):
-        self.endpoint_trimmed = _trim_endpoint_api_version(endpoint)
+                 insecure=None,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 deadline=None,
+                 retry_max_interval=DEFAULT_RETRY_MAX_INTERVAL,
+                 retry_budget=DEFAULT_RETRY_BUDGET,
+                 retry_budget_window=DEFAULT_RETRY_BUDGET_WINDOW,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False,
+                 keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT,
+                 compress=False,
+                 compress_threshold=DEFAULT_COMPRESS_THRESHOLD,
+                 compact_noderange=False,
+                 breaker_threshold=breaker.DEFAULT_FAILURE_THRESHOLD,
+                 breaker_reset_timeout=breaker.DEFAULT_RESET_TIMEOUT,
+                 breaker_state_file=None, fallback_state_file=None,
+                 cache_size=0, cache_bytes=httpcache.DEFAULT_CACHE_BYTES,
+                 completion_cache=False, **kwargs):
+        if isinstance(endpoint, six.string_types):
+            endpoint = endpoint.split(',')
+        self.balancer = balancer.Balancer(
+            [url.strip() for url in endpoint if url.strip()])
+        self.endpoint_trimmed = self.balancer.primary.url
+        self.breaker = breaker.CircuitBreaker(breaker_threshold,
+                                              breaker_reset_timeout,
+                                              breaker_state_file)
         self.session = requests.Session()
+        # NOTE(chenglch): with pool_block the callers wait for a free
+        # connection instead of opening extra ones which are thrown away.
+        self.adapter = PoolStatsAdapter(pool_connections=pool_connections,
+                                        pool_maxsize=pool_maxsize,
+                                        pool_block=pool_block)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.keepalive_timeout = keepalive_timeout
+        self._last_request = None
+        self.compress = compress
+        self.compress_threshold = compress_threshold
+        self.compression = CompressionStats()
+        self.cache = httpcache.ResponseCache(cache_size, cache_bytes)
+        self.completion = None
+        if completion_cache:
+            self.completion = completion.CompletionCache(
+                self.endpoint_trimmed)
+        # NOTE(chenglch): paths which rejected a gzip encoded body, they are
+        # sent uncompressed from then on.
+        self.fallbacks = FallbackPaths(fallback_state_file)
+        # NOTE(chenglch): likewise for the noderange bodies, the paths which
+        # rejected them get the expanded node list.
+        self.compact_noderange = compact_noderange
+        self.noderange = NoderangeStats()
         self.http_log_debug = http_log_debug
-        self.conflict_max_retries = kwargs.pop('max_retries',
-                                               DEFAULT_MAX_RETRIES)
-        self.conflict_retry_interval = kwargs.pop('retry_interval',
-                                                  DEFAULT_RETRY_INTERVAL)
+        self.conflict_max_retries = max_retries
+        self.conflict_retry_interval = retry_interval
+        self.retry_max_interval = retry_max_interval
+        self.retry_budget = RetryBudget(retry_budget, retry_budget_window)
         if insecure:
             self.verify_cert = False
         else:
@@ -124,10 +553,201 @@ class HttpClient(object):
         self.max_retries = max_retries
         self.retry_interval = retry_interval
         self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.set_deadline(deadline)
         self.times = []  # [("item", starttime, endtime), ...]
         self.timings = timings
+        # NOTE(chenglch): the stats of the last request of each thread, read
+        # by the bulk engine to adapt the chunks, see last_request_stats.
+        self._local = threading.local()
+
+    def set_deadline(self, seconds):
+        """Bound the time left to every following request and retry.
+
+        The deadline is shared by all the requests of the client, so the
+        chunks of a bulk operation run in parallel stop together.
+
+        :param seconds: time left from now, None or 0 for no deadline.
+        """
+        self.deadline = time.time() + seconds if seconds else None
+
+    def remaining_time(self):
+        """Return the seconds left before the deadline, None without one."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.time(), 0)
+
+    def _request_timeout(self, url):
+        """Return the (connect, read) timeout of the next request."""
+        timeout = (self.connect_timeout, self.timeout)
+        remaining = self.remaining_time()
+        if remaining is None:
+            return timeout
+        if not remaining:
+            raise exc.DeadlineExceeded(408, url=url, message=_(
+                "Deadline expired before the request could be sent."))
+        return tuple(min(t, remaining) if t else remaining for t in timeout)
+
+    def get_retry_stats(self):
+        """Return the number of retries and the time they cost."""
+        return self.retry_budget.stats()
+
+    def get_compression_stats(self):
+        """Return the bytes saved by compression and the time it cost."""
+        return self.compression.stats()
+
+    def get_noderange_stats(self):
+        """Return the bytes saved by the noderange bodies."""
+        return self.noderange.stats()
+
+    def last_request_stats(self):
+        """Return the last request of the calling thread.
+
+        :returns: dict with the bytes of the body sent and the number of
+            409 and 503 answers retried.
+        """
+        return {'sent': getattr(self._local, 'sent', 0),
+                'congested': getattr(self._local, 'congested', 0)}
+
+    def _endpoint_failure(self, endpoint):
+        self.balancer.failure(endpoint)
+        self.breaker.failure(endpoint.url)
+
+    def get_cache_stats(self):
+        """Return the hits, misses and size of the response cache."""
+        return self.cache.stats()
+
+    def get_breaker_stats(self):
+        """Return the circuit breaker state of the endpoints."""
+        return self.breaker.stats()
+
+    def discover_endpoints(self, services):
+        """Spread the requests over the online API services.
+
+        :param services: the ``services`` list returned by the API.
+        """
+        self.balancer.discover(services)
+
+    def get_endpoint_stats(self):
+        """Return the weight, requests and availability of each endpoint."""
+        return self.balancer.stats()
+
+    def get_pool_stats(self):
+        """Return the connection pool hits and misses of this client."""
+        return self.adapter.stats()
+
+    def _expire_idle_connections(self):
+        now = time.time()
+        if (self.keepalive_timeout and self._last_request is not None and
+                now - self._last_request > self.keepalive_timeout):
+            LOG.debug("Connections idle for more than %ss, closing them",
+                      self.keepalive_timeout)
+            self.adapter.clear_idle()
+        self._last_request = now
+
+    def _compress_body(self, endpoint, url, kwargs):
+        """gzip the request body if enabled and worth it for this path."""
+        data = kwargs.get('data')
+        if (not self.compress or not data or
+                len(data) < self.compress_threshold or
+                self.fallbacks.rejected(endpoint.url, 'gzip',
+                                        urlparse.urlparse(url).path)):
+            return
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+        start = time.time()
+        compressed = _gzip(data)
+        elapsed = time.time() - start
+        LOG.debug("Compressed request body from %(raw)d to %(wire)d bytes "
+                  "(ratio %(ratio).2f) in %(elapsed).3fs",
+                  {'raw': len(data), 'wire': len(compressed),
+                   'ratio': float(len(data)) / len(compressed),
+                   'elapsed': elapsed})
+        kwargs['data'] = compressed
+        kwargs['headers']['Content-Encoding'] = 'gzip'
+        kwargs['raw_data'] = (data, elapsed)
+
+    def _log_response_compression(self, resp):
+        length = resp.headers.get('Content-Length')
+        if resp.headers.get('Content-Encoding') != 'gzip' or not length:
+            return
+        raw = len(resp.content)
+        self.compression.record_received(raw, int(length))
+        LOG.debug("Received %(wire)s bytes for a %(raw)d bytes response body",
+                  {'wire': length, 'raw': raw})
+
+    def _compact_body(self, endpoint, url, kwargs):
+        """Name the nodes of the request with a noderange if enabled.
+
+        :param kwargs: the request arguments, ``compact`` is a tuple of the
+            noderange body and a callable returning the expanded body.
+        """
+        compact_body, expand = kwargs.pop('compact')
+        path = urlparse.urlparse(url).path
+        if (not self.compact_noderange or
+                self.fallbacks.rejected(endpoint.url, 'noderange', path)):
+            kwargs['body'] = expand()
+            return
+        kwargs.pop('body', None)
+        data = codec.dumpb(compact_body)
+        kwargs['data'] = data
+        kwargs['headers']['Content-Type'] = NODERANGE_CONTENT_TYPE
+        # NOTE(chenglch): the expanded size is only computed for the timings,
+        # the node list is never built otherwise.
+        expanded = len(data)
+        if self.timings or LOG.isEnabledFor(logging.DEBUG):
+            expanded = len(codec.dumpb(expand()))
+            LOG.debug("Sending a %(compact)d bytes noderange body instead of "
+                      "%(expanded)d bytes of node names",
+                      {'compact': len(data), 'expanded': expanded})
+        kwargs['expand'] = (path, expand, len(data), expanded)
+
+    def _send(self, endpoint, method, url, **kwargs):
+        """Send the request, falling back to an uncompressed body.
+
+        A server which can not decode gzip bodies answers 415, or 400
+        naming the Content-Encoding, the request is then sent again
+        uncompressed and the path remembered, see FallbackPaths. The same
+        goes for the noderange bodies, sent again as node lists on a 415 or
+        a 400 naming the Content-Type.
+        """
+        raw_data = kwargs.pop('raw_data', None)
+        expand = kwargs.pop('expand', None)
+        kwargs['timeout'] = self._request_timeout(url)
+        resp = self.session.request(method, url, **kwargs)
+        if raw_data is not None:
+            raw_data, elapsed = raw_data
+            if not _rejects_body(resp, 'Content-Encoding'):
+                self.compression.record_sent(len(raw_data),
+                                             len(kwargs['data']), elapsed)
+            else:
+                resp.close()
+                path = urlparse.urlparse(url).path
+                LOG.debug("%s does not accept gzip encoded bodies", path)
+                self.fallbacks.add(endpoint.url, 'gzip', path)
+                kwargs['data'] = raw_data
+                del kwargs['headers']['Content-Encoding']
+                kwargs['timeout'] = self._request_timeout(url)
+                resp = self.session.request(method, url, **kwargs)
+        if expand is None:
+            return resp
+        path, expand, compact, expanded = expand
+        if not _rejects_body(resp, 'Content-Type'):
+            self.noderange.record(url, compact, expanded)
+        else:
+            resp.close()
+            LOG.debug("%s does not accept noderange bodies", path)
+            self.fallbacks.add(endpoint.url, 'noderange', path)
+            self.noderange.record_fallback()
+            kwargs['data'] = codec.dumpb(expand())
+            kwargs['headers']['Content-Type'] = 'application/json'
+            kwargs['timeout'] = self._request_timeout(url)
+            resp = self.session.request(method, url, **kwargs)
+        return resp
 
     def http_log_req(self, method, url, kwargs):
+        if not LOG.isEnabledFor(logging.DEBUG):
+            return
         string_parts = ['curl -g -i']
 
         if not kwargs.get('verify', True):
@@ -138,8 +758,10 @@ class HttpClient(object):
         string_parts.append(' -H %s' % headers)
 
         if 'data' in kwargs:
-            data = json.loads(kwargs['data'])
-            string_parts.append(" -d '%s'" % json.dumps(data))
+            data = kwargs['data']
+            if isinstance(data, six.binary_type):
+                data = data.decode('utf-8')
+            string_parts.append(" -d '%s'" % data)
 
         LOG.debug("REQ: %s" % "".join(string_parts))
 
@@ -147,53 +769,103 @@ class HttpClient(object):
         if not self.http_log_debug:
             return
 
-        if resp.text and resp.status_code != 400:
-            try:
-                body = json.loads(resp.text)
-            except ValueError:
-                body = None
-        else:
-            body = None
+        LOG.debug("RESP: [%(status)s] %(headers)s\nRESP BODY: %(text)s\n",
+                  {'status': resp.status_code, 'headers': resp.headers,
+                   'text': _decode_text(resp.content)})
 
-        self._logger.debug("RESP: [%(status)s] %(headers)s\nRESP BODY: "
-                           "%(text)s\n", {'status': resp.status_code,
-                                          'headers': resp.headers,
-                                          'text': json.dumps(body)})
+    def _send_to(self, endpoint, method, url, kwargs):
+        """Send the request to endpoint, accounting for its health."""
+        self.http_log_req(method, url, kwargs)
+        self._compress_body(endpoint, url, kwargs)
+        self._local.sent = len(kwargs.get('data') or b'')
+
+        self._expire_idle_connections()
+        try:
+            resp = self._send(endpoint, method, url, **kwargs)
+        except requests.exceptions.ConnectionError as e:
+            # NOTE(chenglch): retried by with_retries, possibly on another
+            # endpoint.
+            self._endpoint_failure(endpoint)
+            if _not_sent(e):
+                raise exception.ConnectionRefused(six.text_type(e))
+            raise exc.ConnectionAborted(six.text_type(e), url=url,
+                                        method=method)
+        except requests.exceptions.Timeout as e:
+            # NOTE(chenglch): a connect timeout is a ConnectionError, this
+            # one expired reading the answer.
+            self._endpoint_failure(endpoint)
+            # NOTE(chenglch): the timeout was cut to the time left before
+            # the deadline, which then expired.
+            if self.remaining_time() == 0:
+                raise exc.DeadlineExceeded(
+                    408, url=url, method=method,
+                    message=_("Deadline expired before the server "
+                              "answered."))
+            raise exc.RequestTimeout(408, url=url, method=method,
+                                     message=six.text_type(e))
+        if _congested(resp):
+            return resp
+        if resp.status_code >= 500:
+            self._endpoint_failure(endpoint)
+        else:
+            self.balancer.success(endpoint)
+            self.breaker.success(endpoint.url)
+        return resp
 
     @with_retries
     def request(self, url, method, **kwargs):
+        # NOTE(chenglch): the endpoint is chosen first, the body encodings
+        # it rejected are not used.
+        endpoint = self.balancer.choose(self.breaker.allows)
+        self.breaker.check(endpoint.url)
+        try:
+            return self._request_to(endpoint, url, method, kwargs)
+        finally:
+            # NOTE(chenglch): a half-open circuit lets the next request
+            # probe if this one failed before telling how the endpoint is.
+            self.breaker.release(endpoint.url)
+
+    def _request_to(self, endpoint, url, method, kwargs):
         kwargs.setdefault('headers', kwargs.get('headers', {}))
         kwargs['headers']['Accept'] = 'application/json'
+        kwargs['headers']['Accept-Encoding'] = 'gzip, deflate'
+        kwargs['headers'].pop('Content-Encoding', None)
+        if 'compact' in kwargs:
+            self._compact_body(endpoint, url, kwargs)
         if 'body' in kwargs:
             kwargs['headers']['Content-Type'] = 'application/json'
             body = kwargs.pop('body')
             if body:
-                kwargs['data'] = json.dumps(body)
+                kwargs['data'] = codec.dumpb(body)
 
         kwargs['verify'] = self.verify_cert
-        url = urlparse.urljoin(self.endpoint_trimmed, url)
-        self.http_log_req(method, url, kwargs)
-
-        request_func = self.session.request
-        resp = request_func(method, url, timeout=3600.0, **kwargs)
+        cache_key = cached = None
+        if method == 'GET' and not kwargs.get('stream') and self.cache.size:
+            cache_key = (url, kwargs.get('data'))
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                kwargs['headers'].update(cached.validators())
+        elif method != 'GET':
+            # NOTE(chenglch): a weak Last-Modified validator could confirm
+            # an entry modified within the same second, drop them.
+            self.cache.invalidate(url)
+        url = urlparse.urljoin(endpoint.url, url)
+        resp = self._send_to(endpoint, method, url, kwargs)
+        if kwargs.get('stream') and resp.status_code < 400:
+            # NOTE(chenglch): the body is consumed by the caller, see
+            # get_stream.
+            return resp, None
 
         self.http_log_resp(resp)
-
-        if resp.text:
-            if resp.status_code == 400:
-                if ('Connection refused' in resp.text or
-                            'actively refused' in resp.text):
-                    raise exception.ConnectionRefused(resp.text)
-            try:
-                body = json.loads(resp.text)
-            except ValueError:
-                body = None
-        else:
-            body = None
-
-        if resp.status_code >= 400:
-            raise exception.from_response(resp, body, url, method)
-
+        self._log_response_compression(resp)
+        if cache_key is not None:
+            self.cache.record(resp.status_code == 304 and cached is not None)
+            if resp.status_code == 304 and cached is not None:
+                LOG.debug("Not modified, reusing the cached body of %s", url)
+                return resp, cached.body
+        body = _parse_response(resp, resp.content, url, method)
+        if cache_key is not None:
+            self.cache.store(cache_key, resp.headers, body, len(resp.content))
         return resp, body
 
     def _time_request(self, url, method, **kwargs):
@@ -204,6 +876,20 @@ class HttpClient(object):
     def get(self, url, **kwargs):
         return self._time_request(url, 'GET', **kwargs)
 
+    def get_stream(self, url, key, **kwargs):
+        """Issue a GET and lazily yield the elements of ``body[key]``.
+
+        The response is decoded chunk by chunk, so the memory used does not
+        depend on the number of elements returned by the server.
+        """
+        resp, body = self._time_request(url, 'GET', stream=True, **kwargs)
+        try:
+            chunks = resp.iter_content(jsonstream.CHUNK_SIZE)
+            for item in jsonstream.iter_array(chunks, key):
+                yield item
+        finally:
+            resp.close()
+
     def post(self, url, **kwargs):
         return self._time_request(url, 'POST', **kwargs)
 
@@ -220,16 +906,56 @@ class HttpClient(object):
 def _construct_http_client(endpoint=None,
                            max_retries=DEFAULT_MAX_RETRIES,
                            retry_interval=DEFAULT_RETRY_INTERVAL,
-                           timeout=600,
+                           timeout=DEFAULT_READ_TIMEOUT,
+                           connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                           deadline=None,
                            ca_file=None,
                            cert_file=None,
                            key_file=None,
-                           insecure=None):
+                           insecure=None,
+                           timings=False,
+                           retry_max_interval=DEFAULT_RETRY_MAX_INTERVAL,
+                           retry_budget=DEFAULT_RETRY_BUDGET,
+                           retry_budget_window=DEFAULT_RETRY_BUDGET_WINDOW,
+                           pool_connections=DEFAULT_POOL_CONNECTIONS,
+                           pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                           pool_block=False,
+                           keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT,
+                           compress=False,
+                           compress_threshold=DEFAULT_COMPRESS_THRESHOLD,
+                           compact_noderange=False,
+                           breaker_threshold=breaker.DEFAULT_FAILURE_THRESHOLD,
+                           breaker_reset_timeout=breaker.DEFAULT_RESET_TIMEOUT,
+                           breaker_state_file=None,
+                           fallback_state_file=None,
+                           cache_size=0,
+                           cache_bytes=httpcache.DEFAULT_CACHE_BYTES,
+                           completion_cache=False):
     return HttpClient(endpoint=endpoint,
                       max_retries=max_retries,
                       retry_interval=retry_interval,
                       timeout=timeout,
+                      connect_timeout=connect_timeout,
+                      deadline=deadline,
                       ca_file=ca_file,
                       cert_file=cert_file,
                       key_file=key_file,
-                      insecure=insecure)
+                      insecure=insecure,
+                      timings=timings,
+                      retry_max_interval=retry_max_interval,
+                      retry_budget=retry_budget,
+                      retry_budget_window=retry_budget_window,
+                      pool_connections=pool_connections,
+                      pool_maxsize=pool_maxsize,
+                      pool_block=pool_block,
+                      keepalive_timeout=keepalive_timeout,
+                      compress=compress,
+                      compress_threshold=compress_threshold,
+                      compact_noderange=compact_noderange,
+                      breaker_threshold=breaker_threshold,
+                      breaker_reset_timeout=breaker_reset_timeout,
+                      breaker_state_file=breaker_state_file,
+                      fallback_state_file=fallback_state_file,
+                      cache_size=cache_size,
+                      cache_bytes=cache_bytes,
+                      completion_cache=completion_cache)
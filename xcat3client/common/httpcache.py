@@ -0,0 +1,131 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Cache of GET responses revalidated with ETag and Last-Modified.
+"""
+
+import collections
+import threading
+
+DEFAULT_CACHE_SIZE = 128
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def resource_of(url):
+    """Return the resource a relative API URL belongs to.
+
+    ``nodes/info?fields=arch`` and ``nodes/power`` both belong to ``nodes``.
+    """
+    return url.split('?', 1)[0].strip('/').split('/', 1)[0]
+
+
+class Entry(object):
+    def __init__(self, body, size, etag, last_modified):
+        self.body = body
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def validators(self):
+        """Return the headers making the request conditional."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    """LRU cache of parsed GET bodies.
+
+    An entry is never served without the server confirming it with a 304,
+    so the cache only saves the transfer and the decoding of unchanged
+    bodies. Entries are keyed on the relative URL and the request body, as
+    some GET calls of the API carry the node list in their body.
+
+    The bodies are shared between the callers hitting the same entry, they
+    must not be modified.
+
+    :param size: maximum number of entries, 0 disables the cache.
+    :param max_bytes: maximum total size of the cached response bodies.
+    """
+
+    def __init__(self, size=DEFAULT_CACHE_SIZE,
+                 max_bytes=DEFAULT_CACHE_BYTES):
+        self.size = size
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the entry of key, None if it is not cached."""
+        if not self.size:
+            return None
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def store(self, key, headers, body, size):
+        """Cache the body of a response carrying validators.
+
+        :param headers: the response headers.
+        :param size: size in bytes of the response body.
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not self.size or not (etag or last_modified):
+            return
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = Entry(body, size, etag, last_modified)
+            self.bytes += size
+            while (len(self._entries) > self.size or
+                   self.bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def invalidate(self, url):
+        """Drop the entries of the resource modified through url."""
+        resource = resource_of(url)
+        with self._lock:
+            for key in [key for key in self._entries
+                        if resource_of(key[0]) == resource]:
+                self._remove(key)
+
+    def stats(self):
+        return {'entries': len(self._entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
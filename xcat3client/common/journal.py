@@ -0,0 +1,165 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Journal of a bulk node operation, to resume it.
+
+The journal is a JSON Lines file appended to as the chunks are sent and
+complete, the nodes being named by noderanges::
+
+    {"command": "create nodes=\"node[1-100000]\" attributes=..."}
+    {"submitted": "node[1-1000]"}
+    {"results": {"ok": "node[1-998]", "Node exists": "node[999-1000]"}}
+
+A chunk whose noderange would name other nodes when expanded, such as a
+node literally named ``n1-n3``, is written as the list of its names.
+
+Each line is written at once and flushed, a line cut short by a crash is
+skipped when the journal is read back. Resuming skips the nodes with a
+successful result, those submitted without a result are sent again.
+"""
+
+import logging
+import threading
+
+import six
+
+from xcat3client.common import bulk
+from xcat3client.common import codec
+from xcat3client.common.i18n import _
+from xcat3client.common.i18n import _LW
+from xcat3client.common import nodeset
+from xcat3client import exc
+
+LOG = logging.getLogger(__name__)
+
+
+def _encode(names):
+    """Return the NodeSet names as a noderange, or a list of names.
+
+    The list is used when the noderange would not expand to the same names.
+    """
+    text = names.to_noderange()
+    try:
+        if nodeset.NodeSet.from_noderange(text) == names:
+            return text
+    except (exc.InvalidName, ValueError):
+        pass
+    return list(names)
+
+
+def _decode(value):
+    if isinstance(value, six.string_types):
+        return nodeset.NodeSet.from_noderange(value)
+    return nodeset.NodeSet(value)
+
+
+class Journal(object):
+    """Record the chunks and node results of a bulk operation.
+
+    :param path: the journal file.
+    :param command: the command journaled, a journal is only resumed by
+        the same command.
+    :param resume: read the nodes completed from an existing journal and
+        append to it, rather than starting a new one.
+    :raises: CommandError if the journal to resume can not be read or
+        records another command.
+    """
+
+    def __init__(self, path, command, resume=False):
+        self.path = path
+        self.command = command
+        self.completed = nodeset.NodeSet()
+        self.in_flight = nodeset.NodeSet()
+        self._lock = threading.Lock()
+        if resume:
+            self._load()
+        self._file = open(path, 'a' if resume else 'w')
+        if not resume:
+            self._append({'command': command})
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except (IOError, OSError) as e:
+            raise exc.CommandError(_("Can not read the journal %(path)s: "
+                                     "%(err)s") % {'path': self.path,
+                                                   'err': e})
+        records = []
+        for number, line in enumerate(lines, 1):
+            try:
+                records.append(codec.loads(line))
+            except ValueError:
+                LOG.warning(_LW("Skipping the incomplete line %(line)d of "
+                                "the journal %(path)s"),
+                            {'line': number, 'path': self.path})
+        if (not records or not isinstance(records[0], dict) or
+                records[0].get('command') != self.command):
+            raise exc.CommandError(_(
+                "The journal %(path)s does not record this command: "
+                "%(command)s") % {'path': self.path,
+                                  'command': self.command})
+        submitted = nodeset.NodeSet()
+        answered = nodeset.NodeSet()
+        for record in records[1:]:
+            if not isinstance(record, dict):
+                continue
+            if 'submitted' in record:
+                submitted = submitted | _decode(record['submitted'])
+            for result, names in six.iteritems(record.get('results', {})):
+                names = _decode(names)
+                answered = answered | names
+                if result in bulk.SUCCESS_RESULTS:
+                    self.completed = self.completed | names
+        # NOTE(chenglch): the server may have applied the chunks in flight
+        # when the command stopped, resuming a create reports them as
+        # existing.
+        self.in_flight = submitted - answered
+
+    def pending(self, items):
+        """Return the items of the nodes not completed yet.
+
+        :param items: a NodeSet, or an iterable of node names or dicts.
+        """
+        if not self.completed:
+            return items
+        if isinstance(items, nodeset.NodeSet):
+            return items - self.completed
+        completed = self.completed
+        return (item for item in items
+                if (item['name'] if isinstance(item, dict) else item)
+                not in completed)
+
+    def submitted(self, chunk):
+        """Record a chunk of nodes about to be sent."""
+        if not isinstance(chunk, nodeset.NodeSet):
+            chunk = nodeset.NodeSet(bulk.chunk_names(chunk))
+        self._append({'submitted': _encode(chunk)})
+
+    def record(self, nodes):
+        """Record the ``{name: result}`` map of a chunk."""
+        names = {}
+        for name, result in six.iteritems(nodes):
+            names.setdefault(result, []).append(name)
+        self._append({'results': dict(
+            (result, _encode(nodeset.NodeSet(chunk)))
+            for result, chunk in six.iteritems(names))})
+
+    def _append(self, record):
+        line = codec.dumps(record) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
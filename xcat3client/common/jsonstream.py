@@ -0,0 +1,191 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Incremental decoding of the array held by a key of a JSON document.
+
+The xCAT3 API answers bulk calls with documents like ``{"nodes": [...]}``.
+:class:`ArrayDecoder` is fed with the raw chunks of such a document and hands
+back the elements of the array as soon as each of them is complete, so the
+whole document never has to be held in memory.
+"""
+
+import codecs
+import json
+import re
+
+import six
+
+from xcat3client.common.i18n import _
+
+CHUNK_SIZE = 64 * 1024
+
+_WS = re.compile(r'[ \t\n\r]*')
+_DELIMITERS = frozenset(' \t\n\r,:]}')
+
+# Parser states
+_START = 0
+_KEY = 1
+_COLON = 2
+_VALUE = 3
+_NEXT = 4
+_ARRAY = 5
+_DONE = 6
+
+
+class ArrayDecoder(object):
+    """Push parser yielding the elements of ``document[key]``.
+
+    Only the top level object is inspected; the values of other keys are
+    decoded and dropped. Everything after the array is ignored.
+
+    :param key: the top level key holding the array.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buf = u''
+        self._pos = 0
+        self._state = _START
+        self._current_key = None
+
+    @property
+    def done(self):
+        return self._state == _DONE
+
+    def _skip_ws(self):
+        self._pos = _WS.match(self._buf, self._pos).end()
+        return self._pos < len(self._buf)
+
+    def _decode_value(self, final):
+        """Decode the next value, None if the buffer does not hold it yet.
+
+        A number not followed by a delimiter may be truncated (``17`` of
+        ``17.5``), it is only accepted once the delimiter has been received.
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except ValueError:
+            if final:
+                raise
+            return None
+        if end == len(self._buf):
+            if not final:
+                return None
+        elif self._buf[end] not in _DELIMITERS:
+            if final:
+                raise self._error()
+            return None
+        self._pos = end
+        return (value,)
+
+    def _error(self):
+        return ValueError(_("Unexpected JSON data at offset %(pos)d, "
+                            "expecting the '%(key)s' array.") %
+                          {'pos': self._pos, 'key': self.key})
+
+    def _parse(self, final=False):
+        while self._state != _DONE and self._skip_ws():
+            char = self._buf[self._pos]
+            if self._state == _START:
+                if char != '{':
+                    raise self._error()
+                self._pos += 1
+                self._state = _KEY
+            elif self._state == _KEY:
+                if char == '}':
+                    self._state = _DONE
+                    break
+                decoded = self._decode_value(final)
+                if decoded is None:
+                    break
+                self._current_key = decoded[0]
+                self._state = _COLON
+            elif self._state == _COLON:
+                if char != ':':
+                    raise self._error()
+                self._pos += 1
+                self._state = _VALUE
+            elif self._state == _VALUE:
+                if self._current_key == self.key:
+                    if char != '[':
+                        raise self._error()
+                    self._pos += 1
+                    self._state = _ARRAY
+                    continue
+                if self._decode_value(final) is None:
+                    break
+                self._state = _NEXT
+            elif self._state == _NEXT:
+                if char == '}':
+                    self._state = _DONE
+                elif char == ',':
+                    self._state = _KEY
+                else:
+                    raise self._error()
+                self._pos += 1
+            elif self._state == _ARRAY:
+                if char == ']':
+                    self._state = _DONE
+                    break
+                if char == ',':
+                    self._pos += 1
+                    continue
+                decoded = self._decode_value(final)
+                if decoded is None:
+                    break
+                yield decoded[0]
+        self._compact()
+
+    def _compact(self):
+        # NOTE(chenglch): drop the consumed data so memory stays bounded by
+        # the size of one element plus one chunk.
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+
+    def feed(self, data):
+        """Feed a chunk of the document, yield the completed elements.
+
+        :param data: bytes (decoded as UTF-8) or text.
+        """
+        if isinstance(data, six.binary_type):
+            data = self._utf8.decode(data)
+        self._buf += data
+        return self._parse()
+
+    def close(self):
+        """Flush the remaining data once the document has been read."""
+        self._buf += self._utf8.decode(b'', final=True)
+        for item in self._parse(final=True):
+            yield item
+        if not self.done:
+            raise ValueError(_("Truncated JSON document, the '%s' array is "
+                               "not complete.") % self.key)
+
+
+def iter_array(chunks, key):
+    """Lazily yield the elements of ``document[key]``.
+
+    :param chunks: iterable of bytes or text chunks of the JSON document.
+    :param key: the top level key holding the array.
+    """
+    decoder = ArrayDecoder(key)
+    for chunk in chunks:
+        for item in decoder.feed(chunk):
+            yield item
+        if decoder.done:
+            return
+    for item in decoder.close():
+        yield item
@@ -0,0 +1,297 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+xCAT noderange expressions.
+
+An expression is a comma separated list of items::
+
+    node1,node[001-100]     union, zero padding is kept
+    r[1-4]n[01-32]          every combination of several ranges
+    10.0.[1-2].[1-254]      ranges anywhere in the name, e.g. IP addresses
+    node[1-9:2],node[1,5]   steps and lists within brackets
+    node01-node10           range between two names
+    /^gpu\\d+$              the known nodes matching a regular expression
+    compute[1-64]@/even$    intersection of the terms joined by @
+    compute[1-64],-node3    the items starting with - are excluded
+
+Names are generated lazily, in the order they first appear, so a range of
+millions of nodes can be consumed in batches without being materialized.
+Only the terms which have to be looked up (the excluded items and the
+ranges on the right hand side of an intersection) are held in memory.
+"""
+
+import itertools
+import re
+
+import six
+from six.moves import map
+from six.moves import range as xrange
+
+from xcat3client.common.i18n import _
+from xcat3client import exc
+
+_NAME_RANGE = re.compile(r'^(?P<prefix>.*?)(?P<start>\d+)(?P<suffix>\D*)-'
+                         r'(?P=prefix)(?P<end>\d+)(?P=suffix)$')
+_BRACKET_PART = re.compile(r'^(\d+)(?:-(\d+)(?::(\d+))?)?$')
+
+
+def _error(expression, reason):
+    return exc.InvalidName(400, message=_(
+        "Invalid noderange %(expr)s: %(reason)s") %
+        {'expr': expression, 'reason': reason})
+
+
+def _split(expression, separator):
+    """Split on the separator outside of brackets."""
+    parts = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(expression):
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(expression[start:i])
+            start = i + 1
+    parts.append(expression[start:])
+    return parts
+
+
+def _width(start):
+    """Digits to pad to, kept from a zero padded range start."""
+    return len(start) if len(start) > 1 and start.startswith('0') else 0
+
+
+class Range(object):
+    """Integers from start to end (inclusive) formatted with a width."""
+
+    def __init__(self, start, end, step=1, width=0):
+        if step < 1:
+            raise ValueError(_("range step must be positive"))
+        self.start = start
+        self.end = end
+        self.step = step if start <= end else -step
+        self.width = width
+
+    def names(self, head='', tail=''):
+        """Return an iterator over head + number + tail."""
+        fmt = '%s%%0%dd%s' % (head.replace('%', '%%'), self.width,
+                              tail.replace('%', '%%'))
+        stop = self.end + (1 if self.step > 0 else -1)
+        return map(fmt.__mod__, xrange(self.start, stop, self.step))
+
+    def __iter__(self):
+        return self.names()
+
+    def __len__(self):
+        return abs(self.end - self.start) // abs(self.step) + 1
+
+
+def _parse_bracket(expression, content):
+    """Return the ranges and values held by a bracket."""
+    parts = []
+    for part in content.split(','):
+        match = _BRACKET_PART.match(part.strip())
+        if not match:
+            raise _error(expression, _("bad range [%s]") % content)
+        start, end, step = match.groups()
+        if end is None:
+            parts.append([start])
+        else:
+            parts.append(Range(int(start), int(end), int(step or 1),
+                               _width(start)))
+    return parts
+
+
+class Pattern(object):
+    """A name with ranges, expanded into every combination.
+
+    The name is a list of segments, a segment a list of parts (a Range or a
+    one value list) which are concatenated.
+
+    The rightmost range varies the fastest: ``r[1-2]n[1-2]`` yields r1n1,
+    r1n2, r2n1, r2n2.
+    """
+
+    def __init__(self, expression):
+        self.segments = []
+        match = _NAME_RANGE.match(expression)
+        if match and '[' not in expression:
+            start, end = match.group('start'), match.group('end')
+            self.segments = [[[match.group('prefix')]],
+                             [Range(int(start), int(end), 1, _width(start))],
+                             [[match.group('suffix')]]]
+            return
+        pos = 0
+        for bracket in re.finditer(r'\[([^\[\]]*)\]', expression):
+            self.segments.append([[expression[pos:bracket.start()]]])
+            self.segments.append(_parse_bracket(expression,
+                                                bracket.group(1)))
+            pos = bracket.end()
+        tail = expression[pos:]
+        if '[' in tail or ']' in tail:
+            raise _error(expression, _("unbalanced brackets"))
+        self.segments.append([[tail]])
+
+    def _expand(self):
+        # NOTE(chenglch): the segments always end with a literal, the names
+        # of the segment before it are formatted by Range.names and only the
+        # heads, the combinations of the segments further left, are joined
+        # in python. A range of millions of nodes stays as fast as a loop.
+        tail = self.segments[-1][0][0]
+        if len(self.segments) == 1:
+            yield [tail]
+            return
+        heads = itertools.product(*[
+            [value for part in segment for value in part]
+            for segment in self.segments[:-2]])
+        for head in heads:
+            head = ''.join(head)
+            for part in self.segments[-2]:
+                if isinstance(part, Range):
+                    yield part.names(head, tail)
+                else:
+                    yield [head + value + tail for value in part]
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._expand())
+
+    @property
+    def unique(self):
+        """Whether no name can be generated twice."""
+        return all(len(segment) == 1 for segment in self.segments)
+
+    def __len__(self):
+        count = 1
+        for segment in self.segments:
+            count *= sum(len(part) for part in segment)
+        return count
+
+
+class NodeRange(object):
+    """Lazily evaluated noderange expression.
+
+    :param expression: the noderange.
+    :param universe: callable returning the known node names, only called
+        when a regular expression or an exclusion alone is evaluated.
+    :raises: InvalidName if the expression is malformed.
+    """
+
+    def __init__(self, expression, universe=None):
+        self.expression = expression
+        self._universe_func = universe
+        self._universe = None
+        self.included = []
+        self.excluded = []
+        for item in _split(expression, ','):
+            item = item.strip()
+            if not item:
+                continue
+            if item.startswith('-') and len(item) > 1:
+                self.excluded.append(self._parse_item(item[1:]))
+            else:
+                self.included.append(self._parse_item(item))
+
+    def _parse_item(self, item):
+        terms = []
+        for term in _split(item, '@'):
+            term = term.strip()
+            if not term:
+                raise _error(self.expression, _("empty term"))
+            if term.startswith('/'):
+                try:
+                    terms.append(re.compile(term[1:]))
+                except re.error as e:
+                    raise _error(self.expression, six.text_type(e))
+            else:
+                try:
+                    terms.append(Pattern(term))
+                except ValueError as e:
+                    raise _error(self.expression, six.text_type(e))
+        return terms
+
+    def known_nodes(self):
+        """Return the names listed by the universe callable, once."""
+        if self._universe is None:
+            if self._universe_func is None:
+                raise _error(self.expression,
+                             _("regular expressions and exclusions alone "
+                               "need the list of nodes"))
+            self._universe = list(self._universe_func())
+        return self._universe
+
+    def _iter_term(self, term):
+        if isinstance(term, Pattern):
+            return iter(term)
+        return (name for name in self.known_nodes() if term.search(name))
+
+    def item_names(self, terms):
+        """Return an iterator over the names of one item (a list of terms)."""
+        names = self._iter_term(terms[0])
+        for term in terms[1:]:
+            if isinstance(term, Pattern):
+                names = self._intersect(names, frozenset(term))
+            else:
+                # NOTE(chenglch): filtering by the expression does not need
+                # the list of the nodes.
+                names = self._match(names, term)
+        return names
+
+    @staticmethod
+    def _intersect(names, lookup):
+        return (name for name in names if name in lookup)
+
+    @staticmethod
+    def _match(names, regex):
+        return (name for name in names if regex.search(name))
+
+    def __iter__(self):
+        excluded = set()
+        for terms in self.excluded:
+            excluded.update(self.item_names(terms))
+        if self.included:
+            names = itertools.chain.from_iterable(
+                self.item_names(terms) for terms in self.included)
+        else:
+            names = iter(self.known_nodes() if self.excluded else ())
+        # NOTE(chenglch): the names seen are only tracked when they may be
+        # generated twice, not for a single range.
+        first = self.included[0][0] if len(self.included) == 1 else None
+        if isinstance(first, Pattern) and first.unique:
+            if not excluded:
+                return names
+            return (name for name in names if name not in excluded)
+        return self._unique(names, excluded)
+
+    @staticmethod
+    def _unique(names, excluded):
+        seen = set(excluded)
+        for name in names:
+            if name not in seen:
+                seen.add(name)
+                yield name
+
+    def batches(self, size):
+        """Yield lists of at most size names."""
+        names = iter(self)
+        while True:
+            batch = list(itertools.islice(names, size))
+            if not batch:
+                return
+            yield batch
+
+
+def expand(expression, universe=None):
+    """Return a generator over the names of a noderange expression."""
+    return iter(NodeRange(expression, universe))
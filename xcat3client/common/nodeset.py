@@ -0,0 +1,354 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compact sets of node names.
+
+A name is split on its last number into a prefix, the number and a suffix.
+The numbers sharing a prefix, a suffix and a zero padding are kept as
+sorted runs of consecutive integers, so ``node[1-1000000]`` is a single run
+rather than a million strings. A name without a number is a group of its
+own.
+
+Union, intersection and difference merge the runs, membership is a binary
+search and iteration yields the names sorted by prefix then number.
+"""
+
+import bisect
+import itertools
+import re
+
+import six
+
+from xcat3client.common import noderange
+
+_NUMBERED = re.compile(r'^(.*?)(\d+)(\D*)$')
+# NOTE(chenglch): the width of the names without a number, which are held as
+# the single number 0.
+_LITERAL = -1
+
+
+def _split_name(name):
+    """Return the key (prefix, suffix, width) and the number of name."""
+    match = _NUMBERED.match(name)
+    if not match:
+        return (name, '', _LITERAL), 0
+    prefix, digits, suffix = match.groups()
+    width = len(digits) if len(digits) > 1 and digits[0] == '0' else 0
+    return (prefix, suffix, width), int(digits)
+
+
+def _order(key):
+    # NOTE(chenglch): node[001-099] goes before node[100-120].
+    prefix, suffix, width = key
+    return prefix, suffix, -width
+
+
+def _runs_of(numbers):
+    """Return the runs [start, end] of sorted, unique numbers."""
+    runs = []
+    for number in numbers:
+        if runs and runs[-1][1] + 1 == number:
+            runs[-1][1] = number
+        else:
+            runs.append([number, number])
+    return runs
+
+
+def _collapse(numbers):
+    """Return the runs of unordered numbers, duplicates allowed.
+
+    Dense numbers, the usual case of the nodes of a cluster, are marked in a
+    bytearray scanned in C, which takes linear time. Sparse ones are sorted.
+    """
+    low, high = min(numbers), max(numbers)
+    if high - low >= 4 * len(numbers):
+        numbers.sort()
+        return _runs_of(k for k, _ in itertools.groupby(numbers))
+    present = bytearray(high - low + 1)
+    for number in numbers:
+        present[number - low] = 1
+    runs = []
+    start = 0
+    while start != -1:
+        end = present.find(b'\x00', start)
+        if end == -1:
+            end = len(present)
+        runs.append([low + start, low + end - 1])
+        start = present.find(b'\x01', end)
+    return runs
+
+
+def _union(a, b):
+    runs = []
+    for start, end in sorted(itertools.chain(a, b)):
+        if runs and start <= runs[-1][1] + 1:
+            if end > runs[-1][1]:
+                runs[-1][1] = end
+        else:
+            runs.append([start, end])
+    return runs
+
+
+def _intersection(a, b):
+    runs = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start <= end:
+            runs.append([start, end])
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return runs
+
+
+def _difference(a, b):
+    runs = []
+    j = 0
+    for start, end in a:
+        while j < len(b) and b[j][1] < start:
+            j += 1
+        k = j
+        while k < len(b) and b[k][0] <= end:
+            if b[k][0] > start:
+                runs.append([start, b[k][0] - 1])
+            start = max(start, b[k][1] + 1)
+            k += 1
+        if start <= end:
+            runs.append([start, end])
+    return runs
+
+
+def _format_runs(prefix, suffix, width, runs):
+    if len(runs) == 1 and runs[0][0] == runs[0][1]:
+        return '%s%0*d%s' % (prefix, width, runs[0][0], suffix)
+    parts = []
+    for start, end in runs:
+        if start == end:
+            parts.append('%0*d' % (width, start))
+        else:
+            parts.append('%0*d-%0*d' % (width, start, width, end))
+    return '%s[%s]%s' % (prefix, ','.join(parts), suffix)
+
+
+class NodeSet(object):
+    """Set of node names stored as runs of numbers.
+
+    :param names: iterable of node names, or a NodeSet to copy.
+    """
+
+    def __init__(self, names=None):
+        # NOTE(chenglch): key (prefix, suffix, width) -> sorted disjoint runs
+        # [start, end] of the numbers.
+        self._groups = {}
+        if isinstance(names, NodeSet):
+            self._groups = dict((key, [list(run) for run in runs])
+                                for key, runs in six.iteritems(names._groups))
+        elif names:
+            self.update(names)
+
+    @classmethod
+    def from_noderange(cls, expression, universe=None):
+        """Build the set of a noderange expression.
+
+        The items made of a single range are added as runs, without
+        generating their names.
+
+        :param universe: callable returning the known node names, see
+            :class:`xcat3client.common.noderange.NodeRange`.
+        """
+        nr = noderange.NodeRange(expression, universe)
+        result = cls()
+        for terms in nr.included:
+            result._update_item(nr, terms)
+        if not nr.included and nr.excluded:
+            result.update(nr.known_nodes())
+        excluded = cls()
+        for terms in nr.excluded:
+            excluded._update_item(nr, terms)
+        if excluded:
+            result = result - excluded
+        return result
+
+    def _update_item(self, nr, terms):
+        term = terms[0]
+        if (len(terms) == 1 and isinstance(term, noderange.Pattern) and
+                len(term.segments) == 3):
+            prefix = term.segments[0][0][0]
+            suffix = term.segments[2][0][0]
+            ranges = term.segments[1]
+            # NOTE(chenglch): the number of the names must be the last one
+            # and not run into the prefix to be grouped like _split_name.
+            if (not prefix[-1:].isdigit() and
+                    not any(c.isdigit() for c in suffix) and
+                    all(isinstance(part, noderange.Range) and
+                        abs(part.step) == 1 for part in ranges)):
+                for part in ranges:
+                    self._add_range(prefix, suffix, part.width,
+                                    min(part.start, part.end),
+                                    max(part.start, part.end))
+                return
+        self.update(nr.item_names(terms))
+
+    def _add_range(self, prefix, suffix, width, start, end):
+        # NOTE(chenglch): the numbers of a padded range long enough to have
+        # no leading zero, like 100 in [001-100], are named as unpadded.
+        bound = 10 ** (width - 1) - 1 if width else -1
+        if start <= bound:
+            self._merge((prefix, suffix, width),
+                        [[start, min(end, bound)]], _union)
+        if end > bound:
+            self._merge((prefix, suffix, 0), [[max(start, bound + 1), end]],
+                        _union)
+
+    def _merge(self, key, runs, operation):
+        merged = operation(self._groups.get(key) or [], runs)
+        if merged:
+            self._groups[key] = merged
+        else:
+            self._groups.pop(key, None)
+
+    def add(self, name):
+        key, number = _split_name(name)
+        self._merge(key, [[number, number]], _union)
+
+    def update(self, names):
+        """Add the names of an iterable."""
+        # NOTE(chenglch): _split_name inlined, this loop is run for every
+        # name of the results of a bulk call.
+        match = _NUMBERED.match
+        numbers = {}
+        key = bucket = None
+        for name in names:
+            parts = match(name)
+            if parts is None:
+                numbers[(name, '', _LITERAL)] = [0]
+                continue
+            prefix, digits, suffix = parts.groups()
+            width = len(digits) if digits[0] == '0' and len(digits) > 1 else 0
+            if key != (prefix, suffix, width):
+                key = (prefix, suffix, width)
+                bucket = numbers.setdefault(key, [])
+            bucket.append(int(digits))
+        for key, values in six.iteritems(numbers):
+            self._merge(key, _collapse(values), _union)
+
+    def discard(self, name):
+        key, number = _split_name(name)
+        if key in self._groups:
+            self._merge(key, [[number, number]], _difference)
+
+    def __contains__(self, name):
+        key, number = _split_name(name)
+        runs = self._groups.get(key)
+        if not runs:
+            return False
+        i = bisect.bisect_right(runs, [number, float('inf')]) - 1
+        return i >= 0 and runs[i][1] >= number
+
+    def __len__(self):
+        return sum(end - start + 1 for runs in six.itervalues(self._groups)
+                   for start, end in runs)
+
+    def __bool__(self):
+        return bool(self._groups)
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        for key in sorted(self._groups, key=_order):
+            prefix, suffix, width = key
+            if width == _LITERAL:
+                yield prefix
+                continue
+            for start, end in self._groups[key]:
+                for name in noderange.Range(start, end, 1, width).names(
+                        prefix, suffix):
+                    yield name
+
+    def split(self, size):
+        """Yield NodeSets of at most size names, in the iteration order.
+
+        :param size: number of names, or a callable returning the size of
+            the next NodeSet.
+        """
+        next_size = size if callable(size) else lambda: size
+        size = next_size()
+        chunk = NodeSet()
+        count = 0
+        for key in sorted(self._groups, key=_order):
+            for start, end in self._groups[key]:
+                while start <= end:
+                    take = min(end - start + 1, size - count)
+                    chunk._groups.setdefault(key, []).append(
+                        [start, start + take - 1])
+                    count += take
+                    start += take
+                    if count == size:
+                        yield chunk
+                        chunk = NodeSet()
+                        count = 0
+                        size = next_size()
+        if count:
+            yield chunk
+
+    def _combine(self, other, operation, keys):
+        if not isinstance(other, NodeSet):
+            other = NodeSet(other)
+        result = NodeSet()
+        for key in keys(other):
+            runs = operation(self._groups.get(key, []),
+                             other._groups.get(key, []))
+            if runs:
+                result._groups[key] = runs
+        return result
+
+    def union(self, other):
+        return self._combine(other, _union,
+                             lambda o: set(self._groups) | set(o._groups))
+
+    def intersection(self, other):
+        return self._combine(other, _intersection,
+                             lambda o: set(self._groups) & set(o._groups))
+
+    def difference(self, other):
+        return self._combine(other, _difference, lambda o: self._groups)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def __eq__(self, other):
+        return isinstance(other, NodeSet) and self._groups == other._groups
+
+    def __ne__(self, other):
+        return not self == other
+
+    def to_noderange(self):
+        """Return the shortest noderange of the set, one item per prefix."""
+        items = []
+        for key in sorted(self._groups, key=_order):
+            prefix, suffix, width = key
+            if width == _LITERAL:
+                items.append(prefix)
+            else:
+                items.append(_format_runs(prefix, suffix, width,
+                                          self._groups[key]))
+        return ','.join(items)
+
+    __str__ = to_noderange
+
+    def __repr__(self):
+        return 'NodeSet(%r)' % self.to_noderange()
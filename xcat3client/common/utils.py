@@ -19,13 +19,17 @@ from __future__ import print_function
 import argparse
 import contextlib
 import json
+import os
 import shutil
 import tempfile
 import time
 
+import appdirs
 from oslo_utils import importutils
 
+from xcat3client.common import codec
 from xcat3client.common.i18n import _
+from xcat3client.common import jsonstream
 from xcat3client import exc
 
 
@@ -157,11 +161,86 @@ def record_time(times, enabled, *args):
         times.append((' '.join(args), start, end))
 
 
+def get_cache_dir(*parts):
+    """Return the client cache directory (or a path below it)."""
+    return os.path.join(appdirs.user_cache_dir('python-xcat3client'), *parts)
+
+
+def write_atomic(path, contents):
+    """Replace the file at ``path``, readers never see a partial file."""
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            if not os.path.isdir(dirname):
+                raise
+    fd, tmp = tempfile.mkstemp(dir=dirname)
+    with os.fdopen(fd, 'w') as f:
+        f.write(contents)
+    os.rename(tmp, path)
+
+
 def write_to_file(path, contents):
     with open(path, 'w') as f:
         f.write(contents)
 
 
+def write_json_stream(path, key, objs):
+    """Write ``{key: [objs]}`` as JSON, one element at a time.
+
+    :param objs: iterable of JSON serializable objects.
+    """
+    with open(path, 'w') as f:
+        f.write('{"%s": [' % key)
+        for i, obj in enumerate(objs):
+            if i:
+                f.write(', ')
+            f.write(codec.dumps(obj))
+        f.write(']}')
+
+
+def _is_json_line(line, key):
+    try:
+        obj = codec.loads(line)
+    except ValueError:
+        return False
+    return isinstance(obj, dict) and key not in obj
+
+
+def read_json_stream(path, key):
+    """Lazily yield the elements of ``{key: [...]}`` stored in path.
+
+    The file may also be JSON Lines, one element per line: it is read so
+    when its first line is a whole JSON object without key. Only one chunk
+    of the file is held in memory at a time.
+
+    :raises: CommandError if the file can not be read or decoded.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(jsonstream.CHUNK_SIZE)
+            lines = _is_json_line(head.split(b'\n', 1)[0], key)
+            f.seek(0)
+            if lines:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        obj = codec.loads(line)
+                    except ValueError as e:
+                        raise ValueError(_("line %(line)d: %(err)s") %
+                                         {'line': number, 'err': e})
+                    yield obj
+            else:
+                chunks = iter(lambda: f.read(jsonstream.CHUNK_SIZE), b'')
+                for obj in jsonstream.iter_array(chunks, key):
+                    yield obj
+    except (IOError, OSError, ValueError) as e:
+        raise exc.CommandError(_("Can not read %(path)s: %(err)s") %
+                               {'path': path, 'err': e})
+
+
 def to_attrs_dict(attrs, VALID_FIELDS):
     dct = {}
     for attr in attrs:
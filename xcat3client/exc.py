@@ -63,3 +63,28 @@ def from_response(response, message=None, traceback=None, method=None,
         response.json = lambda: {'error': error_body}
 
     return exception.from_response(response, method=method, url=url)
+
+
+class CircuitOpen(ClientException):
+    """The endpoint is known to be unhealthy, the request was not sent."""
+    pass
+
+
+class DeadlineExceeded(ClientException):
+    """The deadline of the operation expired before it could complete."""
+    pass
+
+
+class RequestTimeout(ClientException):
+    """The server did not answer within the timeout of the request."""
+    pass
+
+
+class ConnectionAborted(ClientException):
+    """The connection was lost once the request was sent."""
+
+    def __init__(self, message=None, url=None, method=None):
+        super(ConnectionAborted, self).__init__(None, message, url, method)
+
+    def __str__(self):
+        return self.message
@@ -18,6 +18,7 @@ Command-line interface to xCAT3 API.
 from __future__ import print_function
 
 import argparse
+import json
 import logging
 import sys
 from oslo_utils import encodeutils
@@ -26,9 +27,13 @@ import traceback
 
 import xcat3client
 from xcat3client import client as xcatclient
+from xcat3client.common import breaker
+from xcat3client.common import bulk
 from xcat3client.common import cliutils
+from xcat3client.common import completion
 from xcat3client.common import http
 from xcat3client.common.i18n import _
+from xcat3client.common import journal
 from xcat3client.common import utils
 from xcat3client import exc
 
@@ -66,13 +71,30 @@ class XCAT3Shell(object):
                             action='store_true',
                             help='Print JSON response without formatting.')
 
+        parser.add_argument('--group',
+                            default=bool(cliutils.env('XCAT3_GROUP_OUTPUT')),
+                            action='store_true',
+                            help='Collapse the node names sharing a result '
+                            'into noderanges, one line per result. '
+                            'Defaults to env[XCAT3_GROUP_OUTPUT]')
+
         parser.add_argument('-v', '--verbose',
                             default=False, action="store_true",
                             help="Print more verbose output")
 
         parser.add_argument('--xcat3-url',
                             default=cliutils.env('XCAT3_URL'),
-                            help='Defaults to env[XCAT3_URL]')
+                            help='API endpoint, or several endpoints '
+                            'separated by comma to spread the requests over. '
+                            'Defaults to env[XCAT3_URL]')
+
+        parser.add_argument('--discover-endpoints',
+                            default=bool(cliutils.env(
+                                'XCAT3_DISCOVER_ENDPOINTS')),
+                            action='store_true',
+                            help='Spread the requests over every online API '
+                            'service, weighted by their workers. '
+                            'Defaults to env[XCAT3_DISCOVER_ENDPOINTS]')
 
         parser.add_argument('--xcat3_url',
                             help=argparse.SUPPRESS)
@@ -96,6 +118,214 @@ class XCAT3Shell(object):
                                 'XCAT3_RETRY_INTERVAL',
                                 default=str(http.DEFAULT_RETRY_INTERVAL)))
 
+        parser.add_argument('--retry-max-interval', type=int,
+                            help='Upper bound (in seconds) of the '
+                            'exponential backoff between retries. '
+                            'Defaults to env[XCAT3_RETRY_MAX_INTERVAL] or %d.'
+                            % http.DEFAULT_RETRY_MAX_INTERVAL,
+                            default=cliutils.env(
+                                'XCAT3_RETRY_MAX_INTERVAL',
+                                default=str(http.DEFAULT_RETRY_MAX_INTERVAL)))
+
+        parser.add_argument('--retry-budget', type=int,
+                            help='Maximum number of retries per %d seconds '
+                            'for the whole command. '
+                            'Defaults to env[XCAT3_RETRY_BUDGET] or %d. '
+                            'Use 0 for no limit.'
+                            % (http.DEFAULT_RETRY_BUDGET_WINDOW,
+                               http.DEFAULT_RETRY_BUDGET),
+                            default=cliutils.env(
+                                'XCAT3_RETRY_BUDGET',
+                                default=str(http.DEFAULT_RETRY_BUDGET)))
+
+        parser.add_argument('--pool-maxsize', type=int,
+                            help='Maximum number of connections kept open '
+                            'to each API server. '
+                            'Defaults to env[XCAT3_POOL_MAXSIZE] or %d.'
+                            % http.DEFAULT_POOL_MAXSIZE,
+                            default=cliutils.env(
+                                'XCAT3_POOL_MAXSIZE',
+                                default=str(http.DEFAULT_POOL_MAXSIZE)))
+
+        parser.add_argument('--pool-connections', type=int,
+                            help='Number of per-host connection pools to '
+                            'cache. Defaults to env[XCAT3_POOL_CONNECTIONS] '
+                            'or %d.' % http.DEFAULT_POOL_CONNECTIONS,
+                            default=cliutils.env(
+                                'XCAT3_POOL_CONNECTIONS',
+                                default=str(http.DEFAULT_POOL_CONNECTIONS)))
+
+        parser.add_argument('--pool-block',
+                            default=bool(cliutils.env('XCAT3_POOL_BLOCK')),
+                            action='store_true',
+                            help='Wait for a free pooled connection instead '
+                            'of opening an extra one when the pool is '
+                            'exhausted. Defaults to env[XCAT3_POOL_BLOCK]')
+
+        parser.add_argument('--keepalive-timeout', type=int,
+                            help='Amount of time (in seconds) an idle '
+                            'connection is kept open. Use 0 to keep '
+                            'connections forever. '
+                            'Defaults to env[XCAT3_KEEPALIVE_TIMEOUT] or %d.'
+                            % http.DEFAULT_KEEPALIVE_TIMEOUT,
+                            default=cliutils.env(
+                                'XCAT3_KEEPALIVE_TIMEOUT',
+                                default=str(http.DEFAULT_KEEPALIVE_TIMEOUT)))
+
+        parser.add_argument('--compress',
+                            default=bool(cliutils.env('XCAT3_COMPRESS')),
+                            action='store_true',
+                            help='gzip the request bodies larger than '
+                            '--compress-threshold. Paths of the API which '
+                            'reject them get uncompressed bodies. '
+                            'Defaults to env[XCAT3_COMPRESS]')
+
+        parser.add_argument('--compress-threshold', type=int,
+                            help='Minimum size (in bytes) of a request body '
+                            'to be compressed. '
+                            'Defaults to env[XCAT3_COMPRESS_THRESHOLD] or %d.'
+                            % http.DEFAULT_COMPRESS_THRESHOLD,
+                            default=cliutils.env(
+                                'XCAT3_COMPRESS_THRESHOLD',
+                                default=str(http.DEFAULT_COMPRESS_THRESHOLD)))
+
+        parser.add_argument('--compact-noderange',
+                            default=bool(cliutils.env(
+                                'XCAT3_COMPACT_NODERANGE')),
+                            action='store_true',
+                            help='Name the nodes of the bulk requests with a '
+                            'noderange rather than a list of names. Paths of '
+                            'the API which reject it get the list. '
+                            'Defaults to env[XCAT3_COMPACT_NODERANGE]')
+
+        parser.add_argument('--chunk-size', type=int,
+                            help='Maximum number of nodes sent by one '
+                            'request of the node commands. '
+                            'Defaults to env[XCAT3_CHUNK_SIZE] or %d.'
+                            % bulk.DEFAULT_CHUNK_SIZE,
+                            default=cliutils.env(
+                                'XCAT3_CHUNK_SIZE',
+                                default=str(bulk.DEFAULT_CHUNK_SIZE)))
+
+        parser.add_argument('--concurrency', type=int,
+                            help='Maximum number of requests of the node '
+                            'commands in flight. '
+                            'Defaults to env[XCAT3_CONCURRENCY] or %d.'
+                            % bulk.DEFAULT_CONCURRENCY,
+                            default=cliutils.env(
+                                'XCAT3_CONCURRENCY',
+                                default=str(bulk.DEFAULT_CONCURRENCY)))
+
+        parser.add_argument('--adaptive',
+                            default=bool(cliutils.env('XCAT3_ADAPTIVE')),
+                            action='store_true',
+                            help='Adapt the chunk size and the concurrency '
+                            'of the node commands to the latency of the '
+                            'requests and the 409 and 503 answers of the '
+                            'API, --chunk-size and --concurrency being the '
+                            'starting point and --pool-maxsize the bound of '
+                            'the concurrency. '
+                            'Defaults to env[XCAT3_ADAPTIVE]')
+
+        parser.add_argument('--node-retries', type=int,
+                            help='Number of times the nodes of the node '
+                            'commands which failed are sent again, alone. '
+                            'Defaults to env[XCAT3_NODE_RETRIES] or %d.'
+                            % bulk.DEFAULT_NODE_RETRIES,
+                            default=cliutils.env(
+                                'XCAT3_NODE_RETRIES',
+                                default=str(bulk.DEFAULT_NODE_RETRIES)))
+
+        parser.add_argument('--node-retry-interval', type=int,
+                            help='Amount of time (in seconds) before the '
+                            'failed nodes are sent again, doubled on each '
+                            'retry. '
+                            'Defaults to env[XCAT3_NODE_RETRY_INTERVAL] '
+                            'or %d.' % bulk.DEFAULT_NODE_RETRY_INTERVAL,
+                            default=cliutils.env(
+                                'XCAT3_NODE_RETRY_INTERVAL',
+                                default=str(
+                                    bulk.DEFAULT_NODE_RETRY_INTERVAL)))
+
+        parser.add_argument('--journal', metavar='<journal>',
+                            default=None,
+                            help='Record the chunks and the node results of '
+                            'the node commands in this file, to resume them '
+                            'with --resume.')
+
+        parser.add_argument('--resume', metavar='<journal>',
+                            default=None,
+                            help='Resume the node command recorded in this '
+                            'journal, skipping the nodes it completed, and '
+                            'keep recording to it.')
+
+        parser.add_argument('--executor', choices=bulk.EXECUTORS,
+                            help='Runs the concurrent requests of the node '
+                            'commands. greenlet needs a process monkey '
+                            'patched by eventlet and the greenlet extra '
+                            'installed. '
+                            'Defaults to env[XCAT3_EXECUTOR] or %s.'
+                            % bulk.DEFAULT_EXECUTOR,
+                            default=cliutils.env(
+                                'XCAT3_EXECUTOR',
+                                default=bulk.DEFAULT_EXECUTOR))
+
+        parser.add_argument('--timeout', type=int,
+                            help='Amount of time (in seconds) to wait for '
+                            'the API server to send data. '
+                            'Defaults to env[XCAT3_TIMEOUT] or %d.'
+                            % http.DEFAULT_READ_TIMEOUT,
+                            default=cliutils.env(
+                                'XCAT3_TIMEOUT',
+                                default=str(http.DEFAULT_READ_TIMEOUT)))
+
+        parser.add_argument('--connect-timeout', type=int,
+                            help='Amount of time (in seconds) to wait for '
+                            'the connection to the API server. '
+                            'Defaults to env[XCAT3_CONNECT_TIMEOUT] or %d.'
+                            % http.DEFAULT_CONNECT_TIMEOUT,
+                            default=cliutils.env(
+                                'XCAT3_CONNECT_TIMEOUT',
+                                default=str(http.DEFAULT_CONNECT_TIMEOUT)))
+
+        parser.add_argument('--deadline', type=int,
+                            help='Amount of time (in seconds) the command '
+                            'has to complete, retries and every chunk of '
+                            'bulk operations included. Use 0 for no '
+                            'deadline. Defaults to env[XCAT3_DEADLINE] or 0.',
+                            default=cliutils.env('XCAT3_DEADLINE',
+                                                 default='0'))
+
+        parser.add_argument('--breaker-threshold', type=int,
+                            help='Number of failures in a row after which '
+                            'the requests to an endpoint fail immediately, '
+                            'also in the next invocations, until '
+                            '--breaker-reset-timeout expires. Use 0 to '
+                            'disable the circuit breaker. '
+                            'Defaults to env[XCAT3_BREAKER_THRESHOLD] or %d.'
+                            % breaker.DEFAULT_FAILURE_THRESHOLD,
+                            default=cliutils.env(
+                                'XCAT3_BREAKER_THRESHOLD',
+                                default=str(
+                                    breaker.DEFAULT_FAILURE_THRESHOLD)))
+
+        parser.add_argument('--breaker-reset-timeout', type=int,
+                            help='Amount of time (in seconds) before a '
+                            'request is sent again to an endpoint whose '
+                            'circuit is open. '
+                            'Defaults to env[XCAT3_BREAKER_RESET_TIMEOUT] '
+                            'or %d.' % breaker.DEFAULT_RESET_TIMEOUT,
+                            default=cliutils.env(
+                                'XCAT3_BREAKER_RESET_TIMEOUT',
+                                default=str(breaker.DEFAULT_RESET_TIMEOUT)))
+
+        parser.add_argument('--timings',
+                            default=False,
+                            action='store_true',
+                            help='Print call timing, retry, connection '
+                            'pool, compression and circuit breaker '
+                            'statistics to stderr.')
+
         return parser
 
     def get_subcommand_parser(self, version):
@@ -136,8 +366,18 @@ class XCAT3Shell(object):
             for option in sc._optionals._option_string_actions.keys():
                 options.add(option)
 
-        commands.remove('bash-completion')
-        print(' '.join(commands | options))
+        # NOTE(chenglch): registered both by define_commands_from_module and
+        # by _add_bash_completion_subparser.
+        commands.discard('bash-completion')
+        commands.discard('bash_completion')
+        table = ' '.join(sorted(commands | options))
+        # NOTE(chenglch): kept for tools/xcat3.bash_completion, which then
+        # does not need to start the client at all.
+        try:
+            utils.write_atomic(completion.commands_file(), table + '\n')
+        except (IOError, OSError):
+            pass
+        print(table)
 
     def main(self, argv):
         # Parse args once to find version
@@ -171,12 +411,70 @@ class XCAT3Shell(object):
         if args.retry_interval < 1:
             raise exc.CommandError(_("You must provide value >= 1 for "
                                      "--retry-interval"))
-        client_args = ('xcat3_url',)
+        if args.retry_max_interval < args.retry_interval:
+            raise exc.CommandError(_("--retry-max-interval must not be "
+                                     "lower than --retry-interval"))
+        if args.retry_budget < 0:
+            raise exc.CommandError(_("You must provide value >= 0 for "
+                                     "--retry-budget"))
+        if args.pool_maxsize < 1:
+            raise exc.CommandError(_("You must provide value >= 1 for "
+                                     "--pool-maxsize"))
+        if args.keepalive_timeout < 0:
+            raise exc.CommandError(_("You must provide value >= 0 for "
+                                     "--keepalive-timeout"))
+        if args.timeout < 1:
+            raise exc.CommandError(_("You must provide value >= 1 for "
+                                     "--timeout"))
+        if args.connect_timeout < 1:
+            raise exc.CommandError(_("You must provide value >= 1 for "
+                                     "--connect-timeout"))
+        if args.deadline < 0:
+            raise exc.CommandError(_("You must provide value >= 0 for "
+                                     "--deadline"))
+        if args.breaker_threshold < 0:
+            raise exc.CommandError(_("You must provide value >= 0 for "
+                                     "--breaker-threshold"))
+        if args.breaker_reset_timeout < 1:
+            raise exc.CommandError(_("You must provide value >= 1 for "
+                                     "--breaker-reset-timeout"))
+        if args.chunk_size < 1:
+            raise exc.CommandError(_("You must provide value >= 1 for "
+                                     "--chunk-size"))
+        if args.concurrency < 1:
+            raise exc.CommandError(_("You must provide value >= 1 for "
+                                     "--concurrency"))
+        if args.node_retries < 0:
+            raise exc.CommandError(_("You must provide value >= 0 for "
+                                     "--node-retries"))
+        if args.node_retry_interval < 0:
+            raise exc.CommandError(_("You must provide value >= 0 for "
+                                     "--node-retry-interval"))
+        if args.executor not in bulk.EXECUTORS:
+            raise exc.CommandError(_("--executor must be one of %s") %
+                                   ', '.join(bulk.EXECUTORS))
+        if args.journal and args.resume:
+            raise exc.CommandError(_("--journal and --resume can not be "
+                                     "used together"))
+        client_args = ('xcat3_url', 'discover_endpoints', 'max_retries',
+                       'retry_interval', 'retry_max_interval', 'retry_budget',
+                       'timings', 'pool_maxsize', 'pool_connections',
+                       'pool_block', 'keepalive_timeout', 'compress',
+                       'compress_threshold', 'compact_noderange',
+                       'breaker_threshold',
+                       'breaker_reset_timeout', 'timeout', 'connect_timeout',
+                       'deadline', 'chunk_size', 'concurrency', 'executor',
+                       'adaptive', 'node_retries', 'node_retry_interval')
         kwargs = {}
         for key in client_args:
             kwargs[key] = getattr(args, key)
         if not kwargs.get('xcat3_url'):
             kwargs['xcat3_url'] = 'http://localhost:3010'
+        kwargs['breaker_state_file'] = breaker.default_state_file()
+        kwargs['fallback_state_file'] = http.default_fallback_file()
+        kwargs['completion_cache'] = True
+        job_journal = self._open_journal(args)
+        kwargs['journal'] = job_journal
         client = xcatclient.get_client(**kwargs)
 
         try:
@@ -184,6 +482,73 @@ class XCAT3Shell(object):
         except exc.CommandError as e:
             subcommand_parser = self.subcommands[args.subparser_name]
             subcommand_parser.error(e)
+        finally:
+            if job_journal is not None:
+                job_journal.close()
+            if args.timings:
+                self._print_timings(client.http_client)
+
+    def _journal_command(self, args):
+        """Return the command and its parsed arguments, as a string.
+
+        The global options, such as --chunk-size, are left out: they may
+        change when resuming, the command and its arguments may not.
+        """
+        parser = self.subcommands[args.subparser_name]
+        parts = [args.subparser_name]
+        for action in parser._actions:
+            if action.dest == 'help':
+                continue
+            parts.append('%s=%s' % (action.dest, json.dumps(
+                getattr(args, action.dest, None), sort_keys=True)))
+        return ' '.join(parts)
+
+    def _open_journal(self, args):
+        path = args.resume or args.journal
+        if not path:
+            return None
+        command = self._journal_command(args)
+        result = journal.Journal(path, command, resume=bool(args.resume))
+        if args.resume:
+            print(_("Resuming %(path)s: %(count)d nodes already completed, "
+                    "%(in_flight)d in flight when it stopped") %
+                  {'path': path, 'count': len(result.completed),
+                   'in_flight': len(result.in_flight)}, file=sys.stderr)
+        return result
+
+    def _print_timings(self, http_client):
+        total = 0.0
+        for url, start, end in http_client.times:
+            total += end - start
+            print('%(url)s: %(elapsed).3fs' % {'url': url,
+                                               'elapsed': end - start},
+                  file=sys.stderr)
+        print('Total: %(count)d requests in %(total).3fs' %
+              {'count': len(http_client.times), 'total': total},
+              file=sys.stderr)
+        print('Retries: %(retries)d retries costing %(retry_time).3fs, '
+              'budget exhausted %(exhausted)d times' %
+              http_client.get_retry_stats(), file=sys.stderr)
+        print('Connection pool: %(hits)d hits, %(misses)d misses' %
+              http_client.get_pool_stats(), file=sys.stderr)
+        for endpoint in http_client.get_endpoint_stats():
+            print('Endpoint %(url)s: %(requests)d requests, weight '
+                  '%(weight)d, available %(available)s' % endpoint,
+                  file=sys.stderr)
+        print('Compression: sent %(sent_wire)d bytes for %(sent_raw)d, '
+              'received %(received_wire)d bytes for %(received_raw)d, '
+              'compressing took %(elapsed).3fs' %
+              http_client.get_compression_stats(), file=sys.stderr)
+        print('Noderange bodies: %(requests)d requests sent %(sent)d bytes, '
+              'saving %(saved)d bytes, %(fallbacks)d fallbacks' %
+              http_client.get_noderange_stats(), file=sys.stderr)
+        for url, compact, expanded in http_client.noderange.requests:
+            print('%(url)s: %(compact)d bytes, saved %(saved)d' %
+                  {'url': url, 'compact': compact,
+                   'saved': expanded - compact}, file=sys.stderr)
+        for circuit in http_client.get_breaker_stats():
+            print('Circuit %(url)s: %(state)s, %(failures)d failures' %
+                  circuit, file=sys.stderr)
 
     @cliutils.arg('command', metavar='<subcommand>', nargs='?',
                   help='Display help for <subcommand>')
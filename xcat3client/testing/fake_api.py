@@ -0,0 +1,547 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In-process stand-in for the xCAT3 API.
+
+It serves the endpoints used by the :mod:`xcat3client.v1` managers from an
+in-memory state, with injectable latency and 409/503 failures, so the bulk
+paths of the CLI can be measured and load tested without a real service::
+
+    from xcat3client import client
+    from xcat3client.testing import fake_api
+
+    with fake_api.FakeAPIServer(latency=0.01, conflict_rate=0.05) as server:
+        server.api.add_nodes(100000)
+        cc = client.get_client(xcat3_url=server.url)
+        cc.node.get_power_state({'nodes': [{'name': 'node000001'}]})
+
+It can also run on its own for the CLI::
+
+    python -m xcat3client.testing.fake_api --port 3010 --nodes 100000
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import copy
+import logging
+import random
+import threading
+import time
+import uuid
+import zlib
+
+import six
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+import six.moves.urllib.parse as urlparse
+
+from xcat3client.common import codec
+from xcat3client.common import http
+from xcat3client.common import noderange
+
+LOG = logging.getLogger(__name__)
+
+# NOTE(chenglch): path of the collection: (key of the list response, key
+# identifying an item).
+RESOURCES = {
+    'networks': ('networks', 'name'),
+    'osimages': ('images', 'name'),
+    'passwds': ('passwds', 'key'),
+    'services': ('services', 'hostname'),
+    'nics': ('nics', 'uuid'),
+}
+
+POWER_STATES = ('on', 'off', 'boot')
+BOOT_DEVICES = ('net', 'disk', 'cdrom')
+PROVISION_STATES = ('nodeset', 'dhcp', 'un_nodeset', 'un_dhcp')
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status, message):
+        super(FakeAPIError, self).__init__(message)
+        self.status = status
+        self.message = message
+
+
+def error_body(message):
+    """Return an error body formatted like the ones of the xCAT3 API."""
+    return {'error_message': codec.dumps({'faultstring': message,
+                                          'debuginfo': None})}
+
+
+def _filter_fields(obj, query):
+    fields = query.get('fields')
+    if not fields:
+        return obj
+    fields = set(','.join(fields).split(','))
+    return dict((k, v) for k, v in six.iteritems(obj) if k in fields)
+
+
+def _apply_patch(obj, patches):
+    """Apply add, replace and remove operations of a JSON patch."""
+    for patch in patches:
+        keys = patch['path'].strip('/').split('/')
+        target = obj
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+        if patch['op'] == 'remove':
+            target.pop(keys[-1], None)
+        elif patch['op'] in ('add', 'replace'):
+            target[keys[-1]] = patch['value']
+        else:
+            raise FakeAPIError(400, "Invalid patch operation %s" %
+                               patch['op'])
+
+
+class FakeAPI(object):
+    """State of the fake service and handlers of its endpoints.
+
+    :param node_padding: size in bytes of a ``description`` attribute added
+        to the created nodes, to inflate the responses.
+    """
+
+    def __init__(self, node_padding=0):
+        self.node_padding = node_padding
+        self.nodes = collections.OrderedDict()
+        self.resources = dict((path, collections.OrderedDict())
+                              for path in RESOURCES)
+        # NOTE(chenglch): bumped by every modification, it is the ETag of
+        # the GET responses.
+        self.version = 0
+        self.lock = threading.RLock()
+
+    def _make_node(self, node):
+        node = copy.deepcopy(node)
+        node.setdefault('mgt', 'ipmi')
+        node.setdefault('netboot', 'pxe')
+        node.setdefault('arch', 'x86_64')
+        node.setdefault('type', 'baremetal')
+        node.setdefault('control_info', {})
+        node.setdefault('nics_info', {'nics': []})
+        if self.node_padding:
+            node.setdefault('description', 'x' * self.node_padding)
+        node['power_state'] = node.get('power_state', 'off')
+        node['boot_device'] = node.get('boot_device', 'disk')
+        node['provision_state'] = node.get('provision_state')
+        return node
+
+    def add_nodes(self, count, prefix='node', start=0, width=6, **attrs):
+        """Create ``count`` nodes named prefix + zero padded index.
+
+        :param attrs: attributes of every created node.
+        """
+        with self.lock:
+            for i in range(start, start + count):
+                node = dict(attrs, name='%s%0*d' % (prefix, width, i))
+                self.nodes[node['name']] = self._make_node(node)
+            self.version += 1
+
+    def add_resource(self, path, item):
+        """Add an item to one of RESOURCES, e.g. a network or a service."""
+        key = RESOURCES[path][1]
+        with self.lock:
+            if path == 'nics':
+                item.setdefault('uuid', str(uuid.uuid4()))
+            self.resources[path][item[key]] = copy.deepcopy(item)
+            self.version += 1
+
+    def handle(self, method, path, query, body):
+        """Serve a request, return (status, response body).
+
+        :raises: FakeAPIError for the error responses.
+        """
+        parts = path.strip('/').split('/')
+        if parts[0] == 'v1':
+            parts = parts[1:]
+        with self.lock:
+            if parts[0] == 'nodes':
+                return self._handle_nodes(method, parts[1:], query, body)
+            if parts[0] in RESOURCES:
+                return self._handle_resource(method, parts[0], parts[1:],
+                                             query, body)
+        raise FakeAPIError(404, "Unknown path %s" % path)
+
+    def _body_nodes(self, body):
+        if not isinstance(body, dict) or 'nodes' not in body:
+            raise FakeAPIError(400, "Missing the nodes of the request")
+        return body['nodes']
+
+    def _each_node(self, body, func):
+        """Apply func on each node of the body, return the result map."""
+        result = {}
+        for item in self._body_nodes(body):
+            name = item['name']
+            node = self.nodes.get(name)
+            if node is None:
+                result[name] = 'Could not find node %s' % name
+            else:
+                result[name] = func(node)
+        return {'nodes': result}
+
+    def _target(self, query, choices):
+        target = (query.get('target') or [None])[0]
+        if target not in choices:
+            raise FakeAPIError(400, "Invalid target %s" % target)
+        return target
+
+    def _handle_nodes(self, method, parts, query, body):
+        action = parts[0] if parts else None
+        if action is None:
+            if method == 'GET':
+                return 200, {'nodes': list(self.nodes)}
+            if method == 'POST':
+                return 201, self._create_nodes(body)
+            if method == 'DELETE':
+                return 200, self._delete_nodes(body)
+            if method == 'PATCH':
+                return 200, self._update_nodes(body)
+        elif action == 'info' and method == 'GET':
+            nodes = [_filter_fields(self.nodes[item['name']], query)
+                     for item in self._body_nodes(body)
+                     if item['name'] in self.nodes]
+            return 200, {'nodes': nodes}
+        elif action == 'power':
+            if method == 'GET':
+                return 200, self._each_node(
+                    body, lambda node: node['power_state'])
+            if method == 'PUT':
+                return 200, self._set_power(body, query)
+        elif action == 'boot_device':
+            if method == 'GET':
+                return 200, self._each_node(
+                    body, lambda node: node['boot_device'])
+            if method == 'PUT':
+                return 200, self._set_boot_device(body, query)
+        elif action == 'provision' and method == 'PUT':
+            return 200, self._set_provision(body, query)
+        elif method == 'GET':
+            node = self.nodes.get(action)
+            if node is None:
+                raise FakeAPIError(404, "Could not find node %s" % action)
+            return 200, _filter_fields(node, query)
+        raise FakeAPIError(405, "%s not allowed on nodes/%s" %
+                           (method, '/'.join(parts)))
+
+    def _create_nodes(self, body):
+        result = {}
+        for node in self._body_nodes(body):
+            name = node.get('name')
+            if name in self.nodes:
+                result[name] = 'Node %s already exists' % name
+                continue
+            self.nodes[name] = self._make_node(node)
+            result[name] = 'ok'
+        self.version += 1
+        return {'nodes': result}
+
+    def _delete_nodes(self, body):
+        def delete(node):
+            del self.nodes[node['name']]
+            return 'deleted'
+        result = self._each_node(body, delete)
+        self.version += 1
+        return result
+
+    def _update_nodes(self, body):
+        patches = body.get('patches', [])
+
+        def update(node):
+            _apply_patch(node, patches)
+            return 'updated'
+        result = self._each_node(body, update)
+        self.version += 1
+        return result
+
+    def _set_power(self, body, query):
+        target = self._target(query, POWER_STATES)
+        state = 'on' if target == 'boot' else target
+
+        def power(node):
+            node['power_state'] = state
+            return state
+        result = self._each_node(body, power)
+        self.version += 1
+        return result
+
+    def _set_boot_device(self, body, query):
+        target = self._target(query, BOOT_DEVICES)
+
+        def boot_device(node):
+            node['boot_device'] = target
+            return target
+        result = self._each_node(body, boot_device)
+        self.version += 1
+        return result
+
+    def _set_provision(self, body, query):
+        target = self._target(query, PROVISION_STATES)
+
+        def provision(node):
+            node['provision_state'] = target
+            return 'ok'
+        result = self._each_node(body, provision)
+        self.version += 1
+        return result
+
+    def _handle_resource(self, method, path, parts, query, body):
+        list_key, key = RESOURCES[path]
+        items = self.resources[path]
+        if not parts:
+            if method == 'GET':
+                return 200, {list_key: list(items.values())}
+            if method == 'POST':
+                if path == 'nics':
+                    body.setdefault('uuid', str(uuid.uuid4()))
+                if body.get(key) in items:
+                    raise FakeAPIError(409, "%s %s already exists" %
+                                       (path, body.get(key)))
+                items[body[key]] = body
+                self.version += 1
+                return 201, body
+        elif path == 'services' and parts[0] == 'hostname':
+            return 200, self._find(items, 'hostname', query)
+        elif path == 'nics' and parts[0] == 'address':
+            return 200, self._find(items, 'mac', query)
+        elif parts[0] in items:
+            if method == 'GET':
+                return 200, _filter_fields(items[parts[0]], query)
+            if method == 'DELETE':
+                del items[parts[0]]
+                self.version += 1
+                return 204, None
+            if method == 'PATCH':
+                _apply_patch(items[parts[0]], body)
+                self.version += 1
+                return 200, items[parts[0]]
+        else:
+            raise FakeAPIError(404, "Could not find %s %s" %
+                               (path, parts[0]))
+        raise FakeAPIError(405, "%s not allowed on %s" % (method, path))
+
+    def _find(self, items, attr, query):
+        param = 'name' if attr == 'hostname' else attr
+        value = (query.get(param) or [None])[0]
+        for item in items.values():
+            if item.get(attr) == value:
+                return _filter_fields(item, query)
+        raise FakeAPIError(404, "Could not find %s %s" % (attr, value))
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        LOG.debug(format, *args)
+
+    def _serve(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length) if length else b''
+        status, headers, content = self.server.fake.dispatch(
+            self.command, self.path, self.headers, data)
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if content:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _serve
+
+
+class _HTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # NOTE(chenglch): clients timing out close the connection before
+        # the delayed answer is written, that is expected here.
+        LOG.debug("Request from %s not answered", client_address,
+                  exc_info=True)
+
+
+class FakeAPIServer(object):
+    """Serve a FakeAPI over HTTP from a background thread.
+
+    :param latency: seconds added to every response.
+    :param latency_per_node: seconds added per node named in the request
+        body, bulk calls then take longer than single ones.
+    :param conflict_rate: ratio of the requests answered 409 Conflict.
+    :param unavailable_rate: ratio of the requests answered 503.
+    :param retry_after: Retry-After value (in seconds) sent with the
+        injected failures, none when None.
+    :param node_padding: see :class:`FakeAPI`.
+    :param accept_gzip: decode gzip request bodies, answer 415 otherwise.
+    :param accept_noderange: expand the noderange bodies, answer 415
+        otherwise.
+    :param seed: seed of the failure injection, for repeatable runs.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0,
+                 latency_per_node=0, conflict_rate=0, unavailable_rate=0,
+                 retry_after=None, node_padding=0, accept_gzip=True,
+                 accept_noderange=True, seed=None):
+        self.api = FakeAPI(node_padding)
+        self.latency = latency
+        self.latency_per_node = latency_per_node
+        self.conflict_rate = conflict_rate
+        self.unavailable_rate = unavailable_rate
+        self.retry_after = retry_after
+        self.accept_gzip = accept_gzip
+        self.accept_noderange = accept_noderange
+        # NOTE(chenglch): counters of the requests per method and path and
+        # of the responses per status.
+        self.requests = collections.Counter()
+        self.responses = collections.Counter()
+        self._random = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self._httpd = _HTTPServer((host, port), _Handler)
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _record(self, counter, key):
+        with self._stats_lock:
+            counter[key] += 1
+
+    def _inject_failure(self):
+        with self._stats_lock:
+            roll = self._random.random()
+        if roll < self.conflict_rate:
+            return 409, 'Injected conflict'
+        if roll < self.conflict_rate + self.unavailable_rate:
+            return 503, 'Injected unavailability'
+        return None
+
+    def _respond(self, status, body, headers=None):
+        headers = list(headers or [])
+        if status >= 400:
+            body = error_body(body)
+            if status in (409, 503) and self.retry_after is not None:
+                headers.append(('Retry-After', str(self.retry_after)))
+        self._record(self.responses, status)
+        content = b'' if body is None else codec.dumpb(body)
+        return status, headers, content
+
+    def dispatch(self, method, path, headers, data):
+        """Serve a raw request, return (status, headers, content)."""
+        url = urlparse.urlparse(path)
+        self._record(self.requests, '%s %s' % (method, url.path))
+        if headers.get('Content-Encoding') == 'gzip':
+            if not self.accept_gzip:
+                return self._respond(415, 'gzip bodies are not supported')
+            data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+        try:
+            body = codec.loads(data) if data else None
+        except ValueError:
+            return self._respond(400, 'Invalid JSON body')
+        if headers.get('Content-Type') == http.NODERANGE_CONTENT_TYPE:
+            if not self.accept_noderange:
+                return self._respond(415, 'noderange bodies are not '
+                                     'supported')
+            try:
+                body['nodes'] = [{'name': name} for name in
+                                 noderange.expand(body.pop('noderange'))]
+            except (KeyError, TypeError, AttributeError, ValueError) as e:
+                return self._respond(400, 'Invalid noderange: %s' % e)
+
+        delay = self.latency
+        if self.latency_per_node and isinstance(body, dict):
+            delay += self.latency_per_node * len(body.get('nodes') or ())
+        if delay:
+            time.sleep(delay)
+        failure = self._inject_failure()
+        if failure is not None:
+            return self._respond(*failure)
+
+        try:
+            status, body = self.api.handle(method, url.path,
+                                           urlparse.parse_qs(url.query),
+                                           body)
+        except FakeAPIError as e:
+            return self._respond(e.status, e.message)
+        except (KeyError, TypeError, AttributeError) as e:
+            return self._respond(400, 'Invalid request: %s' % e)
+        if method != 'GET':
+            return self._respond(status, body)
+        etag = '"%d"' % self.api.version
+        if headers.get('If-None-Match') == etag:
+            return self._respond(304, None, [('ETag', etag)])
+        return self._respond(status, body, [('ETag', etag)])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve a fake xCAT3 API on the local host.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3010)
+    parser.add_argument('--nodes', type=int, default=1000,
+                        help='Number of nodes created at start up.')
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--latency-per-node', type=float, default=0)
+    parser.add_argument('--conflict-rate', type=float, default=0)
+    parser.add_argument('--unavailable-rate', type=float, default=0)
+    parser.add_argument('--retry-after', type=int, default=None)
+    parser.add_argument('--node-padding', type=int, default=0)
+    parser.add_argument('--reject-noderange', action='store_true',
+                        help='Answer 415 to the noderange bodies.')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeAPIServer(args.host, args.port, args.latency,
+                           args.latency_per_node, args.conflict_rate,
+                           args.unavailable_rate, args.retry_after,
+                           args.node_padding,
+                           accept_noderange=not args.reject_noderange,
+                           seed=args.seed)
+    server.api.add_nodes(args.nodes)
+    server.api.add_resource('services', {'hostname': args.host,
+                                         'type': 'api', 'online': True,
+                                         'workers': 1})
+    print('Fake xCAT3 API with %d nodes on %s' % (args.nodes, server.url))
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
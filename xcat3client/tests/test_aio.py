@@ -0,0 +1,82 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+import six
+
+from xcat3client.common import bulk
+from xcat3client.common import nodeset
+from xcat3client.testing import fake_api
+
+try:
+    import asyncio
+
+    import aiohttp
+
+    from xcat3client.aio import bulk as aio_bulk
+    from xcat3client.aio import client
+    from xcat3client.aio import managers
+except (ImportError, SyntaxError):
+    aiohttp = None
+
+
+@unittest.skipIf(six.PY2 or aiohttp is None, "requires asyncio and aiohttp")
+class AsyncNodeManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = fake_api.FakeAPIServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.api.add_nodes(1000)
+        self.nodes = nodeset.NodeSet.from_noderange('node[000000-000999]')
+
+    def _run(self, func):
+        async def run():
+            async with client.get_client(self.server.url) as cc:
+                return await func(cc)
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+    def test_stream_without_engine(self):
+        async def func(cc):
+            return [nodes async for nodes in
+                    cc.node.get_power_state(self.nodes, stream=True)]
+        results = self._run(func)
+        self.assertEqual(1, len(results))
+        self.assertEqual(1000, len(results[0]))
+
+    def test_fan_out_chunks(self):
+        async def func(cc):
+            manager = managers.NodeManager(cc.http_client,
+                                           bulk.BulkEngine(300, 2))
+            sizes = sorted([len(nodes) async for nodes in
+                            manager.set_power_state(self.nodes, 'on',
+                                                    stream=True)])
+            return sizes, await manager.get_power_state(self.nodes)
+        sizes, result = self._run(func)
+        self.assertEqual([100, 300, 300, 300], sizes)
+        self.assertEqual(set(['on']), set(result['nodes'].values()))
+        self.assertEqual(1000, len(result['nodes']))
+        self.assertEqual(4, self.server.requests['PUT /nodes/power'])
+
+
+@unittest.skipIf(six.PY2 or aiohttp is None, "requires asyncio and aiohttp")
+class AsyncioExecutorTest(unittest.TestCase):
+
+    def test_shutdown_closes_loop(self):
+        executor = aio_bulk.AsyncioExecutor(2)
+        self.assertEqual(3, executor.submit(len, [1, 2, 3]).result())
+        executor.shutdown()
+        self.assertTrue(executor.loop.is_closed())
@@ -0,0 +1,93 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+import unittest
+
+from xcat3client.common import breaker
+from xcat3client.common import http
+from xcat3client import exc
+from xcat3client.testing import fake_api
+
+URL = 'http://127.0.0.1:3010'
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.breaker = breaker.CircuitBreaker(failure_threshold=2,
+                                              reset_timeout=0.1)
+
+    def _open(self):
+        self.breaker.failure(URL)
+        self.breaker.failure(URL)
+        self.assertEqual(breaker.OPEN, self.breaker.state(URL))
+        self.assertRaises(exc.CircuitOpen, self.breaker.check, URL)
+        time.sleep(0.1)
+
+    def test_probe_success_closes(self):
+        self._open()
+        self.breaker.check(URL)
+        self.assertFalse(self.breaker.allows(URL))
+        self.assertRaises(exc.CircuitOpen, self.breaker.check, URL)
+        self.breaker.success(URL)
+        self.assertEqual(breaker.CLOSED, self.breaker.state(URL))
+
+    def test_probe_failure_opens(self):
+        self._open()
+        self.breaker.check(URL)
+        self.breaker.failure(URL)
+        self.assertEqual(breaker.OPEN, self.breaker.state(URL))
+
+    def test_release_lets_next_probe(self):
+        self._open()
+        self.breaker.check(URL)
+        self.breaker.release(URL)
+        self.assertTrue(self.breaker.allows(URL))
+        self.breaker.check(URL)
+
+
+class HttpClientProbeTest(unittest.TestCase):
+
+    def test_probe_released_on_unexpected_error(self):
+        with fake_api.FakeAPIServer() as server:
+            client = http.HttpClient(server.url, max_retries=0,
+                                     breaker_threshold=1,
+                                     breaker_reset_timeout=0.1)
+            client.breaker.failure(server.url)
+            time.sleep(0.1)
+            request = client.session.request
+
+            def fail(*args, **kwargs):
+                raise ValueError('not JSON')
+            client.session.request = fail
+            self.assertRaises(ValueError, client.get, 'nodes')
+            client.session.request = request
+            client.get('nodes')
+            self.assertEqual(breaker.CLOSED, client.breaker.state(server.url))
+
+
+class HttpClientCongestionTest(unittest.TestCase):
+
+    def _state_after_503(self, retry_after):
+        with fake_api.FakeAPIServer(unavailable_rate=1,
+                                    retry_after=retry_after) as server:
+            client = http.HttpClient(server.url, max_retries=0,
+                                     breaker_threshold=1)
+            self.assertRaises(exc.ServiceUnavailable, client.get, 'nodes')
+            return client.breaker.state(server.url)
+
+    def test_busy_endpoint_stays_closed(self):
+        self.assertEqual(breaker.CLOSED, self._state_after_503(1))
+
+    def test_unavailable_endpoint_opens(self):
+        self.assertEqual(breaker.OPEN, self._state_after_503(None))
@@ -0,0 +1,168 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+import sys
+import unittest
+
+from xcat3client import client
+from xcat3client.common import bulk
+from xcat3client.common import nodeset
+from xcat3client import exc
+from xcat3client.testing import fake_api
+
+
+def _closed_port_url():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return 'http://127.0.0.1:%d' % port
+
+
+class BulkEngineTestCase(unittest.TestCase):
+    server_kwargs = {}
+
+    def setUp(self):
+        self.server = fake_api.FakeAPIServer(**self.server_kwargs).start()
+        self.addCleanup(self.server.stop)
+        self.server.api.add_nodes(20)
+        self.nodes = nodeset.NodeSet.from_noderange('node[000000-000019]')
+
+    def get_client(self, url=None, **kwargs):
+        kwargs.setdefault('max_retries', 0)
+        kwargs.setdefault('breaker_threshold', 0)
+        return client.get_client(xcat3_url=url or self.server.url, **kwargs)
+
+
+class BulkFailureTest(BulkEngineTestCase):
+
+    def test_chunks_merged_in_order(self):
+        cc = self.get_client()
+        engine = bulk.BulkEngine(3, 4)
+        result = engine.run(cc.node.get_power_state, self.nodes)
+        self.assertEqual(list(self.nodes), list(result['nodes']))
+        self.assertEqual(7, self.server.requests['GET /nodes/power'])
+
+    def test_http_error_fails_chunk(self):
+        cc = self.get_client()
+        engine = bulk.BulkEngine(5, 2)
+
+        def power(chunk):
+            state = 'bogus' if 'node000007' in chunk else 'on'
+            return cc.node.set_power_state(chunk, state)
+        result = engine.run(power, self.nodes)['nodes']
+        failed = [name for name, value in result.items() if value != 'on']
+        self.assertEqual(['node%06d' % i for i in range(5, 10)], failed)
+        self.assertIn('Invalid target', result['node000005'])
+
+    def test_refused_connection_fails_chunk(self):
+        cc = self.get_client()
+        dead = self.get_client(_closed_port_url())
+        engine = bulk.BulkEngine(5, 2)
+
+        def power(chunk):
+            target = dead if 'node000012' in chunk else cc
+            return target.node.get_power_state(chunk)
+        result = list(engine.iter_results(power, self.nodes))
+        self.assertEqual(4, len(result))
+        merged = dict((k, v) for nodes in result for k, v in nodes.items())
+        self.assertEqual(20, len(merged))
+        self.assertEqual(15, list(merged.values()).count('off'))
+        self.assertIn('Connection refused', merged['node000012'])
+
+    def test_refused_chunk_retried(self):
+        cc = self.get_client()
+        dead = self.get_client(_closed_port_url())
+        engine = bulk.BulkEngine(5, 2, node_retries=1,
+                                 node_retry_interval=0)
+        refused = []
+
+        def power(chunk):
+            if 'node000012' in chunk and not refused:
+                refused.append(chunk)
+                return dead.node.get_power_state(chunk)
+            return cc.node.get_power_state(chunk)
+        result = engine.run(power, self.nodes)['nodes']
+        self.assertEqual(1, len(refused))
+        self.assertEqual(list(self.nodes), sorted(result))
+        self.assertEqual(['off'] * 20, list(result.values()))
+        self.assertEqual(4, self.server.requests['GET /nodes/power'])
+
+    def test_every_chunk_failing_raises(self):
+        dead = self.get_client(_closed_port_url())
+        engine = bulk.BulkEngine(5, 2)
+        self.assertRaises(exc.ConnectionRefused, engine.run,
+                          dead.node.get_power_state, self.nodes)
+
+    def test_deadline_fails_pending_chunks(self):
+        self.server.latency = 0.3
+        cc = self.get_client()
+        engine = bulk.BulkEngine(5, 1)
+        result = engine.run(cc.node.get_power_state, self.nodes, 0.45)
+        values = list(result['nodes'].values())
+        self.assertEqual(5, values.count('off'))
+        self.assertEqual(15, values.count(bulk.DEADLINE_RESULT))
+
+
+class BulkTimeoutTest(BulkEngineTestCase):
+    server_kwargs = {'latency_per_node': 0.05}
+
+    def test_timed_out_chunk_fails_alone(self):
+        cc = self.get_client(timeout=0.2)
+        nodes = list(self.nodes)[:12]
+        engine = bulk.BulkEngine(5, 3)
+        result = engine.run(cc.node.get_power_state, nodes)['nodes']
+        self.assertEqual(12, len(result))
+        self.assertEqual(['off', 'off'], [result['node000010'],
+                                          result['node000011']])
+        self.assertIn('timed out', result['node000000'])
+
+    def test_timed_out_chunk_retried(self):
+        cc = self.get_client(timeout=0.2)
+        nodes = list(self.nodes)[:12]
+        engine = bulk.BulkEngine(5, 3, node_retries=1,
+                                 node_retry_interval=0)
+        calls = []
+
+        def power(chunk):
+            calls.append(len(chunk))
+            if len(calls) > 3:
+                # NOTE(chenglch): the server recovers for the retry round.
+                self.server.latency_per_node = 0
+            return cc.node.get_power_state(chunk)
+        result = engine.run(power, nodes)['nodes']
+        self.assertEqual(nodes, sorted(result))
+        self.assertEqual(['off'] * 12, list(result.values()))
+        self.assertEqual([5, 5, 2], sorted(calls[:3], reverse=True))
+        self.assertEqual([5, 5], calls[3:])
+
+
+class ExecutorTest(unittest.TestCase):
+
+    def test_thread_executor(self):
+        executor = bulk._make_executor('thread', 2)
+        self.addCleanup(executor.shutdown)
+        self.assertEqual(4, executor.submit(len, 'node').result())
+
+    def test_missing_package_raises(self):
+        green_usable = bulk._green_usable
+        self.addCleanup(setattr, bulk, '_green_usable', green_usable)
+        bulk._green_usable = lambda: True
+        modules = dict(sys.modules)
+        self.addCleanup(sys.modules.update, modules)
+        self.addCleanup(sys.modules.pop, 'futurist', None)
+        # NOTE(chenglch): importing a module mapped to None raises
+        # ImportError.
+        sys.modules['futurist'] = None
+        self.assertRaises(exc.CommandError, bulk._make_executor,
+                          'greenlet', 2)
@@ -0,0 +1,208 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+from xcat3client import client
+from xcat3client.common import http
+from xcat3client.common import nodeset
+from xcat3client import exc
+from xcat3client.testing import fake_api
+
+NODES = {'nodes': [{'name': 'node000001'}]}
+
+
+class FakeAPITestCase(unittest.TestCase):
+    server_kwargs = {}
+
+    def setUp(self):
+        self.server = fake_api.FakeAPIServer(**self.server_kwargs).start()
+        self.addCleanup(self.server.stop)
+        self.server.api.add_nodes(10)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.state_file = os.path.join(self.tmpdir, 'fallbacks.json')
+
+    def get_client(self, **kwargs):
+        kwargs.setdefault('max_retries', 0)
+        return client.get_client(xcat3_url=self.server.url,
+                                 fallback_state_file=self.state_file,
+                                 **kwargs)
+
+
+class GzipFallbackTest(FakeAPITestCase):
+    server_kwargs = {'accept_gzip': False}
+
+    def get_client(self, **kwargs):
+        return super(GzipFallbackTest, self).get_client(
+            compress=True, compress_threshold=1, **kwargs)
+
+    def test_fallback_on_415(self):
+        cc = self.get_client()
+        cc.node.set_power_state(NODES, 'on')
+        cc.node.set_power_state(NODES, 'off')
+        self.assertEqual(3, self.server.requests['PUT /nodes/power'])
+        self.assertEqual(1, self.server.responses[415])
+        self.assertEqual(0, cc.http_client.get_compression_stats()[
+            'sent_raw'])
+
+    def test_fallback_persisted(self):
+        self.get_client().node.set_power_state(NODES, 'on')
+        self.get_client().node.set_power_state(NODES, 'off')
+        self.assertEqual(1, self.server.responses[415])
+
+    def test_no_resend_on_bad_request(self):
+        self.server.accept_gzip = True
+        cc = self.get_client()
+        self.assertRaises(exc.BadRequest, cc.node.set_power_state, NODES,
+                          'bogus')
+        self.assertEqual(1, self.server.requests['PUT /nodes/power'])
+        self.assertFalse(cc.http_client.fallbacks.rejected(
+            self.server.url, 'gzip', '/nodes/power'))
+        self.assertTrue(cc.http_client.get_compression_stats()['sent_raw'])
+
+    def test_fallback_per_endpoint(self):
+        other = fake_api.FakeAPIServer().start()
+        self.addCleanup(other.stop)
+        other.api.add_nodes(10)
+        cc = client.get_client(
+            xcat3_url='%s,%s' % (self.server.url, other.url), max_retries=0,
+            compress=True, compress_threshold=1,
+            fallback_state_file=self.state_file)
+        for state in ('on', 'off', 'on', 'off'):
+            cc.node.set_power_state(NODES, state)
+        self.assertEqual(3, self.server.requests['PUT /nodes/power'])
+        self.assertEqual(1, self.server.responses[415])
+        self.assertEqual(2, other.requests['PUT /nodes/power'])
+        self.assertFalse(other.responses[415])
+        self.assertTrue(cc.http_client.get_compression_stats()['sent_raw'])
+
+
+class TimeoutTest(FakeAPITestCase):
+    server_kwargs = {'latency': 0.5}
+
+    def test_deadline_exceeded(self):
+        cc = self.get_client(deadline=0.2)
+        self.assertRaises(exc.DeadlineExceeded, cc.node.get_power_state,
+                          NODES)
+
+    def test_timeout_retried(self):
+        cc = self.get_client(timeout=0.2, max_retries=1, retry_interval=0.1,
+                             breaker_threshold=0)
+        self.assertRaises(exc.RequestTimeout, cc.node.get_power_state,
+                          NODES)
+        self.assertEqual(2, self.server.requests['GET /nodes/power'])
+
+    def test_timed_out_post_sent_once(self):
+        cc = self.get_client(timeout=0.2, max_retries=1, retry_interval=0.1,
+                             breaker_threshold=0)
+        self.assertRaises(exc.RequestTimeout, cc.node.post,
+                          {'name': 'node000011'})
+        self.assertEqual(1, self.server.requests['POST /nodes'])
+
+
+class RetryTimeTest(unittest.TestCase):
+
+    def test_failed_attempt_not_charged(self):
+        cc = client.get_client(xcat3_url='http://127.0.0.1:1', max_retries=1,
+                               retry_interval=0.1)
+        calls = []
+
+        @http.with_retries
+        def request(http_client, url, method):
+            calls.append(method)
+            if len(calls) == 1:
+                time.sleep(0.6)
+                raise exc.ServiceUnavailable()
+            return 'ok'
+        self.assertEqual('ok', request(cc.http_client, '/nodes', 'GET'))
+        stats = cc.http_client.get_retry_stats()
+        self.assertEqual(1, stats['retries'])
+        # NOTE(chenglch): the jittered backoff is at most 0.3s.
+        self.assertLess(stats['retry_time'], 0.5)
+
+
+class ConnectionAbortedTest(unittest.TestCase):
+    """A server reading the requests and closing without answering."""
+
+    def setUp(self):
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.addCleanup(self.sock.close)
+        self.accepted = 0
+        thread = threading.Thread(target=self._serve)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.sock.getsockname()[1]
+
+    def _serve(self):
+        while True:
+            try:
+                conn, addr = self.sock.accept()
+            except (IOError, OSError):
+                return
+            self.accepted += 1
+            conn.recv(65536)
+            conn.close()
+
+    def get_client(self):
+        return client.get_client(xcat3_url=self.url, max_retries=1,
+                                 retry_interval=0.1, breaker_threshold=0)
+
+    def test_aborted_post_sent_once(self):
+        cc = self.get_client()
+        self.assertRaises(exc.ConnectionAborted, cc.node.post,
+                          {'name': 'node000011'})
+        self.assertEqual(1, self.accepted)
+
+    def test_aborted_get_retried(self):
+        cc = self.get_client()
+        self.assertRaises(exc.ConnectionAborted, cc.node.get_power_state,
+                          NODES)
+        self.assertEqual(2, self.accepted)
+
+
+class NoderangeFallbackTest(FakeAPITestCase):
+    server_kwargs = {'accept_noderange': False}
+
+    def setUp(self):
+        super(NoderangeFallbackTest, self).setUp()
+        self.nodes = nodeset.NodeSet.from_noderange('node[000001-000003]')
+
+    def get_client(self, **kwargs):
+        return super(NoderangeFallbackTest, self).get_client(
+            compact_noderange=True, **kwargs)
+
+    def test_fallback_on_415(self):
+        cc = self.get_client()
+        result = cc.node.get_power_state(self.nodes)
+        self.assertEqual(3, len(result['nodes']))
+        cc.node.get_power_state(self.nodes)
+        self.assertEqual(3, self.server.requests['GET /nodes/power'])
+        self.assertEqual(1, cc.http_client.get_noderange_stats()['fallbacks'])
+        self.get_client().node.get_power_state(self.nodes)
+        self.assertEqual(1, self.server.responses[415])
+
+    def test_no_resend_on_bad_request(self):
+        self.server.accept_noderange = True
+        cc = self.get_client()
+        self.assertRaises(exc.BadRequest, cc.node.set_power_state,
+                          self.nodes, 'bogus')
+        self.assertEqual(1, self.server.requests['PUT /nodes/power'])
+        self.assertEqual(0, cc.http_client.get_noderange_stats()['fallbacks'])
@@ -0,0 +1,188 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from xcat3client import client
+from xcat3client.common import bulk
+from xcat3client.common import codec
+from xcat3client.common import journal
+from xcat3client.common import nodeset
+from xcat3client import exc
+from xcat3client import shell
+from xcat3client.testing import fake_api
+
+COMMAND = 'power nodes="node[1-10]" state="on"'
+
+
+class JournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.path = os.path.join(tmpdir, 'journal')
+
+    def write(self, *records):
+        with open(self.path, 'w') as f:
+            for record in records:
+                f.write(codec.dumps(record) + '\n')
+
+    def read(self):
+        with open(self.path) as f:
+            return [codec.loads(line) for line in f]
+
+    def resume(self, command=COMMAND):
+        result = journal.Journal(self.path, command, resume=True)
+        self.addCleanup(result.close)
+        return result
+
+
+class JournalTest(JournalTestCase):
+
+    def test_records_chunks_and_results(self):
+        job = journal.Journal(self.path, COMMAND)
+        job.submitted(nodeset.NodeSet.from_noderange('node[1-3]'))
+        job.submitted(['node4', 'node5'])
+        job.record({'node1': 'ok', 'node2': 'ok', 'node3': 'Invalid'})
+        job.close()
+        self.assertEqual([{'command': COMMAND},
+                          {'submitted': 'node[1-3]'},
+                          {'submitted': 'node[4-5]'},
+                          {'results': {'ok': 'node[1-2]',
+                                       'Invalid': 'node3'}}], self.read())
+
+    def test_resume_skips_completed_nodes(self):
+        self.write({'command': COMMAND},
+                   {'submitted': 'node[1-5]'},
+                   {'results': {'ok': 'node[1-3]', 'Invalid': 'node[4-5]'}})
+        job = self.resume()
+        self.assertEqual('node[1-3]', job.completed.to_noderange())
+        self.assertFalse(job.in_flight)
+        pending = job.pending(
+            nodeset.NodeSet.from_noderange('node[1-10]'))
+        self.assertEqual('node[4-10]', pending.to_noderange())
+
+    def test_resume_computes_in_flight(self):
+        self.write({'command': COMMAND},
+                   {'submitted': 'node[1-5]'},
+                   {'submitted': 'node[6-10]'},
+                   {'results': {'ok': 'node[6-10]'}})
+        job = self.resume()
+        self.assertEqual('node[1-5]', job.in_flight.to_noderange())
+        self.assertEqual('node[6-10]', job.completed.to_noderange())
+
+    def test_resume_skips_torn_line(self):
+        self.write({'command': COMMAND},
+                   {'submitted': 'node[1-5]'},
+                   {'results': {'ok': 'node[1-5]'}})
+        with open(self.path, 'a') as f:
+            f.write('{"results": {"ok": "node[6-')
+        job = self.resume()
+        self.assertEqual('node[1-5]', job.completed.to_noderange())
+
+    def test_resume_appends(self):
+        self.write({'command': COMMAND})
+        job = self.resume()
+        job.record({'node1': 'ok'})
+        job.close()
+        self.assertEqual([{'command': COMMAND},
+                          {'results': {'ok': 'node1'}}], self.read())
+
+    def test_literal_names_kept(self):
+        job = journal.Journal(self.path, COMMAND)
+        job.submitted(['n1-n3', 'a,b'])
+        job.record({'n1-n3': 'ok', 'a,b': 'ok'})
+        job.close()
+        self.assertEqual(['a,b', 'n1-n3'], sorted(self.read()[1]['submitted']))
+        job = self.resume()
+        self.assertEqual(['a,b', 'n1-n3'], sorted(job.completed))
+        self.assertEqual(['n1', 'n2'],
+                         list(job.pending(['n1', 'n1-n3', 'n2', 'a,b'])))
+
+    def test_resume_other_command_raises(self):
+        self.write({'command': COMMAND})
+        self.assertRaises(exc.CommandError, self.resume,
+                          'power nodes="node[1-10]" state="off"')
+
+    def test_resume_not_object_raises(self):
+        self.write(['command', COMMAND])
+        self.assertRaises(exc.CommandError, self.resume)
+
+    def test_resume_missing_journal_raises(self):
+        self.assertRaises(exc.CommandError, self.resume)
+
+    def test_pending_items(self):
+        self.write({'command': COMMAND},
+                   {'results': {'ok': 'node[1-2]'}})
+        job = self.resume()
+        self.assertEqual(['node3'],
+                         list(job.pending(['node1', 'node2', 'node3'])))
+        self.assertEqual([{'name': 'node3'}],
+                         list(job.pending([{'name': 'node2'},
+                                           {'name': 'node3'}])))
+
+    def test_pending_without_completed_returns_items(self):
+        job = journal.Journal(self.path, COMMAND)
+        self.addCleanup(job.close)
+        items = ['node1', 'node2']
+        self.assertIs(items, job.pending(items))
+
+
+class JournalResumeTest(JournalTestCase):
+
+    def setUp(self):
+        super(JournalResumeTest, self).setUp()
+        self.server = fake_api.FakeAPIServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.api.add_nodes(20)
+
+    def test_engine_sends_nodes_not_completed(self):
+        self.write({'command': COMMAND},
+                   {'submitted': 'node[000000-000009]'},
+                   {'submitted': 'node[000010-000014]'},
+                   {'results': {'off': 'node[000000-000009]'}})
+        job = self.resume()
+        cc = client.get_client(xcat3_url=self.server.url, max_retries=0)
+        engine = bulk.BulkEngine(5, 2, journal=job)
+        nodes = nodeset.NodeSet.from_noderange('node[000000-000019]')
+        result = engine.run(cc.node.get_power_state, nodes)['nodes']
+        self.assertEqual(['node%06d' % i for i in range(10, 20)],
+                         list(result))
+        self.assertEqual(2, self.server.requests['GET /nodes/power'])
+        submitted = [r['submitted'] for r in self.read()[4:]
+                     if 'submitted' in r]
+        self.assertEqual(['node[000010-000014]', 'node[000015-000019]'],
+                         sorted(submitted))
+
+
+class JournalCommandTest(unittest.TestCase):
+
+    def setUp(self):
+        self.shell = shell.XCAT3Shell()
+        self.parser = self.shell.get_subcommand_parser('1')
+
+    def command(self, *argv):
+        return self.shell._journal_command(self.parser.parse_args(argv))
+
+    def test_global_options_ignored(self):
+        self.assertEqual(
+            self.command('create', 'node[1-3]', 'arch=x86_64'),
+            self.command('--chunk-size', '7', '--journal', 'create',
+                         'create', 'node[1-3]', 'arch=x86_64'))
+
+    def test_arguments_change_command(self):
+        self.assertNotEqual(
+            self.command('create', 'node[1-3]', 'arch=x86_64'),
+            self.command('create', 'node[1-4]', 'arch=x86_64'))
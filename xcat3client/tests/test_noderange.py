@@ -0,0 +1,102 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import itertools
+import unittest
+
+from xcat3client.common import noderange
+from xcat3client import exc
+from xcat3client.v1 import node_shell
+
+UNIVERSE = ['gpu1', 'gpu2', 'gpu10', 'node1', 'node2', 'node3', 'node4']
+
+
+def expand(expression):
+    return list(noderange.expand(expression, lambda: UNIVERSE))
+
+
+class NodeRangeTest(unittest.TestCase):
+
+    def test_single_name(self):
+        self.assertEqual(['node1'], expand('node1'))
+
+    def test_union_keeps_order(self):
+        self.assertEqual(['node3', 'node1', 'node2'],
+                         expand('node3,node[1-2],node1'))
+
+    def test_padding(self):
+        self.assertEqual(['node008', 'node009', 'node010'],
+                         expand('node[008-010]'))
+
+    def test_combinations(self):
+        self.assertEqual(['r1n1', 'r1n2', 'r2n1', 'r2n2'],
+                         expand('r[1-2]n[1-2]'))
+
+    def test_ip_addresses(self):
+        self.assertEqual(['10.0.1.1', '10.0.1.2', '10.0.2.1', '10.0.2.2'],
+                         expand('10.0.[1-2].[1-2]'))
+
+    def test_step_and_list(self):
+        self.assertEqual(['node1', 'node3', 'node5', 'node9'],
+                         expand('node[1-5:2],node[9]'))
+
+    def test_name_range(self):
+        self.assertEqual(['node01', 'node02', 'node03'],
+                         expand('node01-node03'))
+
+    def test_descending(self):
+        self.assertEqual(['node3', 'node2', 'node1'], expand('node[3-1]'))
+
+    def test_regex(self):
+        self.assertEqual(['gpu1', 'gpu2', 'gpu10'], expand('/^gpu\\d+$'))
+
+    def test_intersection(self):
+        self.assertEqual(['node2', 'node4'], expand('node[1-4]@/[24]$'))
+        self.assertEqual(['node2'], expand('node[1-4]@node[2,9]'))
+
+    def test_exclusion(self):
+        self.assertEqual(['node1', 'node4'], expand('node[1-4],-node[2-3]'))
+
+    def test_exclusion_alone(self):
+        self.assertEqual(['gpu1', 'gpu2', 'gpu10', 'node2', 'node3',
+                          'node4'], expand('-node1'))
+
+    def test_exclusion_needs_universe(self):
+        self.assertRaises(exc.InvalidName,
+                          lambda: list(noderange.expand('-node1')))
+
+    def test_invalid(self):
+        for expression in ('node[1-', 'node[a-b]', 'node1@', '/[',
+                           'node[1-2:0]'):
+            self.assertRaises(exc.InvalidName, expand, expression)
+
+    def test_len(self):
+        self.assertEqual(64, len(noderange.Pattern('r[1-4]n[01-16]')))
+
+    def test_lazy(self):
+        names = noderange.expand('node[1-100000000]')
+        self.assertEqual(['node1', 'node2'], list(itertools.islice(names, 2)))
+
+    def test_batches(self):
+        self.assertEqual([['n1', 'n2'], ['n3']],
+                         list(noderange.NodeRange('n[1-3]').batches(2)))
+
+
+class NodeFromArgsTest(unittest.TestCase):
+
+    def test_not_materialized(self):
+        names = node_shell._get_node_from_args('node[1-100000000]')
+        self.assertEqual(['node1', 'node2'], list(itertools.islice(names, 2)))
+        self.assertEqual(['node1'], list(itertools.islice(names, 1)))
+
+    def test_empty(self):
+        self.assertEqual([], list(node_shell._get_node_from_args('')))
@@ -0,0 +1,83 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from xcat3client.common import noderange
+from xcat3client.common import nodeset
+
+
+class NodeSetTest(unittest.TestCase):
+
+    def test_from_noderange_matches_expansion(self):
+        for expression in ('node[1-10],-node[3-4]', 'node[008-120]',
+                           'r[1-2]n[1-3]', 'gpu1,node[5-1],node3',
+                           'node[1-9:3]', 'mgmt,node01-node05'):
+            self.assertEqual(
+                sorted(noderange.expand(expression)),
+                sorted(nodeset.NodeSet.from_noderange(expression)),
+                expression)
+
+    def test_large_range_is_one_run(self):
+        nodes = nodeset.NodeSet.from_noderange('node[1-1000000]')
+        self.assertEqual(1000000, len(nodes))
+        self.assertEqual('node[1-1000000]', nodes.to_noderange())
+        self.assertIn('node500000', nodes)
+        self.assertNotIn('node0', nodes)
+        self.assertNotIn('node1000001', nodes)
+
+    def test_to_noderange_round_trip(self):
+        names = ['node1', 'node2', 'node3', 'node7', 'node010', 'node011',
+                 'switch', 'rack1u5']
+        nodes = nodeset.NodeSet(names)
+        self.assertEqual(sorted(names), sorted(nodes))
+        self.assertEqual(nodes, nodeset.NodeSet.from_noderange(
+            nodes.to_noderange()))
+
+    def test_padding_kept_apart(self):
+        nodes = nodeset.NodeSet(['node01', 'node1'])
+        self.assertEqual(2, len(nodes))
+        self.assertIn('node01', nodes)
+        self.assertIn('node1', nodes)
+
+    def test_set_operations(self):
+        a = nodeset.NodeSet.from_noderange('node[1-10]')
+        b = nodeset.NodeSet.from_noderange('node[5-15],gpu1')
+        self.assertEqual('gpu1,node[1-15]', str(a | b))
+        self.assertEqual('node[5-10]', str(a & b))
+        self.assertEqual('node[1-4]', str(a - b))
+        self.assertEqual('gpu1,node[11-15]', str(b - a))
+
+    def test_add_discard(self):
+        nodes = nodeset.NodeSet.from_noderange('node[1-5]')
+        nodes.discard('node3')
+        nodes.add('node9')
+        self.assertEqual('node[1-2,4-5,9]', str(nodes))
+        nodes.discard('missing')
+        self.assertEqual(5, len(nodes))
+
+    def test_empty(self):
+        nodes = nodeset.NodeSet()
+        self.assertFalse(nodes)
+        self.assertEqual('', nodes.to_noderange())
+        self.assertEqual([], list(nodes.split(10)))
+
+    def test_split(self):
+        nodes = nodeset.NodeSet.from_noderange('a[1-5],b[1-2]')
+        self.assertEqual(['a[1-3]', 'a[4-5],b1', 'b2'],
+                         [str(chunk) for chunk in nodes.split(3)])
+
+    def test_split_callable_size(self):
+        sizes = iter([1, 2, 4])
+        nodes = nodeset.NodeSet.from_noderange('node[1-7]')
+        self.assertEqual([1, 2, 4], [len(chunk) for chunk in
+                                     nodes.split(lambda: next(sizes, 4))])
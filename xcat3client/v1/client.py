@@ -14,6 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from xcat3client.common import bulk
 from xcat3client.common import http
 from xcat3client.v1 import node
 from xcat3client.v1 import network
@@ -30,12 +31,29 @@ class Client(object):
     :param function token: Provides token for authentication.
     :param integer timeout: Allows customization of the timeout for client
                             http requests. (optional)
+    :param integer chunk_size: With concurrency, executor, adaptive,
+                            node_retries, node_retry_interval and
+                            journal, fans out the node power, boot device
+                            and provision requests, see
+                            xcat3client.common.bulk.BulkEngine. (optional)
     """
 
     def __init__(self, *args, **kwargs):
         """Initialize a new client for the xCAT3 v1 API."""
+        bulk_kwargs = dict((name, kwargs.pop(name)) for name in
+                           ('chunk_size', 'concurrency', 'executor',
+                            'adaptive', 'node_retries',
+                            'node_retry_interval', 'journal')
+                           if name in kwargs)
         self.http_client = http._construct_http_client(*args, **kwargs)
-        self.node = node.NodeManager(self.http_client)
+        engine = None
+        if bulk_kwargs:
+            engine = bulk.BulkEngine(
+                probe=self.http_client.last_request_stats,
+                max_concurrency=kwargs.get('pool_maxsize',
+                                           http.DEFAULT_POOL_MAXSIZE),
+                **bulk_kwargs)
+        self.node = node.NodeManager(self.http_client, engine)
         self.network = network.NetworkManager(self.http_client)
         self.nic = nic.NicManager(self.http_client)
         self.osimage = osimage.OSImageManager(self.http_client)
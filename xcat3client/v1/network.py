@@ -18,3 +18,4 @@ from xcat3client.common import base
 
 class NetworkManager(base.ResourceManager):
     _resource_name = 'networks'
+    _completion_resource = 'network'
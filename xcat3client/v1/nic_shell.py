@@ -25,7 +25,7 @@ REQUIRE_FIELDS = ('mac', 'node')
 
 def _validate(attr_dict):
     for attr in REQUIRE_FIELDS:
-        if not attr_dict.has_key(attr):
+        if attr not in attr_dict:
             print(_('Could not find required field %(attr)s' % {'attr':attr}))
             exit(1)
 
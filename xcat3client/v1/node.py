@@ -13,17 +13,71 @@
 #    under the License.
 
 from xcat3client.common import base
+from xcat3client.common import nodeset
+
+
+def _nodes_body(nodes):
+    """Return the request body of nodes.
+
+    :param nodes: a body ``{'nodes': [{'name': name}, ...]}`` or an iterable
+        of node names, such as a NodeSet.
+    """
+    if isinstance(nodes, dict):
+        return nodes
+    return {'nodes': [{'name': name} for name in nodes]}
+
+
+def _nodes_args(nodes):
+    """Return the request arguments naming nodes.
+
+    A NodeSet is sent as a noderange when the client and the server support
+    it, see HttpClient.compact_noderange.
+    """
+    if isinstance(nodes, nodeset.NodeSet):
+        return {'compact': ({'noderange': nodes.to_noderange()},
+                            lambda: _nodes_body(nodes))}
+    return {'body': _nodes_body(nodes)}
 
 
 class NodeManager(base.Manager):
+    """Manage the nodes.
+
+    :param engine: BulkEngine fanning out the power, boot device and
+        provision requests in concurrent chunks, see
+        :mod:`xcat3client.common.bulk`. Without one the nodes are sent by a
+        single request.
+    """
     _resource_name = 'nodes'
+    _completion_resource = 'node'
 
-    def list(self):
+    def __init__(self, api, engine=None):
+        super(NodeManager, self).__init__(api)
+        self.engine = engine
+
+    def _fan_out(self, func, nodes, stream=False):
+        """Call func on the nodes, in concurrent chunks with an engine.
+
+        :param stream: return a generator over the ``{name: result}`` map
+                       of each chunk, as the chunks complete.
+        """
+        if self.engine is None or isinstance(nodes, dict):
+            result = func(nodes)
+            return iter([result['nodes']]) if stream else result
+        if stream:
+            return self.engine.iter_results(func, nodes,
+                                            self.api.remaining_time())
+        return self.engine.run(func, nodes, self.api.remaining_time())
+
+    def list(self, stream=False):
         """Retrieve a list of nodes.
+        :param stream: yield the node names as they are decoded instead of
+                       returning the whole response.
         :returns: A list of nodes.
         """
         url = self._resource_name
-        return self._get(url)
+        if stream:
+            return self._cache_names_stream(self._get_stream(url, 'nodes'))
+        return self._cache_names(self._get(url))
 
     def post(self, body):
         url = self._resource_name
@@ -37,30 +91,41 @@ class NodeManager(base.Manager):
         node = self._get(url, body=None)
         return node
 
-    def get(self, nodes, fields=None):
+    def get(self, nodes, fields=None, stream=False):
+        """Retrieve the information of nodes.
+
+        :param stream: return a generator over the node dicts, decoded one
+                       at a time from the response.
+        """
         url = '%s/%s' % (self._resource_name, 'info')
         if fields:
             params = '&fields=' + ','.join(fields)
             url += '%s%s' %('?', params)
-        return self._get(url, body=nodes)
+        if stream:
+            return self._get_stream(url, 'nodes', **_nodes_args(nodes))
+        return self._get(url, **_nodes_args(nodes))
 
     def delete(self, nodes):
         url = self._resource_name
-        return self._delete(url, body=nodes)
+        return self._delete(url, **_nodes_args(nodes))
 
     def update(self, patch):
         url = '%s' % self._resource_name
+        if not isinstance(patch['nodes'], list):
+            patch = dict(patch, nodes=_nodes_body(patch['nodes'])['nodes'])
         return self._update(url, patch=patch)
 
-    def set_power_state(self, nodes, state):
+    def set_power_state(self, nodes, state, stream=False):
         url = '%s/power?target=%s' % (self._resource_name, state)
-        return self._put(url, body=nodes)
+        return self._fan_out(
+            lambda chunk: self._put(url, **_nodes_args(chunk)), nodes, stream)
 
-    def get_power_state(self, nodes):
+    def get_power_state(self, nodes, stream=False):
         url = '%s/power' % (self._resource_name)
-        return self._get(url, body=nodes)
+        return self._fan_out(
+            lambda chunk: self._get(url, **_nodes_args(chunk)), nodes, stream)
 
-    def set_provision_state(self, nodes, state, osimage, subnet):
+    def set_provision_state(self, nodes, state, osimage, subnet, stream=False):
         """Set the provision state for the nodes."""
         if not state:
             state = 'nodeset'
@@ -69,12 +134,15 @@ class NodeManager(base.Manager):
             url += '&osimage=%s' % osimage
         if subnet:
             url += '&subnet=%s' % subnet
-        return self._put(url, body=nodes)
+        return self._fan_out(
+            lambda chunk: self._put(url, **_nodes_args(chunk)), nodes, stream)
 
-    def set_boot_device(self, nodes, boot_device):
+    def set_boot_device(self, nodes, boot_device, stream=False):
         url = "%s/boot_device?target=%s" % (self._resource_name, boot_device)
-        return self._put(url, body=nodes)
+        return self._fan_out(
+            lambda chunk: self._put(url, **_nodes_args(chunk)), nodes, stream)
 
-    def get_boot_device(self, nodes):
+    def get_boot_device(self, nodes, stream=False):
         url = "%s/boot_device" % (self._resource_name)
-        return self._get(url, body=nodes)
+        return self._fan_out(
+            lambda chunk: self._get(url, **_nodes_args(chunk)), nodes, stream)
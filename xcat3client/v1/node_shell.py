@@ -15,136 +15,186 @@
 #    under the License.
 from __future__ import print_function
 
-import json
+import itertools
 import six
 import sys
 
+from xcat3client.common import bulk
 from xcat3client.common import cliutils
 from xcat3client.common.i18n import _
+from xcat3client.common import noderange
+from xcat3client.common import nodeset
 from xcat3client.common import utils
 from xcat3client import exc
 
 FIELD_DICT = {'control': 'control_info',
               'nics': 'nics_info'}
-SUCCESS_RESULTS = {'ok': True,
-                   'updated': True,
-                   'deleted': True,
-                   'on': True,
-                   'off': True,
-                   'net': True,
-                   'cdrom': True,
-                   'disk': True,
-                   'provision': True}
-
-
-def _get_node_from_args(nodes=None):
-    """Build the node(s) from node range"""
-    name_list = []
-    if nodes:
-        nodes = nodes.split(',')
-    for node in nodes:
-        names = []
-        try:
-            if '[' in node and '-' in node and ']' in node:
-                parts = node.split('[')
-                prefix = parts[0]
-                num_parts = parts[1].split('-')
-                left = int(num_parts[0])
-                right = int(num_parts[1].split(']')[0])
-
-                while (left <= right):
-                    name = "%s%d" % (prefix, left)
-                    names.append(name)
-                    left += 1
+SUCCESS_RESULTS = bulk.SUCCESS_RESULTS
+
+
+def _get_node_from_args(nodes=None, universe=None):
+    """Build the node(s) from node range
+
+    :param nodes: noderange expression, see :mod:`xcat3client.common.noderange`
+    :param universe: callable returning every node name, needed by regular
+        expressions and exclusions alone.
+    :returns: an iterable over the node names, in the order of the
+        expression, generated as they are consumed.
+    """
+    if not nodes:
+        return []
+    return noderange.NodeRange(nodes, universe)
+
+
+def _get_nodeset_from_args(nodes=None, universe=None):
+    """Build the NodeSet of a node range, without listing every name
+
+    Used by the commands the order of the nodes does not matter to.
+    """
+    if not nodes:
+        return nodeset.NodeSet()
+    return nodeset.NodeSet.from_noderange(nodes, universe)
+
+
+def _node_lister(cc):
+    """Return a callable listing the node names for noderange lookups."""
+    return lambda: cc.node.list()['nodes']
+
+
+class _Progress(object):
+    """Running success/total counter, shown on stderr if it is a terminal."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self.enabled = getattr(self.stream, 'isatty', lambda: False)()
+        self._width = 0
+
+    def show(self, success, total):
+        if not self.enabled:
+            return
+        text = 'Success: %d  Total: %d' % (success, total)
+        self.stream.write('\r' + text)
+        self.stream.flush()
+        self._width = len(text)
+
+    def clear(self):
+        if self._width:
+            self.stream.write('\r%s\r' % (' ' * self._width))
+            self._width = 0
+
+
+def _print_node_results(results, args, check=False):
+    """Print the node results of each chunk as it completes.
+
+    Only the counters, and with --group the NodeSet of each result, are
+    kept, so the memory used does not grow with the number of nodes. The
+    nodes which still failed after --node-retries are listed at the end.
+
+    :param results: iterable of dict of node name -> result, such as
+        BulkEngine.iter_results.
+    """
+    counts = {'success': 0, 'total': 0}
+    group = getattr(args, 'group', False)
+    grouped = {}
+    retries = getattr(args, 'node_retries', 0) if check else 0
+    failed = nodeset.NodeSet()
+    progress = _Progress()
+
+    def rows():
+        for nodes in results:
+            progress.clear()
+            if check:
+                counts['success'] += sum(1 for v in six.itervalues(nodes)
+                                         if v in SUCCESS_RESULTS)
+            if retries:
+                failed.update(k for k, v in six.iteritems(nodes)
+                              if v not in SUCCESS_RESULTS)
+            counts['total'] += len(nodes)
+            if group:
+                names = {}
+                for k, v in six.iteritems(nodes):
+                    names.setdefault(v, []).append(k)
+                for value, chunk in six.iteritems(names):
+                    grouped.setdefault(value,
+                                       nodeset.NodeSet()).update(chunk)
             else:
-                node = node.replace('[', '').replace(']', '')
-                names.append(node)
-            name_list.extend(names)
-        except Exception() as e:
-            err = _("Invalied node name %(name)s. Error: %(err)s")
-            raise exc.InvalidName(err % {'name': node, 'err': e})
-
-    return list(set(name_list))
-
-
-def _print_node_result(result, args, check=False):
-    """Help function to calculate the success results then print"""
-    success = 0
-    total = 0
-    rst = []
-    for k, v in six.iteritems(result['nodes']):
-        if check and SUCCESS_RESULTS.has_key(v):
-            success += 1
-        total += 1
-        rst.append(k + ': ' + v)
-    cliutils.print_list(rst, args.json)
+                for k, v in six.iteritems(nodes):
+                    yield k + ': ' + v
+            progress.show(counts['success'], counts['total'])
+        progress.clear()
+        for value in sorted(grouped):
+            yield '%s: %s' % (grouped[value], value)
+
+    cliutils.print_list(rows(), args.json)
+    # NOTE(chenglch): with --json, stdout only holds the JSON document.
+    out = sys.stderr if args.json else sys.stdout
     if check:
-        print('\nSuccess: %d  Total: %d' % (success, total))
+        print('\nSuccess: %d  Total: %d' % (counts['success'],
+                                            counts['total']), file=out)
     else:
-        print('\nTotal: %d' % (total))
+        print('\nTotal: %d' % (counts['total']), file=out)
+    if failed:
+        print('Failed after %d retries: %s' % (retries, failed), file=out)
 
-    if success != total:
+    if counts['success'] != counts['total']:
         sys.exit(1)
 
 
-def _parallel_create(func, nodes, total, split_num):
-    import eventlet
-    eventlet.monkey_patch(os=False)
-    import futurist
-    from futurist import waiters
-    data = []
-    i = 0
-    per_split = total / split_num
-    while i < split_num - 1:
-        data.append({'nodes': nodes[i * per_split:(i + 1) * per_split]})
-        i += 1
-    data.append({'nodes': nodes[i * per_split:]})
-    _executor = futurist.GreenThreadPoolExecutor(max_workers=split_num)
-    j = 0
-    futures = []
-    while j < split_num:
-        future = _executor.submit(func, data[j])
-        futures.append(future)
-        j += 1
-
-    done, not_done = waiters.wait_for_all(futures, 3600)
-    result = {'nodes': {}}
-    for r in done:
-        result['nodes'].update(r.result()['nodes'])
-
-    return result
-
-
-def _parallel_update(func, names, patch, total, split_num):
-    import eventlet
-    eventlet.monkey_patch(os=False)
-    import futurist
-    from futurist import waiters
-    patch_dicts = []
-    patch_dict = {'nodes': [], "patches": patch}
-    i = 0
-    per_split = total / split_num
-    while i < total:
-        if i != 0 and i % per_split == 0 and i != split_num * per_split:
-            patch_dicts.append(patch_dict)
-            patch_dict = {'nodes': [], "patches": patch}
-
-        patch_dict['nodes'].append({'name': names[i]})
-        i += 1
-    patch_dicts.append(patch_dict)
-
-    _executor = futurist.GreenThreadPoolExecutor(max_workers=split_num)
-    futures = []
-    for patch_dict in patch_dicts:
-        future = _executor.submit(func, patch_dict)
-        futures.append(future)
-
-    done, not_done = waiters.wait_for_all(futures, 3600)
-    result = {'nodes': {}}
-    for r in done:
-        result['nodes'].update(r.result()['nodes'])
-
-    return result
+def _bulk_engine(cc, args):
+    """Return the BulkEngine configured by the global options."""
+    # NOTE(chenglch): the engine of the client, which fans out the power,
+    # boot device and provision requests, is shared.
+    engine = getattr(cc.node, 'engine', None)
+    if engine is not None:
+        return engine
+    return bulk.BulkEngine(
+        getattr(args, 'chunk_size', bulk.DEFAULT_CHUNK_SIZE),
+        getattr(args, 'concurrency', bulk.DEFAULT_CONCURRENCY),
+        getattr(args, 'executor', bulk.DEFAULT_EXECUTOR),
+        adaptive=getattr(args, 'adaptive', False),
+        node_retries=getattr(args, 'node_retries', bulk.DEFAULT_NODE_RETRIES),
+        node_retry_interval=getattr(args, 'node_retry_interval',
+                                    bulk.DEFAULT_NODE_RETRY_INTERVAL),
+        probe=getattr(cc.http_client, 'last_request_stats', None),
+        max_concurrency=getattr(args, 'pool_maxsize',
+                                bulk.DEFAULT_MAX_CONCURRENCY))
+
+
+def _iter_bulk_results(cc, args, func, nodes):
+    """Call func on the chunks of nodes, yield the node results of each.
+
+    :param func: callable taking a chunk of nodes and returning
+        ``{'nodes': {name: result}}``.
+    """
+    return _bulk_engine(cc, args).iter_results(
+        func, nodes, cc.http_client.remaining_time())
+
+
+def _started(items):
+    """Start an iterator, so the thread calling this sends its request."""
+    items = iter(items)
+    for item in items:
+        return itertools.chain([item], items)
+    return iter(())
+
+
+def _iter_bulk_items(cc, args, func, nodes):
+    """Yield the items of the ``nodes`` lists returned for each chunk.
+
+    :param func: callable taking a chunk and returning an iterator over its
+        items, such as NodeManager.get with stream=True. The engine sends
+        the requests of the chunks concurrently, their items are decoded
+        as they are consumed.
+    :raises: the error of the first chunk which failed.
+    """
+    results = _bulk_engine(cc, args).imap(lambda chunk: _started(func(chunk)),
+                                          nodes,
+                                          cc.http_client.remaining_time())
+    for chunk, result, error in results:
+        if error is not None:
+            raise error
+        for item in result:
+            yield item
 
 
 @cliutils.arg(
@@ -164,7 +214,7 @@ def do_show(cc, args):
 
     def format(result):
         out = []
-        if result.has_key('nodes'):
+        if 'nodes' in result:
             result = result.get('nodes')
             for r in result:
                 node = dict()
@@ -178,7 +228,7 @@ def do_show(cc, args):
             out.append(node)
         return out
 
-    nodes = _get_node_from_args(args.nodes)
+    nodes = _get_node_from_args(args.nodes, _node_lister(cc))
     fields = []
     if args.fields:
         fields = args.fields.split(',')
@@ -191,17 +241,18 @@ def do_show(cc, args):
         fields.remove('control')
         fields.append('control_info')
 
-    if len(nodes) == 1:
-        result = cc.node.show(nodes[0], fields)
+    first = list(itertools.islice(nodes, 2))
+    if len(first) == 1:
+        result = cc.node.show(first[0], fields)
         result = format(result)
         cliutils.print_dict(result)
         return
 
-    node_dict = {'nodes': []}
-    map(lambda x: node_dict['nodes'].append({'name': x}), nodes)
-    result = cc.node.get(node_dict, fields)
-    result = format(result)
-    cliutils.print_dict(result)
+    result = _iter_bulk_items(
+        cc, args, lambda chunk: cc.node.get(chunk, fields, stream=True),
+        nodes)
+    cliutils.print_dict_iter({'node': r.get('name'), 'attr': r}
+                             for r in result)
 
 
 @cliutils.arg(
@@ -216,13 +267,13 @@ def do_show(cc, args):
     help="Multiple node names split by comma.")
 def do_export(cc, args):
     """Export node(s) information as a specific json data file"""
-    nodes = _get_node_from_args(args.nodes)
-    node_dict = {'nodes': []}
-    map(lambda x: node_dict['nodes'].append({'name': x}), nodes)
+    nodes = _get_node_from_args(args.nodes, _node_lister(cc))
     fields = ['name', 'mgt', 'netboot', 'type', 'arch', 'nics_info',
               'control_info']
-    result = cc.node.get(node_dict, fields)
-    utils.write_to_file(args.output, json.dumps(result))
+    result = _iter_bulk_items(
+        cc, args, lambda chunk: cc.node.get(chunk, fields, stream=True),
+        nodes)
+    utils.write_json_stream(args.output, 'nodes', result)
     print(_("Export nodes data succefully."))
 
 
@@ -230,21 +281,17 @@ def do_export(cc, args):
     'input',
     metavar='</tmp/data.json>',
     default=None,
-    help="The input file stores nodes data.")
+    help="The input file stores nodes data, as exported or as JSON Lines "
+         "with one node per line.")
 def do_import(cc, args):
-    """Import node(s) information from json data file"""
-    with open(args.input, 'r') as f:
-        data = json.load(f)
-    nodes = data['nodes']
-    i = 0
-    while i < len(nodes):
-        nodes[i] = dict((k, v) for k, v in six.iteritems(nodes[i]) if v)
-        i += 1
-    if i > 3000:
-        result = _parallel_create(cc.node.post, nodes, i, 4)
-    else:
-        result = cc.node.post(data)
-    _print_node_result(result, args, True)
+    """Import node(s) information from json or json lines data file"""
+    # NOTE(chenglch): the nodes are decoded as the chunks are sent, memory
+    # holds the chunks in flight rather than the whole file.
+    nodes = (dict((k, v) for k, v in six.iteritems(node) if v)
+             for node in utils.read_json_stream(args.input, 'nodes'))
+    result = _iter_bulk_results(
+        cc, args, lambda chunk: cc.node.post({'nodes': chunk}), nodes)
+    _print_node_results(result, args, True)
 
 
 @cliutils.arg(
@@ -254,14 +301,16 @@ def do_import(cc, args):
     help="Multiple node names split by comma.")
 def do_list(cc, args):
     """List the node(s) which are registered with the xCAT3 service."""
-    targets = _get_node_from_args(args.nodes) if args.nodes else []
-    nodes = cc.node.list()
-    if targets:
-        dct = dict((x, True) for x in targets)
-        names = [node + ' (node)' for node in nodes['nodes'] if
-                 dct.get(node)]
+    targets = None
+    if args.nodes:
+        targets = _get_nodeset_from_args(args.nodes, _node_lister(cc))
+    nodes = cc.node.list(stream=True)
+    names = (node for node in nodes if not targets or node in targets)
+    if getattr(args, 'group', False):
+        names = nodeset.NodeSet(names)
+        names = [str(names) + ' (node)'] if names else []
     else:
-        names = [node + ' (node)' for node in nodes['nodes']]
+        names = (node + ' (node)' for node in names)
     cliutils.print_list(names, args.json)
 
 
@@ -295,30 +344,27 @@ def do_list(cc, args):
          '-i mac=42:87:0a:05:00:00,name=eth1')
 def do_create(cc, args):
     """Enroll node(s) into xCAT3 service"""
-    nodes = {'nodes': []}
     fields = ('arch', 'netboot', 'mgt', 'type')
     attr_dict = {}
-    names = _get_node_from_args(args.nodes)
+    names = _get_node_from_args(args.nodes, _node_lister(cc))
     for attr in args.attributes[0]:
         key, value = utils.split_and_deserialize(attr)
         if key not in fields:
             raise exc.BadRequest('Can not support attribute %s' % key)
         attr_dict[key] = value
 
-    for name in names:
+    def make_node(name):
         node = dict((k, v) for k, v in six.iteritems(attr_dict))
         node['name'] = name
         node['control_info'] = args.control
         if args.nic:
             node['nics_info'] = {'nics': args.nic}
-        nodes['nodes'].append(node)
+        return node
 
-    count = len(nodes['nodes'])
-    if count > 3000:
-        result = _parallel_create(cc.node.post, nodes['nodes'], count, 4)
-    else:
-        result = cc.node.post(nodes)
-    _print_node_result(result, args, True)
+    nodes = (make_node(name) for name in names)
+    result = _iter_bulk_results(
+        cc, args, lambda chunk: cc.node.post({'nodes': chunk}), nodes)
+    _print_node_results(result, args, True)
 
 
 @cliutils.arg('nodes',
@@ -330,11 +376,9 @@ def do_delete(cc, args):
 
     :raises: ClientException, if error happens during the delete
     """
-    names = _get_node_from_args(args.nodes)
-    nodes = {'nodes': []}
-    map(lambda x: nodes['nodes'].append({'name': x}), names)
-    result = cc.node.delete(nodes)
-    _print_node_result(result, args, True)
+    nodes = _get_nodeset_from_args(args.nodes, _node_lister(cc))
+    result = _iter_bulk_results(cc, args, cc.node.delete, nodes)
+    _print_node_results(result, args, True)
 
 
 @cliutils.arg(
@@ -353,21 +397,18 @@ def do_delete(cc, args):
 def do_update(cc, args):
     """Update information about registered node(s)."""
 
-    names = _get_node_from_args(args.nodes)
+    names = _get_node_from_args(args.nodes, _node_lister(cc))
     patch = utils.args_array_to_patch(args.attributes[0])
     # NOTE(chenglch): makes argument prefix shorter
     for p in patch:
         key = p['path'].split('/')[1]
-        if FIELD_DICT.has_key(key):
+        if key in FIELD_DICT:
             p['path'] = p['path'].replace(key, FIELD_DICT[key])
-    patch_dict = {'nodes': [], "patches": patch}
-    count = len(names)
-    if count > 3000:
-        result = _parallel_update(cc.node.update, names, patch, count, 4)
-    else:
-        map(lambda x: patch_dict['nodes'].append({'name': x}), names)
-        result = cc.node.update(patch_dict)
-    _print_node_result(result, args, True)
+    result = _iter_bulk_results(
+        cc, args,
+        lambda chunk: cc.node.update({'nodes': [{'name': x} for x in chunk],
+                                      'patches': patch}), names)
+    _print_node_results(result, args, True)
 
 
 @cliutils.arg(
@@ -382,14 +423,13 @@ def do_update(cc, args):
     help="'on', 'off', 'status' or 'boot'.")
 def do_power(cc, args):
     """Power operation on/off/reset/status for nodes"""
-    names = _get_node_from_args(args.nodes)
-    nodes = {'nodes': []}
-    map(lambda x: nodes['nodes'].append({'name': x}), names)
+    nodes = _get_nodeset_from_args(args.nodes, _node_lister(cc))
     if args.power_state == 'status':
-        result = cc.node.get_power_state(nodes)
+        result = cc.node.get_power_state(nodes, stream=True)
     else:
-        result = cc.node.set_power_state(nodes, args.power_state)
-    _print_node_result(result, args, True)
+        result = cc.node.set_power_state(nodes, args.power_state,
+                                         stream=True)
+    _print_node_results(result, args, True)
 
 
 @cliutils.arg(
@@ -404,14 +444,13 @@ def do_power(cc, args):
     help="'net', 'disk', 'status' or 'cdrom'.")
 def do_bootdev(cc, args):
     """Set/Get next boot device (net or disk or cdrom)."""
-    names = _get_node_from_args(args.nodes)
-    nodes = {'nodes': []}
-    map(lambda x: nodes['nodes'].append({'name': x}), names)
+    nodes = _get_nodeset_from_args(args.nodes, _node_lister(cc))
     if args.boot_device == 'status':
-        result = cc.node.get_boot_device(nodes)
+        result = cc.node.get_boot_device(nodes, stream=True)
     else:
-        result = cc.node.set_boot_device(nodes, args.boot_device)
-    _print_node_result(result, args, True)
+        result = cc.node.set_boot_device(nodes, args.boot_device,
+                                         stream=True)
+    _print_node_results(result, args, True)
 
 
 @cliutils.arg(
@@ -444,12 +483,10 @@ def do_bootdev(cc, args):
     help='Clean up related state, like un_dhcp, un_nodeset')
 def do_deploy(cc, args):
     """Deployment service for nodes (not complete)"""
-    names = _get_node_from_args(args.nodes)
-    nodes = {'nodes': []}
-    map(lambda x: nodes['nodes'].append({'name': x}), names)
+    nodes = _get_nodeset_from_args(args.nodes, _node_lister(cc))
     state = args.state
     if args.delete:
         state = 'un_%s' % state
     result = cc.node.set_provision_state(nodes, state, args.osimage,
-                                         args.network)
-    _print_node_result(result, args, True)
+                                         args.network, stream=True)
+    _print_node_results(result, args, True)
@@ -18,3 +18,5 @@ from xcat3client.common import base
 
 class OSImageManager(base.ResourceManager):
     _resource_name = 'osimages'
+    _completion_resource = 'osimage'
+    _completion_list_key = 'images'
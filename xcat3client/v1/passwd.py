@@ -18,3 +18,5 @@ from xcat3client.common import base
 
 class PasswdManager(base.ResourceManager):
     _resource_name = 'passwds'
+    _completion_resource = 'passwd'
+    _completion_key = 'key'